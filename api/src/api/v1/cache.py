@@ -0,0 +1,32 @@
+import secrets
+from http import HTTPStatus
+
+from api.v1.schemas.invalidation import InvalidationRequest, InvalidationResult
+from core.settings import CacheSettings
+from fastapi import APIRouter, Depends, Header, HTTPException
+from services.invalidation import InvalidationService, get_invalidation_service
+
+router = APIRouter()
+
+
+def check_token(x_invalidation_token: str | None = Header(None)) -> None:
+    expected = CacheSettings().invalidation_token
+    if not expected:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="invalidation is disabled")
+
+    if x_invalidation_token is None or not secrets.compare_digest(x_invalidation_token, expected):
+        raise HTTPException(status_code=HTTPStatus.FORBIDDEN, detail="invalid token")
+
+
+@router.post("/invalidate",
+             response_model=InvalidationResult,
+             dependencies=[Depends(check_token)],
+             summary="Сброс кеша",
+             description="Удаляет из кеша переиндексированные документы и построенные по ним ответы, "
+                         "списки и результаты поиска по индексу")
+async def invalidate(
+    request: InvalidationRequest,
+    invalidation_service: InvalidationService = Depends(get_invalidation_service),
+) -> InvalidationResult:
+    deleted = await invalidation_service.invalidate(request.index, request.ids)
+    return InvalidationResult(deleted=deleted)
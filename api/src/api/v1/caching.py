@@ -0,0 +1,47 @@
+from http import HTTPStatus
+
+from fastapi import Request, Response
+from services.cache.response import CachedEntry, CachedResponse
+from services.cache.storage import ICache
+from services.cache.tags import TagRegistry
+
+
+async def cached_response(
+    request: Request,
+    cache: ICache,
+    entry: CachedEntry,
+    registry: TagRegistry | None = None,
+    cacheable: bool = True,
+) -> Response:
+    """
+    Returns the cached body as is, computing it with ``entry.load`` on a miss.
+    ``If-None-Match`` is answered with 304 when it matches the ETag stored with the entry.
+    """
+    key = await entry.versioned_key(registry)
+    if key is None:
+        # the namespace is unknown while Redis is unavailable
+        (key, cacheable) = (entry.key, False)
+
+    async def dump() -> bytes:
+        return await entry.dump(key, registry)
+
+    raw = await cache.get_or_set(key, dump, entry.timeout_sec, entry.stale_sec) if cacheable else await dump()
+    response = CachedResponse.loads(raw)
+    headers = {**response.headers, "ETag": response.etag, "Cache-Control": f"max-age={entry.timeout_sec}"}
+    if etag_matches(request.headers.get("If-None-Match"), response.etag):
+        return Response(status_code=HTTPStatus.NOT_MODIFIED, headers=headers)
+
+    return Response(response.body, media_type="application/json", headers=headers)
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Weak comparison as required for If-None-Match (RFC 9110, 13.1.2)
+    """
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
@@ -0,0 +1,38 @@
+from datetime import datetime
+from http import HTTPStatus
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from services.base import INDICES
+from services.change_feed import ChangesNotRetainedError
+from services.export import ExportService
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+async def export_response(
+    export_service: ExportService,
+    index: INDICES,
+    model: type[BaseModel],
+    fields: str | None,
+    updated_since: datetime | None,
+) -> StreamingResponse:
+    """
+    Streams the documents of ``index``, ``fields`` is a comma separated list of the fields of ``model``
+    """
+    selected = None
+    if fields is not None:
+        selected = [field.strip() for field in fields.split(",") if field.strip()]
+        known = {info.alias or name for (name, info) in model.model_fields.items()}
+        if unknown := [field for field in selected if field not in known]:
+            raise HTTPException(status_code=HTTPStatus.UNPROCESSABLE_ENTITY, detail=f"unknown fields {unknown}")
+
+    try:
+        lines = await export_service.export(index, model, selected, updated_since)
+    except ChangesNotRetainedError as e:
+        raise HTTPException(status_code=HTTPStatus.GONE, detail=f"{e}, export everything instead")
+
+    # neither buffered nor cached by nginx
+    headers = {"Cache-Control": "no-store", "X-Accel-Buffering": "no"}
+    return StreamingResponse(lines, media_type=NDJSON_MEDIA_TYPE, headers=headers)
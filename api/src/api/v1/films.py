@@ -1,84 +1,193 @@
+from datetime import datetime
 from http import HTTPStatus
 from typing import Literal
 from uuid import UUID
 
-from api.v1.schemas.film import Film
-from api.v1.schemas.pagination import PaginatedParams
-from db.redis import get_cache
-from fastapi import APIRouter, Depends, HTTPException, Query, Response
+import orjson
+from api.v1.caching import CachedEntry, cached_response
+from api.v1.export import export_response
+from api.v1.schemas.batch import BatchItem, BatchRequest, batch_items
+from api.v1.schemas.film import FacetedFilms, Film
+from api.v1.schemas.pagination import PaginatedParams, page_headers
+from api.v1.schemas.projection import Projection
+from api.v1.schemas.suggest import FilmSuggestion
+from api.v1.suggest import suggest_response
+from core.deadline import route_timeout
+from db.redis import get_cache, get_tag_registry
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from models.film import Film as FilmModel
 from pydantic import TypeAdapter
+from services.cache.response import CachedResponse
 from services.cache.storage import ICache
+from services.cache.tags import TagRegistry, entity_tag
+from services.export import ExportService, get_export_service
 from services.film import FilmService, get_film_service
+from services.suggest import MAX_LIMIT, SuggestService, get_suggest_service
 
 router = APIRouter()
 
 
 SORT_OPTION = Literal["imdb_rating", "-imdb_rating"]
 
+# built once, the pages of films are projected from the documents without validation
+FILMS = Projection(Film)
+FILMS_BATCH = TypeAdapter(list[BatchItem[Film]])
+
 
 @router.get("/", response_model=list[Film],
             summary="Список всех фильмов",
             description="Возвращает полный список фильмов")
 async def list_films(
-    response: Response,
+    request: Request,
     pagination: PaginatedParams = Depends(),
     sort: SORT_OPTION = Query("imdb_rating", description="Sorting options"),
     genre: UUID | None = Query(None, description="Films by genre"),
     film_service: FilmService = Depends(get_film_service),
     cache: ICache = Depends(get_cache),
-) -> list[Film]:
-    key = f"films:{pagination.page_number}:{pagination.page_size}:{genre}:{sort}"
-    adapter = TypeAdapter(list[Film])
-    if cached := await cache.get(key):
-        return adapter.validate_json(cached)
-
-    sort_object: dict[str, int] | None = None
-    if sort:
-        sort_object = {}
-        # Maybe sort will be an array in future
-        for item in [sort]:
-            if item[0] == "-":
-                sort_object[item[1:]] = -1
-            else:
-                sort_object[item] = 1
-    films = await film_service.get_all_films(pagination.page_number, pagination.page_size, genre, sort_object)
-    mapped = [Film.model_validate(film) for film in films]
-    cached = adapter.dump_json(mapped)
-    await cache.set(key, cached, 60 * 5)
-    response.headers["Cache-Control"] = f"max-age={60 * 5}"
-    return mapped
+    registry: TagRegistry | None = Depends(get_tag_registry),
+) -> Response:
+    entry = films_page(film_service, pagination, sort, genre)
+    return await cached_response(request, cache, entry, registry, cacheable=pagination.cacheable)
+
+
+def films_page(
+    film_service: FilmService, pagination: PaginatedParams, sort: SORT_OPTION, genre: UUID | None
+) -> CachedEntry:
+    """
+    Page of ``list_films``, also precomputed by the cache warm-up
+    """
+    key = f"films:{pagination.page_number}:{pagination.page_size}:{genre}:{sort}:{pagination.cursor_token}"
+
+    async def load() -> CachedResponse:
+        sort_object: dict[str, int] | None = None
+        if sort:
+            sort_object = {}
+            # Maybe sort will be an array in future
+            for item in [sort]:
+                if item[0] == "-":
+                    sort_object[item[1:]] = -1
+                else:
+                    sort_object[item] = 1
+        page = await film_service.get_all_films(
+            pagination.page_number, pagination.page_size, genre, sort_object, pagination.cursor, Film
+        )
+        return CachedResponse.create(FILMS.dump_json(page.items), page_headers(page))
+
+    return CachedEntry(key, load, 60 * 5, stale_sec=60 * 30, indices=("movies", "genres") if genre else ("movies",))
 
 
 @router.get("/search",
-            response_model=list[Film],
+            dependencies=[Depends(route_timeout(5))],
+            response_model=list[Film] | FacetedFilms,
             summary="Поиск по фильмам",
-            description="Возвращает список фильмов по поисковому запросу")
+            description="Возвращает список фильмов по поисковому запросу. "
+                        "С facets=true возвращает также количество найденных фильмов по жанрам и рейтингам")
 async def search_films(
-    response: Response,
+    request: Request,
     query: str = Query(min_length=3, description="Search query string"),
+    genre: UUID | None = Query(None, description="Films by genre"),
+    rating_from: float | None = Query(None, ge=0, description="Lowest IMDb rating, inclusive"),
+    rating_to: float | None = Query(None, ge=0, description="Highest IMDb rating, exclusive"),
+    facets: bool = Query(False, description="Return the genre and rating facets together with the films"),
     pagination: PaginatedParams = Depends(),
     film_service: FilmService = Depends(get_film_service),
     cache: ICache = Depends(get_cache),
-) -> list[Film]:
-    key = f"films:{query}:{pagination.page_number}:{pagination.page_size}"
-    adapter = TypeAdapter(list[Film])
-    if cached := await cache.get(key):
-        return adapter.validate_json(cached)
+    registry: TagRegistry | None = Depends(get_tag_registry),
+) -> Response:
+    if rating_from is not None and rating_to is not None and rating_from > rating_to:
+        raise HTTPException(
+            status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+            detail=f"rating_from {rating_from} is greater than rating_to {rating_to}",
+        )
+
+    key = (
+        f"films:{query}:{pagination.page_number}:{pagination.page_size}:{pagination.cursor_token}"
+        f":{genre}:{rating_from}:{rating_to}:{facets}"
+    )
+
+    async def load() -> CachedResponse:
+        page = await film_service.search_films(
+            query,
+            pagination.page_number,
+            pagination.page_size,
+            pagination.cursor,
+            Film,
+            genre=genre,
+            rating_from=rating_from,
+            rating_to=rating_to,
+            facets=facets,
+        )
+        body = FILMS.dump_json(page.items)
+        if page.facets is not None:
+            # FacetedFilms
+            facets_body = page.facets.model_dump_json()
+            body = orjson.dumps({"items": orjson.Fragment(body), "facets": orjson.Fragment(facets_body)})
+        return CachedResponse.create(body, page_headers(page))
+
+    # facets name the genres by their catalog ids
+    indices = ("movies", "genres") if genre or facets else ("movies",)
+    entry = CachedEntry(key, load, 60 * 5, stale_sec=60 * 30, indices=indices)
+    return await cached_response(request, cache, entry, registry, cacheable=pagination.cacheable)
 
-    films = await film_service.search_films(query, pagination.page_number, pagination.page_size)
-    mapped = [Film.model_validate(film) for film in films]
-    cached = adapter.dump_json(mapped)
-    await cache.set(key, cached, 60 * 5)
-    response.headers["Cache-Control"] = f"max-age={60 * 5}"
-    return mapped
+
+@router.get("/suggest",
+            response_model=list[FilmSuggestion],
+            summary="Подсказки по названиям фильмов",
+            description="Возвращает фильмы, одно из слов названия которых начинается с prefix, "
+                        "лучшие по рейтингу первыми. Отвечает из памяти, без запросов к Elasticsearch")
+async def suggest_films(
+    prefix: str = Query(min_length=1, description="Beginning of a word of the title"),
+    limit: int = Query(10, ge=1, le=MAX_LIMIT, description="Number of suggestions"),
+    suggest_service: SuggestService = Depends(get_suggest_service),
+) -> Response:
+    return suggest_response(suggest_service.suggest_films(prefix, limit))
+
+
+@router.get("/export",
+            dependencies=[Depends(route_timeout(60 * 30))],
+            response_class=StreamingResponse,
+            summary="Выгрузка всех фильмов",
+            description="Возвращает все фильмы в формате NDJSON, по одному на строку. "
+                        "updated_since ограничивает выгрузку изменёнными с этого момента")
+async def export_films(
+    fields: str | None = Query(None, description="Comma separated fields, all by default"),
+    updated_since: datetime | None = Query(None, description="Only the documents changed since then"),
+    export_service: ExportService = Depends(get_export_service),
+) -> StreamingResponse:
+    return await export_response(export_service, "movies", FilmModel, fields, updated_since)
+
+
+@router.post("/batch",
+             response_model=list[BatchItem[Film]],
+             summary="Данные по нескольким фильмам",
+             description="Возвращает фильмы в порядке запрошенных идентификаторов, "
+                         "для отсутствующих фильмов found равен false")
+async def films_batch(
+    batch: BatchRequest,
+    film_service: FilmService = Depends(get_film_service),
+) -> Response:
+    films = await film_service.get_many(batch.ids)
+    items = batch_items(batch.ids, [Film.model_validate(film) if film else None for film in films])
+    return Response(FILMS_BATCH.dump_json(items), media_type="application/json")
 
 
 @router.get("/{film_id}",
             response_model=Film,
             summary="Данные по конкретному фильму",
             description="Возвращает подробную информацию о фильме.")
-async def film_details(film_id: UUID, film_service: FilmService = Depends(get_film_service)) -> Film:
-    if film := await film_service.get_by_id(film_id):
-        return Film.model_validate(film)
+async def film_details(
+    request: Request,
+    film_id: UUID,
+    film_service: FilmService = Depends(get_film_service),
+    cache: ICache = Depends(get_cache),
+    registry: TagRegistry | None = Depends(get_tag_registry),
+) -> Response:
+    async def load() -> CachedResponse:
+        if film := await film_service.get_by_id(film_id):
+            body = Film.model_validate(film).model_dump_json().encode()
+            return CachedResponse.create(body, tags=[entity_tag("movies", film_id)])
+
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="film not found")
 
-    raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="film not found")
+    return await cached_response(request, cache, CachedEntry(f"films:{film_id}:details", load, 60 * 5), registry)
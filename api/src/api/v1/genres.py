@@ -1,13 +1,23 @@
 from http import HTTPStatus
 from uuid import UUID
 
+from api.v1.caching import CachedEntry, cached_response
+from api.v1.schemas.batch import BatchItem, BatchRequest, batch_items
 from api.v1.schemas.genre import Genre
-from fastapi import APIRouter, Depends, HTTPException
+from db.redis import get_cache, get_tag_registry
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from models.genre import Genre as Model
+from pydantic import TypeAdapter
+from services.cache.response import CachedResponse
+from services.cache.storage import ICache
+from services.cache.tags import TagRegistry, entity_tag
 from services.genre import GenreService, get_genre_service
 
 router = APIRouter()
 
+GENRES = TypeAdapter(list[Genre])
+GENRES_BATCH = TypeAdapter(list[BatchItem[Genre]])
+
 
 def _from_model(model: Model) -> Genre:
     return Genre(id=model.id,
@@ -20,10 +30,39 @@ def _from_model(model: Model) -> Genre:
             summary="Список жанров",
             description="Возвращает полный список жанров")
 async def list_genres(
-        genre_service: GenreService = Depends(get_genre_service)
-) -> list[Genre]:
-    entities = await genre_service.get_all()
-    return [_from_model(entity) for entity in entities]
+        request: Request,
+        genre_service: GenreService = Depends(get_genre_service),
+        cache: ICache = Depends(get_cache),
+        registry: TagRegistry | None = Depends(get_tag_registry),
+) -> Response:
+    return await cached_response(request, cache, genres_list(genre_service), registry)
+
+
+def genres_list(genre_service: GenreService) -> CachedEntry:
+    """
+    Response of ``list_genres``, also precomputed by the cache warm-up
+    """
+
+    async def load() -> CachedResponse:
+        entities = await genre_service.get_all()
+        body = GENRES.dump_json([_from_model(entity) for entity in entities])
+        return CachedResponse.create(body)
+
+    return CachedEntry("genres:list", load, 60 * 5, indices=("genres",))
+
+
+@router.post("/batch",
+             response_model=list[BatchItem[Genre]],
+             summary="Данные по нескольким жанрам",
+             description="Возвращает жанры в порядке запрошенных идентификаторов, "
+                         "для отсутствующих жанров found равен false")
+async def genres_batch(
+        batch: BatchRequest,
+        genre_service: GenreService = Depends(get_genre_service),
+) -> Response:
+    genres = await genre_service.get_many(batch.ids)
+    items = batch_items(batch.ids, [_from_model(genre) if genre else None for genre in genres])
+    return Response(GENRES_BATCH.dump_json(items), media_type="application/json")
 
 
 @router.get("/{genre_id}",
@@ -31,10 +70,18 @@ async def list_genres(
             summary="Данные по конкретному жанру",
             description="Возвращает подробную информацию о жанре.")
 async def film_details(
-        genre_id: UUID, genre_service: GenreService = Depends(get_genre_service)
-) -> Genre:
-    if entity := await genre_service.get_by_id(genre_id):
-        return _from_model(entity)
+        request: Request,
+        genre_id: UUID,
+        genre_service: GenreService = Depends(get_genre_service),
+        cache: ICache = Depends(get_cache),
+        registry: TagRegistry | None = Depends(get_tag_registry),
+) -> Response:
+    async def load() -> CachedResponse:
+        if entity := await genre_service.get_by_id(genre_id):
+            body = _from_model(entity).model_dump_json().encode()
+            return CachedResponse.create(body, tags=[entity_tag("genres", genre_id)])
+
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND,
+                            detail="genre not found")
 
-    raise HTTPException(status_code=HTTPStatus.NOT_FOUND,
-                        detail="genre not found")
+    return await cached_response(request, cache, CachedEntry(f"genres:{genre_id}:details", load, 60 * 5), registry)
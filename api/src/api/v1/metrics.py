@@ -0,0 +1,10 @@
+from core.metrics import render
+from fastapi import APIRouter, Response
+
+router = APIRouter()
+
+
+@router.get("/", include_in_schema=False)
+async def get_metrics() -> Response:
+    (body, content_type) = render()
+    return Response(content=body, media_type=content_type)
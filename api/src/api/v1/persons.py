@@ -1,49 +1,114 @@
 import logging
+from datetime import datetime
 from http import HTTPStatus
-from typing import Annotated, get_args
 from uuid import UUID
 
-from api.v1.films import Film
+from api.v1.caching import CachedEntry, cached_response
+from api.v1.export import export_response
+from api.v1.films import FILMS, Film
+from api.v1.schemas.batch import BatchItem, BatchRequest, batch_items
+from api.v1.schemas.pagination import PaginatedParams, page_headers
 from api.v1.schemas.person import Person, PersonFilm
-from api.v1.schemas.pagination import PaginatedParams
-from db.redis import get_cache
-from fastapi import APIRouter, Depends, HTTPException, Query, Response
-from models.film import Film as FilmModel
+from api.v1.schemas.suggest import PersonSuggestion
+from api.v1.suggest import suggest_response
+from core.deadline import route_timeout
+from db.redis import get_cache, get_tag_registry
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from models.person import FilmRoles
 from models.person import Person as PersonModel
 from pydantic import TypeAdapter
+from services.cache.response import CachedResponse
 from services.cache.storage import ICache
-from services.film import PERSON_ROLE, FilmService, get_film_service
+from services.cache.tags import TagRegistry, entity_tag
+from services.export import ExportService, get_export_service
+from services.film import FilmService, get_film_service
 from services.person_film import PersonFilmService, get_person_film_service
+from services.suggest import MAX_LIMIT, SuggestService, get_suggest_service
 
 router = APIRouter()
 
 
 logger = logging.getLogger(__name__)
 
+PERSONS = TypeAdapter(list[Person])
+PERSONS_BATCH = TypeAdapter(list[BatchItem[Person]])
+
 
 @router.get("/search",
+            dependencies=[Depends(route_timeout(5))],
             response_model=list[Person],
             summary="Поиск по персонам",
             description="Возвращает список персон по поисковому запросу")
 async def search_persons(
-    response: Response,
+    request: Request,
     query: str = Query(..., min_length=3, description="Search string"),
     pagination: PaginatedParams = Depends(),
     person_film_service: PersonFilmService = Depends(get_person_film_service),
     cache: ICache = Depends(get_cache),
-) -> list[Person]:
-    key = f"persons:{query}:{pagination.page_number}:{pagination.page_size}"
-    adapter = TypeAdapter(list[Person])
-    if cached := await cache.get(key):
-        return adapter.validate_json(cached)
-
-    logger.debug("Persons search cache missed")
-    entities = await person_film_service.search(query, pagination.page_number or 1, pagination.page_size or 50)
-    persons = [_construct_person_films(person, films) for (person, films) in entities]
-    cached = adapter.dump_json(persons)
-    await cache.set(key, cached, 60 * 5)
-    response.headers["Cache-Control"] = f"max-age={60 * 5}"
-    return persons
+    registry: TagRegistry | None = Depends(get_tag_registry),
+) -> Response:
+    entry = persons_search(person_film_service, query, pagination)
+    return await cached_response(request, cache, entry, registry, cacheable=pagination.cacheable)
+
+
+def persons_search(
+    person_film_service: PersonFilmService, query: str, pagination: PaginatedParams
+) -> CachedEntry:
+    """
+    Page of ``search_persons``, also precomputed by the cache warm-up
+    """
+    key = f"persons:{query}:{pagination.page_number}:{pagination.page_size}:{pagination.cursor_token}"
+
+    async def load() -> CachedResponse:
+        logger.debug("Persons search cache missed")
+        page = await person_film_service.search(query, pagination.page_number, pagination.page_size, pagination.cursor)
+        body = PERSONS.dump_json([_construct_person_films(person, films) for (person, films) in page.items])
+        return CachedResponse.create(body, page_headers(page))
+
+    return CachedEntry(key, load, 60 * 5, stale_sec=60 * 30, indices=("persons", "movies"))
+
+
+@router.get("/suggest",
+            response_model=list[PersonSuggestion],
+            summary="Подсказки по именам персон",
+            description="Возвращает персон, одно из слов имени которых начинается с prefix, "
+                        "короткие имена первыми. Отвечает из памяти, без запросов к Elasticsearch")
+async def suggest_persons(
+    prefix: str = Query(min_length=1, description="Beginning of a word of the name"),
+    limit: int = Query(10, ge=1, le=MAX_LIMIT, description="Number of suggestions"),
+    suggest_service: SuggestService = Depends(get_suggest_service),
+) -> Response:
+    return suggest_response(suggest_service.suggest_persons(prefix, limit))
+
+
+@router.get("/export",
+            dependencies=[Depends(route_timeout(60 * 30))],
+            response_class=StreamingResponse,
+            summary="Выгрузка всех персон",
+            description="Возвращает всех персон в формате NDJSON, по одной на строку. "
+                        "updated_since ограничивает выгрузку изменёнными с этого момента")
+async def export_persons(
+    fields: str | None = Query(None, description="Comma separated fields, all by default"),
+    updated_since: datetime | None = Query(None, description="Only the documents changed since then"),
+    export_service: ExportService = Depends(get_export_service),
+) -> StreamingResponse:
+    return await export_response(export_service, "persons", PersonModel, fields, updated_since)
+
+
+@router.post("/batch",
+             response_model=list[BatchItem[Person]],
+             summary="Данные по нескольким персонам",
+             description="Возвращает персон в порядке запрошенных идентификаторов, "
+                         "для отсутствующих персон found равен false")
+async def persons_batch(
+    batch: BatchRequest,
+    person_film_service: PersonFilmService = Depends(get_person_film_service),
+) -> Response:
+    found = await person_film_service.get_persons_with_films(batch.ids)
+    persons = [_construct_person_films(*person_films) if person_films else None for person_films in found]
+    items = batch_items(batch.ids, persons)
+    return Response(PERSONS_BATCH.dump_json(items), media_type="application/json")
 
 
 @router.get("/{person_id}",
@@ -51,13 +116,23 @@ async def search_persons(
             summary="Данные по персоне",
             description="Возвращает подробную информацию о персоне")
 async def get_person(
-    person_id: UUID, person_film_service: PersonFilmService = Depends(get_person_film_service)
-) -> Person:
-    (person, films) = await person_film_service.get_person_with_films(person_id)
-    if person:
-        return _construct_person_films(person, films)
+    request: Request,
+    person_id: UUID,
+    person_film_service: PersonFilmService = Depends(get_person_film_service),
+    cache: ICache = Depends(get_cache),
+    registry: TagRegistry | None = Depends(get_tag_registry),
+) -> Response:
+    async def load() -> CachedResponse:
+        (person, films) = await person_film_service.get_person_with_films(person_id)
+        if person:
+            body = _construct_person_films(person, films).model_dump_json().encode()
+            tags = [entity_tag("persons", person_id), *(entity_tag("movies", film.film_id) for film in films)]
+            return CachedResponse.create(body, tags=tags)
+
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="person not found")
 
-    raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="person not found")
+    entry = CachedEntry(f"persons:{person_id}:details", load, 60 * 5)
+    return await cached_response(request, cache, entry, registry)
 
 
 @router.get("/{person_id}/films",
@@ -65,33 +140,26 @@ async def get_person(
             summary="Фильмы по персоне",
             description="Возвращает список фильмов, в которых участвовала персона")
 async def list_person_films(
-    response: Response,
+    request: Request,
     person_id: UUID,
     film_service: FilmService = Depends(get_film_service),
     cache: ICache = Depends(get_cache),
-) -> list[Film]:
+    registry: TagRegistry | None = Depends(get_tag_registry),
+) -> Response:
     key = f"persons:{person_id}:films"
-    adapter = TypeAdapter(list[Film])
-    if cached := await cache.get(key):
-        return adapter.validate_json(cached)
 
-    logger.debug(f"Person films cache missed {person_id}")
-    entities = await film_service.find_by_person(person_id)
-    films_list = [Film(**film.model_dump()) for film in entities]
-    cached = adapter.dump_json(films_list)
-    await cache.set(key, cached, 60 * 5)
-    response.headers["Cache-Control"] = f"max-age={60 * 5}"
-    return films_list
+    async def load() -> CachedResponse:
+        logger.debug(f"Person films cache missed {person_id}")
+        docs = await film_service.find_by_person(person_id, Film)
+        return CachedResponse.create(FILMS.dump_json(docs))
+
+    # films of the person are found among all the films
+    entry = CachedEntry(key, load, 60 * 5, stale_sec=60 * 30, indices=("movies",))
+    return await cached_response(request, cache, entry, registry)
 
 
-def _construct_person_films(person: PersonModel, films: list[FilmModel]) -> Person:
+def _construct_person_films(person: PersonModel, films: list[FilmRoles]) -> Person:
     """Construct Person model with films"""
     model = Person.model_validate(person)
-    model.films = [_extract_film_details(film, person.id) for film in films]
+    model.films = [PersonFilm(uuid=film.film_id, roles=film.roles) for film in films]
     return model
-
-
-def _extract_film_details(film: FilmModel, person_id: UUID) -> PersonFilm:
-    all_roles = get_args(PERSON_ROLE)
-    roles = [role for role in all_roles if any(r.id == person_id for r in getattr(film, role))]
-    return PersonFilm(uuid=film.id, roles=roles)
@@ -0,0 +1,35 @@
+import asyncio
+import secrets
+from http import HTTPStatus
+
+from api.v1.schemas.profile import ProfileCapture
+from core.profiler import CaptureStore, get_capture_store
+from core.settings import ProfilerSettings
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+
+router = APIRouter()
+
+
+def check_token(x_profile_token: str | None = Header(None)) -> None:
+    expected = ProfilerSettings().token
+    if not expected:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="profiling is disabled")
+
+    if x_profile_token is None or not secrets.compare_digest(x_profile_token.encode(), expected.encode()):
+        raise HTTPException(status_code=HTTPStatus.FORBIDDEN, detail="invalid token")
+
+
+@router.get("/",
+            response_model=list[ProfileCapture],
+            dependencies=[Depends(check_token)],
+            summary="Профили запросов",
+            description="Возвращает последние сохранённые профили запросов, новые первыми. "
+                        "Запрос профилируется с заголовком X-Profile-Token или выборочно, "
+                        "id профиля возвращается в заголовке X-Profile-Id")
+async def list_profiles(
+    route: str | None = Query(None, pattern=r"^\w+$", description="Route, e.g. GET_api_v1_films_film_id"),
+    limit: int = Query(50, ge=1, le=1000, description="Number of captures"),
+    store: CaptureStore = Depends(get_capture_store),
+) -> list[ProfileCapture]:
+    captures = await asyncio.to_thread(store.list, route, limit)
+    return [ProfileCapture(**{**vars(capture), "path": str(capture.path)}) for capture in captures]
@@ -0,0 +1,27 @@
+from collections.abc import Sequence
+from typing import Generic, TypeVar
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+MAX_BATCH_SIZE = 100
+
+T = TypeVar("T", bound=BaseModel)
+
+
+class BatchRequest(BaseModel):
+    ids: list[UUID] = Field(min_length=1, max_length=MAX_BATCH_SIZE, description=f"Ids [1, {MAX_BATCH_SIZE}]")
+
+
+class BatchItem(BaseModel, Generic[T]):
+    """
+    Result for one of the requested ids, ``data`` is empty when nothing was found
+    """
+
+    id: UUID
+    found: bool
+    data: T | None = None
+
+
+def batch_items(ids: Sequence[UUID], items: Sequence[T | None]) -> list[BatchItem[T]]:
+    return [BatchItem(id=id, found=item is not None, data=item) for (id, item) in zip(ids, items)]
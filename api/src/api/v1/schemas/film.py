@@ -1,5 +1,6 @@
 from uuid import UUID
 
+from models.film import FilmFacets
 from pydantic import BaseModel, ConfigDict
 
 
@@ -9,3 +10,8 @@ class Film(BaseModel):
     id: UUID
     title: str
     imdb_rating: float
+
+
+class FacetedFilms(BaseModel):
+    items: list[Film]
+    facets: FilmFacets
@@ -0,0 +1,20 @@
+from typing import Literal
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+MAX_INVALIDATION_SIZE = 1000
+
+
+class InvalidationRequest(BaseModel):
+    index: Literal["movies", "persons", "genres"]
+    ids: list[UUID] = Field(
+        default_factory=list,
+        max_length=MAX_INVALIDATION_SIZE,
+        description="Reindexed documents, without them only the lists and searches of the index are dropped",
+    )
+
+
+class InvalidationResult(BaseModel):
+    # responses built from the documents, the lists and searches are not counted
+    deleted: int
@@ -1,10 +1,31 @@
 from fastapi import Query
+from services.pagination import Cursor, Page
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
 
 class PaginatedParams:
     def __init__(
         self,
         page_number: int = Query(1, description="Page number [1, N]", ge=1),
-        page_size: int = Query(10, description="Page size [1, 100]", ge=1, le=100)
+        page_size: int = Query(10, description="Page size [1, 100]", ge=1, le=100),
+        cursor: str | None = Query(
+            None, description=f"Value of the {NEXT_CURSOR_HEADER} header of the previous page, replaces page_number"
+        ),
     ):
         self.page_number = page_number
         self.page_size = page_size
+        self.cursor_token = cursor
+        self.cursor = Cursor.decode(cursor) if cursor else None
+
+    @property
+    def cacheable(self) -> bool:
+        # cursors bound to a point in time are unique per client
+        return self.cursor is None or self.cursor.pit_id is None
+
+
+def page_headers(page: Page) -> dict[str, str]:
+    if page.next_cursor is None:
+        return {}
+
+    return {NEXT_CURSOR_HEADER: page.next_cursor.encode()}
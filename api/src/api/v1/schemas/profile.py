@@ -0,0 +1,14 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+class ProfileCapture(BaseModel):
+    id: str
+    # method and template of the route, e.g. GET_api_v1_films_film_id
+    route: str
+    status: int
+    duration_ms: int
+    started: datetime
+    # file on the disk of the worker
+    path: str
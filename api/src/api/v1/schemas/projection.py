@@ -0,0 +1,35 @@
+from collections.abc import Iterable
+from typing import Any
+
+import orjson
+from pydantic import BaseModel
+
+# default of the required fields, never a value of a document
+_REQUIRED = object()
+
+
+class Projection:
+    """
+    Turns ``_source`` documents into the response JSON of ``model`` without building the models.
+    The documents are read with ``source_fields(model)`` and trusted to follow the mapping of the index,
+    so the fields are only picked in the order of the model and the missing optional ones get their defaults.
+    A document lacking a required field is validated into the model instead, which reports what is wrong.
+    Nested values are sent as they are stored.
+    """
+
+    def __init__(self, model: type[BaseModel]):
+        self.model = model
+        # (key, default), keys are the same in the documents and in the responses
+        self._fields = tuple(
+            (info.alias or name, _REQUIRED if info.is_required() else info.get_default(call_default_factory=True))
+            for (name, info) in model.model_fields.items()
+        )
+
+    def project(self, doc: dict) -> dict[str, Any]:
+        projected = {key: doc.get(key, default) for (key, default) in self._fields}
+        if _REQUIRED in projected.values():
+            return self.model.model_validate(doc).model_dump(mode="json", by_alias=True)
+        return projected
+
+    def dump_json(self, docs: Iterable[dict]) -> bytes:
+        return orjson.dumps([self.project(doc) for doc in docs])
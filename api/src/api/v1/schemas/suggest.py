@@ -0,0 +1,14 @@
+from uuid import UUID
+
+from pydantic import BaseModel
+
+
+class FilmSuggestion(BaseModel):
+    id: UUID
+    title: str
+    imdb_rating: float | None = None
+
+
+class PersonSuggestion(BaseModel):
+    id: UUID
+    full_name: str
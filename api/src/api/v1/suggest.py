@@ -0,0 +1,13 @@
+from http import HTTPStatus
+
+from fastapi import HTTPException, Response
+
+
+def suggest_response(body: bytes | None) -> Response:
+    """
+    Suggestions serialized by ``SuggestService``, ``None`` until its index is loaded
+    """
+    if body is None:
+        raise HTTPException(status_code=HTTPStatus.SERVICE_UNAVAILABLE, detail="suggestions are not loaded yet")
+
+    return Response(body, media_type="application/json")
@@ -0,0 +1,33 @@
+"""
+Hot responses of the routes, computed in advance by ``services.warmup.CacheWarmer``
+"""
+
+import uuid
+
+from api.v1.caching import CachedEntry
+from api.v1.films import films_page
+from api.v1.genres import genres_list
+from api.v1.persons import persons_search
+from api.v1.schemas.pagination import PaginatedParams
+from core.settings import WarmupSettings
+from services.film import FilmService
+from services.genre import GenreService
+from services.person_film import PersonFilmService
+
+
+def hot_entries(
+    settings: WarmupSettings,
+    film_service: FilmService,
+    genre_service: GenreService,
+    person_film_service: PersonFilmService,
+    genre_ids: list[uuid.UUID],
+) -> list[CachedEntry]:
+    pages = [PaginatedParams(page_number=page, page_size=settings.page_size, cursor=None)
+             for page in range(1, settings.film_pages + 1)]
+    entries = [genres_list(genre_service)]
+    for genre in [None, *genre_ids]:
+        for sort in settings.film_sorts:
+            entries.extend(films_page(film_service, pagination, sort, genre) for pagination in pages)
+    first_page = PaginatedParams(page_number=1, page_size=settings.page_size, cursor=None)
+    entries.extend(persons_search(person_film_service, query, first_page) for query in settings.person_queries)
+    return entries
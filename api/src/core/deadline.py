@@ -0,0 +1,150 @@
+"""
+Deadlines of the requests. The deadline is taken from the ``X-Request-Timeout``
+header (seconds) or the default of the route and kept in a context variable,
+so the service layer bounds the backend calls by the time left.
+Requests abandoned by the client are cancelled together with their backend calls.
+"""
+
+import asyncio
+import math
+import time
+from collections.abc import Awaitable, Callable
+from contextvars import ContextVar
+from typing import TypeVar
+
+from core.settings import DeadlineSettings
+from fastapi import Request
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+TIMEOUT_HEADER = "X-Request-Timeout"
+
+T = TypeVar("T")
+
+# time.monotonic() of the request start and of its deadline
+_started: ContextVar[float | None] = ContextVar("request_started", default=None)
+_deadline: ContextVar[float | None] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceededError(Exception):
+    def __init__(self):
+        super().__init__("request deadline exceeded")
+
+
+def remaining() -> float | None:
+    """
+    Seconds left until the deadline of the current request, ``None`` outside of requests
+    """
+    if (deadline := _deadline.get()) is None:
+        return None
+
+    if (left := deadline - time.monotonic()) <= 0:
+        raise DeadlineExceededError()
+
+    return left
+
+
+def current() -> float | None:
+    """
+    ``time.monotonic()`` of the deadline of the current request, ``None`` outside of requests
+    """
+    return _deadline.get()
+
+
+def exceeded() -> bool:
+    deadline = _deadline.get()
+    return deadline is not None and time.monotonic() >= deadline
+
+
+async def bounded(awaitable: Awaitable[T]) -> T:
+    """
+    Awaits ``awaitable`` no longer than the time left until the deadline of the current request
+    """
+    try:
+        timeout = remaining()
+    except DeadlineExceededError:
+        if asyncio.iscoroutine(awaitable):
+            # not awaited at all
+            awaitable.close()
+        raise
+
+    if timeout is None:
+        return await awaitable
+
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except TimeoutError:
+        raise DeadlineExceededError() from None
+
+
+def route_timeout(timeout_sec: float) -> Callable[[Request], Awaitable[None]]:
+    """
+    Dependency setting the default timeout of a route, a timeout sent by the client takes precedence
+    """
+
+    # async, sync dependencies run in a thread and can't set the context of the request
+    async def set_route_timeout(request: Request) -> None:
+        started = _started.get()
+        if started is not None and TIMEOUT_HEADER not in request.headers:
+            _deadline.set(started + timeout_sec)
+
+    return set_route_timeout
+
+
+class DeadlineMiddleware:
+    def __init__(self, app: ASGIApp, settings: DeadlineSettings | None = None):
+        self.app = app
+        self._settings = settings or DeadlineSettings()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.monotonic()
+        _started.set(started)
+        _deadline.set(started + self._timeout(scope))
+
+        # The messages are pumped to the app through a queue, so the disconnect
+        # is noticed even when the app doesn't read the request.
+        messages: asyncio.Queue[Message] = asyncio.Queue()
+        (response_complete, disconnected) = (False, False)
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_complete
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_complete = True
+
+        app_task = asyncio.create_task(self.app(scope, messages.get, send_wrapper))
+
+        async def pump() -> None:
+            nonlocal disconnected
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    # the server reports the disconnect after the response as well
+                    if not response_complete:
+                        disconnected = True
+                        app_task.cancel()
+                    return
+
+        pump_task = asyncio.create_task(pump())
+        try:
+            await app_task
+        except asyncio.CancelledError:
+            if not disconnected:
+                raise
+        finally:
+            pump_task.cancel()
+            app_task.cancel()
+
+    def _timeout(self, scope: Scope) -> float:
+        try:
+            timeout = float(Headers(scope=scope).get(TIMEOUT_HEADER, "nan"))
+        except ValueError:
+            timeout = math.nan
+
+        # nan is rejected as well
+        return min(timeout, self._settings.max_timeout) if timeout > 0 else self._settings.timeout
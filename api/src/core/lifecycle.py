@@ -1,11 +1,33 @@
+import asyncio
 import logging.config
 from contextlib import asynccontextmanager
+from functools import partial
+from typing import cast
 
-from core.settings import ElasticsearchSettings, RedisSettings
+from api.v1.warmup import hot_entries
+from core.settings import (
+    ChangeFeedSettings,
+    ElasticsearchSettings,
+    GenreCatalogSettings,
+    RedisSettings,
+    SuggestSettings,
+    WarmupSettings,
+)
 from db import elastic, redis
+from db.embedded.client import EmbeddedElasticsearch
 from elasticsearch import AsyncElasticsearch
 from fastapi import FastAPI
 from redis.asyncio import Redis
+from services.change_feed import ChangeFeedConsumer
+from services.film import get_film_service
+from services.genre import get_genre_service
+from services.genre_catalog import catalog as genre_catalog
+from services.health import get_health_prober
+from services.invalidation import get_invalidation_service
+from services.person import get_person_service
+from services.person_film import get_person_film_service
+from services.suggest import get_suggest_service
+from services.warmup import CacheWarmer
 
 logger = logging.getLogger(__name__)
 
@@ -33,15 +55,85 @@ async def lifespan(app: FastAPI):
     Запускается при старте и закрывает соединения при завершении работы приложения.
     """
     elastic_settings = ElasticsearchSettings()
-    elastic.es = AsyncElasticsearch(hosts=[elastic_settings.url])
+    if elastic_settings.engine == "embedded":
+        if not elastic_settings.dump_path:
+            raise ValueError("ES_DUMP_PATH is required by the embedded engine")
+        embedded = await asyncio.to_thread(
+            EmbeddedElasticsearch.from_dump, elastic_settings.dump_path, elastic_settings.schemas_path
+        )
+        # implements the subset of the client used by the services
+        elastic.es = cast(AsyncElasticsearch, embedded)
+    else:
+        elastic.es = AsyncElasticsearch(hosts=[elastic_settings.url])
     redis_settings = RedisSettings()
-    redis.redis = Redis(host=redis_settings.host, port=redis_settings.port, decode_responses=True)
+    # cached values are binary, compressed ones in particular
+    redis.redis = Redis(host=redis_settings.host, port=redis_settings.port, decode_responses=False)
 
     await check_elasticsearch_connection(elastic.es)
     await check_redis_connection(redis.redis)
 
+    background_tasks = [
+        asyncio.create_task(redis.get_cache().listen()),
+        asyncio.create_task(get_health_prober().run(elastic.es, redis.redis)),
+    ]
+
+    genre_catalog_settings = GenreCatalogSettings()
+    if genre_catalog_settings.refresh_interval > 0:
+        try:
+            await genre_catalog.refresh(elastic.es)
+        except Exception as e:
+            logger.error(f"Не удалось загрузить жанры: {e}")
+        catalog_task = genre_catalog.run(elastic.es, genre_catalog_settings.refresh_interval, delay=True)
+        background_tasks.append(asyncio.create_task(catalog_task))
+
+    suggest_settings = SuggestSettings()
+    if suggest_settings.refresh_interval > 0:
+        suggest_service = get_suggest_service(elastic=elastic.es, cache=redis.get_cache())
+        try:
+            await suggest_service.refresh()
+        except Exception as e:
+            logger.error(f"Не удалось загрузить подсказки: {e}")
+        suggest_task = suggest_service.run(suggest_settings.refresh_interval, delay=True)
+        background_tasks.append(asyncio.create_task(suggest_task))
+
+    warmer: CacheWarmer | None = None
+    warmup_settings = WarmupSettings()
+    if warmup_settings.enabled:
+        # same arguments as the dependency injection, so the lru_cache'd services are shared
+        cache = redis.get_cache()
+        film_service = get_film_service(elastic=elastic.es, cache=cache, genre_catalog=genre_catalog)
+        person_service = get_person_service(elastic=elastic.es, cache=cache)
+        genre_service = get_genre_service(elastic=elastic.es, cache=cache, catalog=genre_catalog)
+        person_film_service = get_person_film_service(person=person_service, film=film_service)
+        warmer = CacheWarmer(
+            redis.redis,
+            cache,
+            redis.get_tag_registry(),
+            genre_service,
+            partial(hot_entries, warmup_settings, film_service, genre_service, person_film_service),
+            warmup_settings,
+        )
+        try:
+            # the hot responses are served right after the deploy
+            await asyncio.wait_for(warmer.warm(), warmup_settings.startup_timeout)
+        except Exception as e:
+            logger.error(f"Не удалось прогреть кэш: {e}")
+        background_tasks.append(asyncio.create_task(warmer.run(delay=True)))
+
+    change_feed_settings = ChangeFeedSettings()
+    if change_feed_settings.enabled:
+        invalidation_service = get_invalidation_service(
+            elastic.es, redis.get_cache(), redis.get_tag_registry(), genre_catalog=genre_catalog
+        )
+        # the hot lists and searches are recomputed after the changes when they are warmed up
+        consumer = ChangeFeedConsumer(redis.redis, invalidation_service, change_feed_settings, warmer)
+        background_tasks.append(asyncio.create_task(consumer.run()))
+
     yield
 
     logger.info("Закрываем соеденения.")
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
     await redis.redis.close()
     await elastic.es.close()
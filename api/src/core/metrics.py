@@ -0,0 +1,132 @@
+"""
+Prometheus metrics of the service.
+
+Under gunicorn every worker is a separate process, so ``PROMETHEUS_MULTIPROC_DIR``
+must point to an empty directory shared by the workers (see ``gunicorn.conf.py``),
+the metrics endpoint then aggregates the values of all of them.
+"""
+
+import asyncio
+import os
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+CODEC_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01)
+RATIO_BUCKETS = (0.05, 0.1, 0.15, 0.2, 0.3, 0.4, 0.5, 0.6, 0.8, 1, 1.25)
+SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Time spent processing the request",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+elasticsearch_request_duration = Histogram(
+    "elasticsearch_request_duration_seconds",
+    "Round trip time of the Elasticsearch requests",
+    ["index", "operation"],
+    buckets=LATENCY_BUCKETS,
+)
+elasticsearch_took = Histogram(
+    "elasticsearch_took_seconds",
+    "Time Elasticsearch reports it spent executing the search",
+    ["index", "operation"],
+    buckets=LATENCY_BUCKETS,
+)
+cache_requests = Counter(
+    "cache_requests_total",
+    "Cache lookups and writes by the key prefix",
+    ["prefix", "result"],
+)
+cache_payload_size = Histogram(
+    "cache_payload_bytes",
+    "Size of the values read from and written to the cache",
+    ["prefix", "operation"],
+    buckets=SIZE_BUCKETS,
+)
+change_feed_entries = Counter(
+    "change_feed_entries_total",
+    "Changes of the indices read from the change feed",
+    ["index", "result"],
+)
+circuit_breaker_transitions = Counter(
+    "circuit_breaker_transitions_total",
+    "Circuits of the backends opened and closed",
+    ["backend", "state"],
+)
+cache_compression_ratio = Histogram(
+    "cache_compression_ratio",
+    "Size of the compressed values relative to the original ones",
+    ["prefix", "codec"],
+    buckets=RATIO_BUCKETS,
+)
+cache_codec_duration = Histogram(
+    "cache_codec_duration_seconds",
+    "Time spent compressing and decompressing the cached values",
+    ["codec", "operation"],
+    buckets=CODEC_BUCKETS,
+)
+
+
+@contextmanager
+def observe_elasticsearch(index: str, operation: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elasticsearch_request_duration.labels(index, operation).observe(time.perf_counter() - started)
+
+
+def observe_elasticsearch_took(index: str, operation: str, response: dict) -> None:
+    if (took := response.get("took")) is not None:
+        elasticsearch_took.labels(index, operation).observe(took / 1000)
+
+
+def render() -> tuple[bytes, str]:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return (generate_latest(registry), CONTENT_TYPE_LATEST)
+
+    return (generate_latest(REGISTRY), CONTENT_TYPE_LATEST)
+
+
+class MetricsMiddleware:
+    """
+    Records request latency labeled with the route template (not the raw path)
+    to keep the number of series bounded
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except asyncio.CancelledError:
+            # the client went away, nginx logs it as 499 as well
+            status = 499
+            raise
+        finally:
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            http_request_duration.labels(scope["method"], route_path, status).observe(time.perf_counter() - started)
@@ -0,0 +1,335 @@
+"""
+Sampling profiler of single requests.
+
+A fraction of the requests (``PROFILER_SAMPLE_RATE``) and the requests with
+the ``X-Profile-Token`` header matching ``PROFILER_TOKEN`` are profiled. While
+any of them is in flight a thread takes the stack of the event loop thread every
+``PROFILER_INTERVAL_MS`` with ``sys._current_frames``, so the profiled code runs as is,
+and the thread sleeps while nothing is profiled.
+
+A sample belongs to the request when the loop is running its task or, on Python 3.12+,
+a task spawned by it (e.g. the coroutines it gathers). The rest of the samples
+taken meanwhile show what else kept the loop busy (other requests, the batched Elasticsearch
+queries and the cache misses computed once for several requests) or that it was waiting
+for I/O, the two are rooted at ``[request]`` and ``[loop]``.
+The sampling thread needs the GIL, so while the loop is busy the samples are
+at least ``sys.getswitchinterval()`` apart, each one is weighted by the time it stands for.
+
+Captures are written per route to ``PROFILER_DIRECTORY`` as collapsed stacks
+(flamegraph.pl, speedscope, inferno) or as speedscope JSON, the oldest ones
+beyond ``PROFILER_MAX_CAPTURES`` are deleted. The id of a capture is returned
+in the ``X-Profile-Id`` header of the profiled response.
+"""
+
+import asyncio
+import logging
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from types import CodeType, FrameType
+from typing import cast
+
+import orjson
+from core.settings import ProfilerSettings
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+TOKEN_HEADER = "X-Profile-Token"
+ID_HEADER = "X-Profile-Id"
+
+EXTENSIONS = {"collapsed": ".collapsed.txt", "speedscope": ".speedscope.json"}
+
+# <started>_<duration>ms_<status>_<id><extension>
+_CAPTURE_NAME = re.compile(r"^(\d{8}T\d{6})_(\d+)ms_(\d{3})_([0-9a-f]+)\.")
+_STARTED_FORMAT = "%Y%m%dT%H%M%S"
+
+_logger = logging.getLogger(__name__)
+
+# inherited by the tasks spawned by the profiled request
+_capture: ContextVar["Capture | None"] = ContextVar("profile_capture", default=None)
+
+
+@dataclass(eq=False)
+class Capture:
+    id: str
+    task: asyncio.Task
+    loop: asyncio.AbstractEventLoop
+    thread_id: int
+    started: datetime
+    # stacks, root first, and the seconds each of them stands for
+    samples: list[tuple[str, ...]] = field(default_factory=list)
+    weights: list[float] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class CaptureInfo:
+    id: str
+    route: str
+    status: int
+    duration_ms: int
+    started: datetime
+    path: Path
+
+
+class Sampler:
+    """
+    The thread sampling the stacks of the profiled requests
+    """
+
+    def __init__(self, interval_sec: float, max_samples: int):
+        self._interval_sec = interval_sec
+        self._max_samples = max_samples
+        self._captures: set[Capture] = set()
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._thread: threading.Thread | None = None
+        # names of the functions, formatted once
+        self._names: dict[CodeType, str] = {}
+
+    def start(self, capture: Capture) -> None:
+        with self._lock:
+            self._captures.add(capture)
+            self._active.set()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+
+    def stop(self, capture: Capture) -> None:
+        with self._lock:
+            self._captures.discard(capture)
+            if not self._captures:
+                self._active.clear()
+
+    def _run(self) -> None:
+        while True:
+            self._active.wait()
+            previous = time.monotonic()
+            while self._active.is_set():
+                time.sleep(self._interval_sec)
+                # the sleep takes longer while the loop thread holds the GIL
+                now = time.monotonic()
+                with self._lock:
+                    captures = [capture for capture in self._captures if len(capture.samples) < self._max_samples]
+                if captures:
+                    self._sample(captures, now - previous)
+                previous = now
+
+    def _sample(self, captures: list[Capture], weight: float) -> None:
+        frames = sys._current_frames()
+        stacks: dict[int, tuple[str, ...]] = {}
+        for capture in captures:
+            if capture.thread_id not in stacks:
+                stacks[capture.thread_id] = self._stack(frames.get(capture.thread_id))
+            root = "[request]" if _runs(capture) else "[loop]"
+            capture.samples.append((root, *stacks[capture.thread_id]))
+            capture.weights.append(weight)
+
+    def _stack(self, frame: FrameType | None) -> tuple[str, ...]:
+        names: list[str] = []
+        while frame is not None:
+            code = frame.f_code
+            if (name := self._names.get(code)) is None:
+                name = self._names[code] = f"{code.co_qualname} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+            names.append(name)
+            frame = frame.f_back
+
+        return tuple(reversed(names))
+
+
+def _runs(capture: Capture) -> bool:
+    """
+    Whether the loop of ``capture`` runs a task of its request, called by the sampling thread:
+    the running tasks and the contexts are only looked up, which is safe under the GIL
+    """
+    task = asyncio.current_task(capture.loop)
+    if task is None or task is capture.task:
+        return task is not None
+
+    # Python 3.12+
+    get_context = getattr(task, "get_context", None)
+    return get_context is not None and get_context().get(_capture) is capture
+
+
+class CaptureStore:
+    """
+    Captures in the files ``<directory>/<route>/<started>_<duration>ms_<status>_<id><extension>``,
+    the directory may be shared by the workers. Listing it is what costs, so the oldest
+    captures are deleted once a tenth of ``max_captures`` more are written.
+    """
+
+    def __init__(self, directory: Path, format: str, max_captures: int):
+        self.directory = directory
+        self.format = format
+        self._max_captures = max_captures
+        self._prune_every = max(max_captures // 10, 1)
+        self._written = 0
+
+    @classmethod
+    def from_settings(cls, settings: ProfilerSettings) -> "CaptureStore":
+        return cls(Path(settings.directory), settings.format, settings.max_captures)
+
+    def write(self, capture: Capture, route: str, status: int, duration_sec: float) -> Path:
+        name = f"{capture.started:{_STARTED_FORMAT}}_{round(duration_sec * 1000)}ms_{status}_{capture.id}"
+        path = self.directory / route / (name + EXTENSIONS[self.format])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if self.format == "speedscope":
+            path.write_bytes(speedscope(capture, f"{route} {capture.id}"))
+        else:
+            path.write_bytes(collapsed(capture))
+
+        self._written += 1
+        if self._written % self._prune_every == 0:
+            self._prune()
+        return path
+
+    def list(self, route: str | None = None, limit: int | None = None) -> list[CaptureInfo]:
+        """
+        Captures of ``route`` or of all the routes, the latest first
+        """
+        captures = []
+        for path in self.directory.glob(f"{route or '*'}/*"):
+            if match := _CAPTURE_NAME.match(path.name):
+                (started, duration_ms, status, id) = match.groups()
+                captures.append(CaptureInfo(
+                    id=id,
+                    route=path.parent.name,
+                    status=int(status),
+                    duration_ms=int(duration_ms),
+                    started=datetime.strptime(started, _STARTED_FORMAT).replace(tzinfo=timezone.utc),
+                    path=path,
+                ))
+
+        captures.sort(key=lambda capture: (capture.started, capture.path.name), reverse=True)
+        return captures[:limit]
+
+    def _prune(self) -> None:
+        for capture in self.list()[self._max_captures :]:
+            # may be deleted by another worker already
+            capture.path.unlink(missing_ok=True)
+
+
+def collapsed(capture: Capture) -> bytes:
+    """
+    One line per distinct stack: the frames separated by ``;`` and the number of samples
+    """
+    counts = Counter(";".join(stack) for stack in capture.samples)
+    return "".join(f"{stack} {count}\n" for (stack, count) in counts.items()).encode()
+
+
+def speedscope(capture: Capture, name: str) -> bytes:
+    """
+    Sampled profile of https://www.speedscope.app/file-format-schema.json
+    """
+    frames: dict[str, int] = {}
+    samples = [[frames.setdefault(frame, len(frames)) for frame in stack] for stack in capture.samples]
+    return orjson.dumps({
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "activeProfileIndex": 0,
+        "shared": {"frames": [{"name": frame} for frame in frames]},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": sum(capture.weights),
+            "samples": samples,
+            "weights": capture.weights,
+        }],
+    })
+
+
+def route_name(scope: Scope) -> str:
+    # the route template, e.g. GET_api_v1_films_film_id
+    path = getattr(scope.get("route"), "path", "unmatched")
+    return re.sub(r"\W+", "_", f"{scope['method']} {path}").strip("_")
+
+
+def _short_path(filename: str) -> str:
+    # relative to the application or to the packages
+    for prefix in sorted(sys.path, key=len, reverse=True):
+        if prefix and filename.startswith(prefix):
+            return filename[len(prefix) :].lstrip("/")
+
+    return filename
+
+
+@lru_cache()
+def get_capture_store() -> CaptureStore:
+    return CaptureStore.from_settings(ProfilerSettings())
+
+
+class ProfilerMiddleware:
+    """
+    Profiles the sampled requests, except the ones of the ``exclude`` path prefixes
+    """
+
+    def __init__(self, app: ASGIApp, exclude: tuple[str, ...] = (), settings: ProfilerSettings | None = None):
+        self.app = app
+        self._exclude = exclude
+        self._settings = settings or ProfilerSettings()
+        self._sampler = Sampler(self._settings.interval_ms / 1000, self._settings.max_samples)
+        self._store = CaptureStore.from_settings(self._settings)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._profiled(scope):
+            await self.app(scope, receive, send)
+            return
+
+        capture = Capture(
+            id=secrets.token_hex(8),
+            task=cast(asyncio.Task, asyncio.current_task()),
+            loop=asyncio.get_running_loop(),
+            thread_id=threading.get_ident(),
+            started=datetime.now(timezone.utc),
+        )
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = [*message.get("headers", []), (ID_HEADER.lower().encode(), capture.id.encode())]
+                message = {**message, "headers": headers}
+            await send(message)
+
+        started = time.monotonic()
+        _capture.set(capture)
+        self._sampler.start(capture)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except asyncio.CancelledError:
+            # the client went away
+            status = 499
+            raise
+        finally:
+            self._sampler.stop(capture)
+            # written off the loop and not awaited, the response is sent already
+            asyncio.get_running_loop().run_in_executor(
+                None, self._write, capture, route_name(scope), status, time.monotonic() - started
+            )
+
+    def _profiled(self, scope: Scope) -> bool:
+        if scope["path"].startswith(self._exclude):
+            return False
+
+        if self._settings.token and (token := Headers(scope=scope).get(TOKEN_HEADER)) is not None:
+            if secrets.compare_digest(token.encode(), self._settings.token.encode()):
+                return True
+
+        return self._settings.sample_rate > 0 and random.random() < self._settings.sample_rate
+
+    def _write(self, capture: Capture, route: str, status: int, duration_sec: float) -> None:
+        try:
+            self._store.write(capture, route, status, duration_sec)
+        except OSError as e:
+            _logger.warning(f"Unable to write the profile {capture.id}: {e}")
@@ -1,3 +1,6 @@
+from typing import Literal
+
+from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -7,6 +10,167 @@ class RedisSettings(BaseSettings):
     port: int = 6379
 
 
+class CacheSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="CACHE_")
+    # "two_tier" keeps hot entries in the worker memory in front of Redis
+    backend: Literal["redis", "two_tier"] = "redis"
+    local_max_entries: int = 10_000
+    local_max_bytes: int = 64 * 1024 * 1024
+    local_ttl: int = 30
+    # coalescing of the concurrent misses: within the worker or across all of them
+    single_flight: Literal["none", "local", "distributed"] = "local"
+    lock_timeout: float = 10
+    lock_wait_timeout: float = 5
+    # the larger the earlier stale-while-revalidate entries are refreshed
+    early_refresh_beta: float = 1.0
+    # compression of the values stored in Redis, smaller values are stored as is
+    codec: Literal["none", "zlib", "zstd"] = "zstd"
+    compress_min_bytes: int = 1024
+    compress_level: int = 3
+    # how long a worker uses the namespace versions of the indices before rereading them
+    tag_version_ttl: float = 1
+    # token of the invalidation API (X-Invalidation-Token header), the API is disabled if not set
+    invalidation_token: str | None = None
+
+
 class ElasticsearchSettings(BaseSettings):
     model_config = SettingsConfigDict(env_prefix="ES_")
     url: str = ""
+    # from + size limit of the indices, deeper pages are available only with cursors
+    max_result_window: int = 10_000
+    # keep alive of the point in time backing cursor pagination, e.g. "1m", disabled if not set
+    pit_keep_alive: str | None = None
+    # "embedded" serves the indices from the worker memory instead of the cluster,
+    # loaded from a bulk API dump (dump_path) with the mappings of schemas_path/<index>.json
+    engine: Literal["elasticsearch", "embedded"] = "elasticsearch"
+    dump_path: str | None = None
+    schemas_path: str | None = None
+    # concurrent gets and searches of the services are sent together, see ``services.query_batcher``
+    batch_queries: bool = True
+    # how long the first query of a batch waits for the others, 0 is until the next event loop tick
+    batch_window_ms: float = 0
+
+
+class EntityCacheSettings(BaseSettings):
+    """
+    TTL of the documents cached by id, per index
+    """
+
+    model_config = SettingsConfigDict(env_prefix="ENTITY_CACHE_")
+    movies_ttl: int = 60 * 5
+    persons_ttl: int = 60 * 5
+    genres_ttl: int = 60 * 60
+
+    def ttl(self, index: str) -> int:
+        return getattr(self, f"{index}_ttl")
+
+
+class CircuitBreakerSettings(BaseSettings):
+    """
+    Circuit breakers of Elasticsearch and Redis, see ``services.health``
+    """
+
+    model_config = SettingsConfigDict(env_prefix="CIRCUIT_BREAKER_")
+    # consecutive failed calls opening the circuit
+    failure_threshold: int = 5
+    # how long an open circuit fails fast before a trial call is let through
+    reset_timeout: float = 10
+    # the backends are pinged that often, /health returns the result of the last probe
+    probe_interval: float = 5
+    probe_timeout: float = 1
+
+
+class DeadlineSettings(BaseSettings):
+    """
+    Deadlines of the requests, see ``core.deadline``
+    """
+
+    model_config = SettingsConfigDict(env_prefix="DEADLINE_")
+    # used if neither the client nor the route sets the timeout
+    timeout: float = 10
+    # upper bound of the timeouts sent by the clients
+    max_timeout: float = 60
+
+
+class GenreCatalogSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="GENRE_CATALOG_")
+    # 0 disables the in-memory catalog, genres are read from Elasticsearch then
+    refresh_interval: int = 60
+
+
+class SuggestSettings(BaseSettings):
+    """
+    In-memory typeahead of titles and names, see ``services.suggest``
+    """
+
+    model_config = SettingsConfigDict(env_prefix="SUGGEST_")
+    # 0 disables the suggestions
+    refresh_interval: int = 60 * 5
+
+
+class ChangeFeedSettings(BaseSettings):
+    """
+    Redis stream the ETL publishes the reindexed documents to, see ``services.change_feed``
+    """
+
+    model_config = SettingsConfigDict(env_prefix="CHANGE_FEED_")
+    enabled: bool = True
+    stream: str = "etl:changes"
+    # every change is handled by one of the workers of the group
+    group: str = "api"
+    batch_size: int = 100
+    block_ms: int = 5000
+    # changes taken by a worker which didn't acknowledge them for that long are handled again
+    claim_idle_sec: int = 60
+
+
+class ExportSettings(BaseSettings):
+    """
+    Streaming export of the indices, see ``services.export``
+    """
+
+    model_config = SettingsConfigDict(env_prefix="EXPORT_")
+    # documents read from Elasticsearch and sent to the client at once
+    page_size: int = 1000
+    # the point in time is extended by every page, so it's the longest pause of a slow client
+    pit_keep_alive: str = "1m"
+
+
+class WarmupSettings(BaseSettings):
+    """
+    Hot responses computed in advance by one of the workers, see ``api.v1.warmup``
+    """
+
+    model_config = SettingsConfigDict(env_prefix="WARMUP_")
+    enabled: bool = True
+    # shorter than the TTL of the responses so the hot ones never expire
+    interval: int = 60 * 4
+    # how long the worker doing the startup warm-up may delay the startup
+    startup_timeout: float = 30
+    concurrency: int = 4
+    page_size: int = 10
+    # first pages of /films, of all films and of every genre
+    film_pages: int = 3
+    film_sorts: list[Literal["imdb_rating", "-imdb_rating"]] = ["imdb_rating", "-imdb_rating"]
+    # first pages of the popular person searches
+    person_queries: list[str] = []
+
+
+class ProfilerSettings(BaseSettings):
+    """
+    Sampling profiler of single requests, see ``core.profiler``
+    """
+
+    model_config = SettingsConfigDict(env_prefix="PROFILER_")
+    # fraction of the requests profiled, 0 profiles only the requests with the token
+    sample_rate: float = Field(0, ge=0, le=1)
+    # token of the requests profiled on demand (X-Profile-Token header) and of the list of the captures,
+    # both are disabled if not set
+    token: str | None = None
+    interval_ms: float = Field(5, gt=0)
+    # longer requests keep only the beginning
+    max_samples: int = 10_000
+    directory: str = "/tmp/profiles"
+    format: Literal["collapsed", "speedscope"] = "collapsed"
+    # the oldest captures are deleted
+    max_captures: int = 200
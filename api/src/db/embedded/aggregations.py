@@ -0,0 +1,75 @@
+"""
+Subset of the aggregations: ``terms`` (by document count) and ``range``
+over the documents matched by the query, without sub-aggregations.
+"""
+
+from collections import Counter
+from collections.abc import Collection
+from typing import Any
+
+from db.embedded.index import Index
+from db.embedded.query import QueryError, check_options
+
+
+def aggregate(aggregations: dict, index: Index, numbers: Collection[int]) -> dict:
+    """
+    Results of ``aggregations`` by name, ``numbers`` are the matching documents
+    """
+    results = {}
+    for (name, aggregation) in aggregations.items():
+        kinds = set(aggregation) - {"meta"}
+        if len(kinds) != 1:
+            raise QueryError(f"aggregation must have exactly one type: {name}")
+
+        (kind,) = kinds
+        if kind == "terms":
+            check_options(kind, aggregation[kind], {"field", "size"})
+            results[name] = _terms(aggregation[kind], index, numbers)
+        elif kind == "range":
+            check_options(kind, aggregation[kind], {"field", "ranges"})
+            results[name] = _range(aggregation[kind], index, numbers)
+        else:
+            raise QueryError(f"unsupported aggregation {kind}")
+
+    return results
+
+
+def _terms(options: dict, index: Index, numbers: Collection[int]) -> dict:
+    counts: Counter[Any] = Counter()
+    for number in numbers:
+        # a document is counted once per distinct value
+        counts.update(set(index.values(index.sources[number], options["field"])))
+
+    size = options.get("size", 10)
+    ordered = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    return {
+        "doc_count_error_upper_bound": 0,
+        "sum_other_doc_count": sum(count for (_, count) in ordered[size:]),
+        "buckets": [{"key": key, "doc_count": count} for (key, count) in ordered[:size]],
+    }
+
+
+def _range(options: dict, index: Index, numbers: Collection[int]) -> dict:
+    found = [index.values(index.sources[number], options["field"]) for number in numbers]
+    buckets = []
+    for bounds in options["ranges"]:
+        check_options("range bucket", bounds, {"from", "to", "key"})
+        (start, end) = (bounds.get("from"), bounds.get("to"))
+
+        def contains(value: Any) -> bool:
+            # from is included, to is not
+            return (start is None or value >= start) and (end is None or value < end)
+
+        bucket: dict[str, Any] = {"key": bounds.get("key") or f"{_bound(start)}-{_bound(end)}"}
+        if start is not None:
+            bucket["from"] = float(start)
+        if end is not None:
+            bucket["to"] = float(end)
+        bucket["doc_count"] = sum(1 for values in found if any(contains(value) for value in values))
+        buckets.append(bucket)
+
+    return {"buckets": buckets}
+
+
+def _bound(value: float | None) -> str:
+    return "*" if value is None else str(float(value))
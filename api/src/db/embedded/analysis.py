@@ -0,0 +1,51 @@
+import re
+from functools import lru_cache
+
+_TOKEN = re.compile(r"\w+")
+
+
+def analyze(text: str) -> list[str]:
+    """
+    Lowercased words. Stop words and stemming of the ``ru_en`` analyzer
+    of the indices are not reproduced.
+    """
+    return _TOKEN.findall(text.lower())
+
+
+def fuzziness(term: str, fuzziness: str | int | None) -> int:
+    if fuzziness is None:
+        return 0
+    if isinstance(fuzziness, int) or str(fuzziness).isdigit():
+        return min(int(fuzziness), 2)
+    if str(fuzziness).upper() != "AUTO":
+        raise ValueError(f"unsupported fuzziness {fuzziness}")
+
+    # AUTO:3,6
+    if len(term) < 3:
+        return 0
+    return 1 if len(term) < 6 else 2
+
+
+@lru_cache(maxsize=65536)
+def edit_distance(left: str, right: str, limit: int) -> int:
+    """
+    Damerau-Levenshtein (optimal string alignment) distance,
+    anything above ``limit`` is reported as ``limit + 1``
+    """
+    if abs(len(left) - len(right)) > limit:
+        return limit + 1
+
+    previous2: list[int] = []
+    previous = list(range(len(right) + 1))
+    for (i, left_char) in enumerate(left, 1):
+        current = [i] + [0] * len(right)
+        for (j, right_char) in enumerate(right, 1):
+            cost = 0 if left_char == right_char else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and left_char == right[j - 2] and left[i - 2] == right_char:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        (previous2, previous) = (previous, current)
+
+    return min(previous[-1], limit + 1)
@@ -0,0 +1,546 @@
+import asyncio
+import base64
+import heapq
+import json
+import logging
+import math
+import sys
+import time
+from bisect import bisect_right
+from collections.abc import Callable, Iterable, Iterator
+from functools import cmp_to_key
+from itertools import islice
+from pathlib import Path
+from typing import Any
+
+from db.embedded.aggregations import aggregate
+from db.embedded.index import Index
+from db.embedded.query import InnerHit, QueryError, Scope, check_options, compile_query, wrap
+from elasticsearch import NotFoundError, RequestError, TransportError
+
+logger = logging.getLogger(__name__)
+
+# sort values of the documents missing the field, as reported by Elasticsearch for numbers
+_MISSING_LAST = {False: math.inf, True: -math.inf}
+
+# options of the search body the engine implements, totals are always exact
+_SEARCH_OPTIONS = {
+    "query",
+    "size",
+    "from",
+    "sort",
+    "search_after",
+    "pit",
+    "_source",
+    "docvalue_fields",
+    "aggs",
+    "aggregations",
+    "track_total_hits",
+}
+
+
+class EmbeddedElasticsearch:
+    """
+    In-process replacement of ``AsyncElasticsearch`` for small catalogs.
+    The indices are read only and kept in memory, only the requests
+    sent by the services are implemented. Searches score and sort the documents
+    in Python, so they run in threads not to block the event loop.
+    """
+
+    def __init__(self, indices: dict[str, Index]):
+        self.indices = indices
+        self.transport = _Transport(self)
+        # all the documents of an index in the order of a sort, the indices never change
+        self._orders: dict[tuple[str, tuple], list[tuple[tuple, int]]] = {}
+
+    @classmethod
+    def from_dump(cls, dump_path: str, schemas_path: str | None = None) -> "EmbeddedElasticsearch":
+        """
+        Loads a bulk API dump (action and document lines). Mappings are read from
+        ``<index>.json`` files of ``schemas_path``, types of the fields of indices
+        without one are guessed from the documents.
+        """
+        mappings: dict[str, dict] = {}
+        if schemas_path:
+            for path in Path(schemas_path).glob("*.json"):
+                mappings[path.stem] = json.loads(path.read_text()).get("mappings", {})
+
+        indices = {name: Index(name, mapping) for (name, mapping) in mappings.items()}
+        with open(dump_path, encoding="utf-8") as dump:
+            for (action, source) in _read_bulk(dump):
+                index = action["_index"]
+                if index not in indices:
+                    indices[index] = Index(index)
+                indices[index].add(str(action.get("_id") or source["id"]), source)
+
+        for index in indices.values():
+            logger.info(f"Индекс {index.name} загружен: {len(index)} документов")
+        return cls(indices)
+
+    async def ping(self, **kwargs) -> bool:
+        return True
+
+    async def info(self, **kwargs) -> dict:
+        return {"name": "embedded", "version": {"number": "embedded"}}
+
+    async def close(self) -> None:
+        pass
+
+    async def get(self, index: str, id: str, **kwargs) -> dict:
+        source = self._index(index)
+        if (number := source.numbers.get(str(id))) is None:
+            raise NotFoundError(404, "not_found", {"_index": index, "_id": str(id), "found": False})
+
+        return {"_index": index, "_id": str(id), "found": True, "_source": source.sources[number]}
+
+    async def mget(self, body: dict, index: str | None = None, **kwargs) -> dict:
+        if "ids" in body:
+            self._index(index)
+            requested = [(index, id) for id in body["ids"]]
+        else:
+            # documents of missing indices come with an error
+            requested = [(doc.get("_index", index), doc["_id"]) for doc in body["docs"]]
+
+        docs = []
+        for (name, id) in requested:
+            if name not in self.indices:
+                error = {"type": "index_not_found_exception", "reason": f"no such index [{name}]"}
+                docs.append({"_index": name, "_id": str(id), "error": error})
+                continue
+            source = self.indices[name]
+            number = source.numbers.get(str(id))
+            doc: dict[str, Any] = {"_index": name, "_id": str(id), "found": number is not None}
+            if number is not None:
+                doc["_source"] = source.sources[number]
+            docs.append(doc)
+
+        return {"docs": docs}
+
+    async def search(self, body: dict | None = None, index: str | None = None, **kwargs) -> dict:
+        return await asyncio.to_thread(self._timed_search, body or {}, index)
+
+    async def msearch(self, body: list[dict], index: str | None = None, **kwargs) -> dict:
+        started = time.perf_counter()
+        # the whole batch in one thread
+        responses = await asyncio.to_thread(self._msearch, body, index)
+        return {"took": int((time.perf_counter() - started) * 1000), "responses": responses}
+
+    def _msearch(self, body: list[dict], index: str | None) -> list[dict]:
+        responses = []
+        for (header, search) in zip(body[::2], body[1::2]):
+            try:
+                responses.append({**self._timed_search(search, header.get("index", index)), "status": 200})
+            except TransportError as e:
+                responses.append({"error": {"type": e.error, "reason": str(e.info)}, "status": e.status_code})
+        return responses
+
+    def _timed_search(self, body: dict, index: str | None) -> dict:
+        pit = body.get("pit")
+        if pit is not None:
+            index = _decode_pit(pit["id"])
+        if index is None:
+            raise RequestError(400, "action_request_validation_exception", "index is required")
+
+        started = time.perf_counter()
+        response = self._search(self._index(index), body)
+        response["took"] = int((time.perf_counter() - started) * 1000)
+        if pit is not None:
+            response["pit_id"] = pit["id"]
+        return response
+
+    def _search(self, index: Index, body: dict) -> dict:
+        try:
+            check_options("search", body, _SEARCH_OPTIONS)
+            query = compile_query(body.get("query", {"match_all": {}}), index)
+            sort = _sort_clauses(body.get("sort"))
+        except (QueryError, KeyError, TypeError, ValueError) as e:
+            raise RequestError(400, "parsing_exception", str(e)) from e
+
+        size = body.get("size", 10)
+        skip = body.get("from", 0)
+        if "search_after" not in body and skip + size > index.max_result_window:
+            raise RequestError(400, "illegal_argument_exception", "Result window is too large")
+
+        # scores of the matching documents, None when every document matches with the constant score
+        scores: dict[int, float] | None = None
+        inner_hits: dict[int, dict[str, list[InnerHit]]] = {}
+        candidates = query.candidates()
+        if (constant := query.constant_score()) is not None:
+            if candidates is not None:
+                scores = dict.fromkeys(candidates, constant)
+        else:
+            scores = {}
+            for number in candidates if candidates is not None else range(len(index)):
+                scope = Scope(number, index.sources[number], {})
+                if (score := query.score(scope)) is not None:
+                    scores[number] = score
+                    if scope.inner_hits:
+                        inner_hits[number] = scope.inner_hits
+
+        def score_of(number: int) -> float:
+            if scores is None:
+                return constant  # type: ignore[return-value]
+            # the order of the whole index is built for the documents not matching as well,
+            # it's never sorted by the score
+            return scores.get(number, 0.0)
+
+        after = body.get("search_after")
+        if after is not None:
+            after = [_from_cursor(value) for value in after]
+            skip = 0
+        numbers = self._sorted(index, sort, scores, score_of, after, skip + size)[skip:]
+
+        # every hit has all the inner hits of the query, empty for the nested queries it didn't match by
+        inner_hits_options = dict(_inner_hits_options(body.get("query", {})))
+        explicit_sort = body.get("sort") is not None
+        requested_sort = len(_sort_clauses(body.get("sort"), tiebreaker=False))
+        hits = []
+        for number in numbers:
+            score = score_of(number)
+            hit = self._hit(index, number, score if not explicit_sort or _sorted_by_score(sort) else None, body)
+            if explicit_sort:
+                hit["sort"] = self._sort_values(index, sort, number, score)[:requested_sort]
+            if inner_hits_options:
+                hit["inner_hits"] = _inner_hits(index, number, inner_hits_options, inner_hits.get(number, {}))
+            hits.append(hit)
+
+        total = len(index) if scores is None else len(scores)
+        response: dict[str, Any] = {
+            "timed_out": False,
+            "_shards": {"total": 1, "successful": 1, "skipped": 0, "failed": 0},
+            "hits": {
+                "total": {"value": total, "relation": "eq"},
+                "max_score": (constant if scores is None else max(scores.values(), default=None)) if total else None,
+                "hits": hits,
+            },
+        }
+        if aggregations := body.get("aggs") or body.get("aggregations"):
+            try:
+                matching = range(len(index)) if scores is None else scores.keys()
+                response["aggregations"] = aggregate(aggregations, index, matching)
+            except (QueryError, KeyError, TypeError) as e:
+                raise RequestError(400, "parsing_exception", str(e)) from e
+        return response
+
+    def _sorted(
+        self,
+        index: Index,
+        sort: list[tuple[str, str]],
+        scores: dict[int, float] | None,
+        score_of: Callable[[int], float],
+        after: list[Any] | None,
+        limit: int,
+    ) -> list[int]:
+        """
+        First ``limit`` matching documents in the ``sort`` order after the ``after`` sort values
+        """
+        if limit <= 0:
+            # size 0, only the totals and the aggregations are read
+            return []
+
+        descending = [order == "desc" for (_, order) in sort]
+        after_key = _sort_key(after, descending) if after is not None else None
+
+        def key(number: int) -> tuple | None:
+            return _sort_key(self._sort_values(index, sort, number, score_of(number)), descending)
+
+        keyable = all(
+            not desc or path in ("_score", "_doc", "_shard_doc") or index.type_of(path) in ("number", "boolean")
+            for ((path, _), desc) in zip(sort, descending)
+        )
+        if not keyable or after is not None and after_key is None:
+            # descending strings can't be turned into keys, compare the values
+            return self._sorted_by_comparison(index, sort, scores, score_of, after, limit)
+
+        by_score = _sorted_by_score(sort)
+        if scores is not None and (by_score or len(scores) * 16 < len(index)):
+            keyed = ((key(number), number) for number in scores)
+            if after_key is not None:
+                keyed = (item for item in keyed if item[0][:len(after_key)] > after_key)  # type: ignore[index]
+            return [number for (_, number) in heapq.nsmallest(limit, keyed)]  # type: ignore[type-var]
+
+        # most of the documents match, walk the whole index in the sort order (built once per sort)
+        if (cache_key := (index.name, tuple(sort))) not in self._orders:
+            self._orders[cache_key] = sorted((key(number), number) for number in range(len(index)))  # type: ignore
+        order = self._orders[cache_key]
+        start = 0 if after_key is None else bisect_right(order, after_key, key=lambda item: item[0][:len(after_key)])
+        result = []
+        for (_, number) in islice(order, start, None):
+            if scores is None or number in scores:
+                result.append(number)
+                if len(result) == limit:
+                    break
+        return result
+
+    def _sorted_by_comparison(
+        self,
+        index: Index,
+        sort: list[tuple[str, str]],
+        scores: dict[int, float] | None,
+        score_of: Callable[[int], float],
+        after: list[Any] | None,
+        limit: int,
+    ) -> list[int]:
+        descending = [order == "desc" for (_, order) in sort]
+        values = {
+            number: self._sort_values(index, sort, number, score_of(number))
+            for number in (scores if scores is not None else range(len(index)))
+        }
+
+        def compare(left: list[Any], right: list[Any]) -> int:
+            return _compare(left, right, descending)
+
+        numbers = sorted(values, key=lambda number: cmp_to_key(compare)(values[number]))
+        if after is not None:
+            numbers = [number for number in numbers if compare(values[number][:len(after)], after) > 0]
+        return numbers[:limit]
+
+    def _hit(self, index: Index, number: int, score: float | None, body: dict) -> dict:
+        source = index.sources[number]
+        hit: dict[str, Any] = {"_index": index.name, "_id": index.ids[number], "_score": score}
+        if (projected := _project(source, body.get("_source", True))) is not None:
+            hit["_source"] = projected
+        if fields := body.get("docvalue_fields"):
+            hit["fields"] = _docvalue_fields(index, source, fields)
+        return hit
+
+    def _sort_values(self, index: Index, sort: list[tuple[str, str]], number: int, score: float) -> list[Any]:
+        result: list[Any] = []
+        for (path, order) in sort:
+            if path == "_score":
+                result.append(score)
+            elif path in ("_doc", "_shard_doc"):
+                result.append(number)
+            else:
+                if index.type_of(path) == "text":
+                    raise RequestError(400, "illegal_argument_exception", f"Text fields are not sortable: {path}")
+                found = index.values(index.sources[number], path)
+                if found:
+                    result.append(max(found) if order == "desc" else min(found))
+                elif index.type_of(path) == "number":
+                    result.append(_MISSING_LAST[order == "desc"])
+                else:
+                    result.append(None)
+        return result
+
+    def _index(self, name: str | None) -> Index:
+        if name not in self.indices:
+            raise NotFoundError(404, "index_not_found_exception", {"index": name})
+        return self.indices[name]
+
+
+class _Transport:
+    """
+    Point in time requests, the indices never change so any id is always valid
+    """
+
+    def __init__(self, client: EmbeddedElasticsearch):
+        self._client = client
+
+    async def perform_request(self, method: str, url: str, params: dict | None = None, body: Any = None) -> dict:
+        parts = url.strip("/").split("/")
+        if method == "POST" and len(parts) == 2 and parts[1] == "_pit":
+            self._client._index(parts[0])
+            return {"id": _encode_pit(parts[0])}
+        if method == "DELETE" and parts == ["_pit"]:
+            return {"succeeded": True, "num_freed": 1}
+
+        raise RequestError(400, "unsupported_request", f"{method} {url}")
+
+
+def _read_bulk(lines: Iterable[str]) -> Iterator[tuple[dict, dict]]:
+    lines = (line for line in lines if line.strip())
+    for line in lines:
+        ((kind, action),) = json.loads(line).items()
+        if kind == "delete":
+            raise ValueError("delete actions are not supported in dumps")
+        yield (action, json.loads(next(lines)))
+
+
+def _sort_clauses(sort: Any, tiebreaker: bool = True) -> list[tuple[str, str]]:
+    """
+    Normalized ``sort``, by default with the document order as the last tiebreaker
+    """
+    if sort is None:
+        sort = [{"_score": "desc"}]
+    if not isinstance(sort, list):
+        sort = [sort]
+
+    clauses = []
+    for item in sort:
+        if isinstance(item, str):
+            clauses.append((item, "desc" if item == "_score" else "asc"))
+            continue
+        for (path, options) in item.items():
+            if isinstance(options, dict):
+                check_options("sort", options, {"order"})
+            order = options.get("order", "asc") if isinstance(options, dict) else options
+            if order not in ("asc", "desc"):
+                raise QueryError(f"unsupported sort order {order}")
+            clauses.append((path, order))
+
+    if tiebreaker and not any(path in ("_doc", "_shard_doc") for (path, _) in clauses):
+        clauses.append(("_doc", "asc"))
+    return clauses
+
+
+def _sorted_by_score(sort: list[tuple[str, str]]) -> bool:
+    return any(path == "_score" for (path, _) in sort)
+
+
+def _compare(left: list[Any], right: list[Any], descending: list[bool]) -> int:
+    for (left_value, right_value, desc) in zip(left, right, descending):
+        if left_value == right_value:
+            continue
+        # documents without the field are the last in both directions
+        if left_value is None:
+            return 1
+        if right_value is None:
+            return -1
+        result = -1 if left_value < right_value else 1
+        return -result if desc else result
+
+    return 0
+
+
+def _sort_key(values: list[Any], descending: list[bool]) -> tuple | None:
+    """
+    Key sorting the values like ``_compare``, ``None`` if there is a descending string
+    """
+    parts = []
+    for (value, desc) in zip(values, descending):
+        if value is None or isinstance(value, float) and math.isinf(value):
+            # missing, the last in both directions
+            parts.append((1, 0))
+        elif not desc:
+            parts.append((0, value))
+        elif isinstance(value, int | float):
+            parts.append((0, -value))
+        else:
+            return None
+    return tuple(parts)
+
+
+def _from_cursor(value: Any) -> Any:
+    # cursors replace infinite sort values with the largest floats
+    if isinstance(value, float) and abs(value) >= sys.float_info.max:
+        return math.copysign(math.inf, value)
+    return value
+
+
+def _inner_hits(
+    index: Index, number: int, options: dict[str, tuple[str, dict]], found: dict[str, list[InnerHit]]
+) -> dict:
+    result = {}
+    for (name, (path, option)) in options.items():
+        hits = found.get(name, [])
+        ordered = sorted(hits, key=lambda hit: (-hit.score, hit.offset))
+        start = option.get("from", 0)
+        selected = ordered[start:start + option.get("size", 3)]
+        inner = []
+        for hit in selected:
+            item: dict[str, Any] = {
+                "_index": index.name,
+                "_id": index.ids[number],
+                "_nested": {"field": path, "offset": hit.offset},
+                "_score": hit.score,
+            }
+            wrapped = wrap(path, hit.source)
+            if (projected := _project(hit.source, option.get("_source", True))) is not None:
+                item["_source"] = projected
+            if fields := option.get("docvalue_fields"):
+                item["fields"] = _docvalue_fields(index, wrapped, fields)
+            inner.append(item)
+
+        result[name] = {
+            "hits": {
+                "total": {"value": len(hits), "relation": "eq"},
+                "max_score": ordered[0].score if ordered else None,
+                "hits": inner,
+            }
+        }
+    return result
+
+
+def _inner_hits_options(query: Any) -> Iterator[tuple[str, tuple[str, dict]]]:
+    if isinstance(query, list):
+        for item in query:
+            yield from _inner_hits_options(item)
+    elif isinstance(query, dict):
+        if isinstance(nested := query.get("nested"), dict) and "inner_hits" in nested:
+            options = nested["inner_hits"]
+            yield (options.get("name") or nested["path"], (nested["path"], options))
+        for value in query.values():
+            yield from _inner_hits_options(value)
+
+
+def _docvalue_fields(index: Index, source: dict, fields: list) -> dict[str, list]:
+    result = {}
+    for field in fields:
+        path = field["field"] if isinstance(field, dict) else field
+        if found := index.values(source, path):
+            result[path] = found
+    return result
+
+
+def _project(source: dict, option: Any) -> dict | None:
+    if option is True:
+        return source
+    if option is False:
+        return None
+    if isinstance(option, str):
+        option = [option]
+    if isinstance(option, list):
+        option = {"includes": option}
+
+    includes = option.get("includes") or []
+    projected = _include(source, includes) if includes else source
+    for path in option.get("excludes", []):
+        projected = _exclude(projected, path.split("."))
+    return projected
+
+
+def _include(source: dict, paths: list[str]) -> dict:
+    result: dict[str, Any] = {}
+    nested: dict[str, list[str]] = {}
+    for path in paths:
+        (head, _, rest) = path.partition(".")
+        if rest:
+            nested.setdefault(head, []).append(rest)
+        elif head in source:
+            result[head] = source[head]
+
+    for (head, rest) in nested.items():
+        if head in result:
+            continue
+        value = source.get(head)
+        if isinstance(value, list):
+            result[head] = [_include(item, rest) if isinstance(item, dict) else item for item in value]
+        elif isinstance(value, dict):
+            result[head] = _include(value, rest)
+    return result
+
+
+def _exclude(source: dict, parts: list[str]) -> dict:
+    if parts[0] not in source:
+        return source
+
+    result = dict(source)
+    if len(parts) == 1:
+        del result[parts[0]]
+    elif isinstance(value := result[parts[0]], dict):
+        result[parts[0]] = _exclude(value, parts[1:])
+    elif isinstance(value, list):
+        result[parts[0]] = [_exclude(item, parts[1:]) if isinstance(item, dict) else item for item in value]
+    return result
+
+
+def _encode_pit(index: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"index": index}).encode()).decode()
+
+
+def _decode_pit(pit_id: str) -> str:
+    try:
+        return json.loads(base64.urlsafe_b64decode(pit_id))["index"]
+    except (ValueError, KeyError, TypeError):
+        raise NotFoundError(404, "search_context_missing_exception", {"pit_id": pit_id}) from None
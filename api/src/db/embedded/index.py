@@ -0,0 +1,174 @@
+from collections import Counter, defaultdict
+from collections.abc import Iterator
+from typing import Any, Literal
+
+from db.embedded.analysis import analyze
+
+# "string" is a field without a mapping, searchable both as text and as keyword
+FieldType = Literal["text", "keyword", "number", "boolean", "nested", "object", "string"]
+
+_MAPPING_TYPES: dict[str, FieldType] = {
+    "text": "text",
+    "keyword": "keyword",
+    "long": "number",
+    "integer": "number",
+    "short": "number",
+    "float": "number",
+    "double": "number",
+    "half_float": "number",
+    "scaled_float": "number",
+    "boolean": "boolean",
+    "nested": "nested",
+    "object": "object",
+}
+
+
+def values(source: dict, path: str) -> list[Any]:
+    """
+    Values found by the dotted ``path``, lists are traversed
+    """
+    current: list[Any] = [source]
+    for part in path.split("."):
+        found: list[Any] = []
+        for item in current:
+            if isinstance(item, dict) and (value := item.get(part)) is not None:
+                if isinstance(value, list):
+                    found.extend(value)
+                else:
+                    found.append(value)
+        current = found
+
+    return current
+
+
+class Index:
+    """
+    Documents of one index together with the postings of every field.
+    Postings are per document, for nested fields as well, the exact
+    matching of the nested objects is left to the queries.
+    """
+
+    def __init__(self, name: str, mappings: dict | None = None, max_result_window: int = 10_000):
+        self.name = name
+        self.max_result_window = max_result_window
+        self.types: dict[str, FieldType] = {}
+        # keyword sub-fields, e.g. title.raw -> title
+        self.subfields: dict[str, str] = {}
+        self._subfields_of: dict[str, list[str]] = defaultdict(list)
+        self.sources: list[dict] = []
+        self.ids: list[str] = []
+        self.numbers: dict[str, int] = {}
+        # path -> exact value -> documents
+        self.keywords: dict[str, dict[Any, set[int]]] = defaultdict(lambda: defaultdict(set))
+        # path -> token -> documents
+        self.tokens: dict[str, dict[str, set[int]]] = defaultdict(lambda: defaultdict(set))
+        # path -> document -> number of every token, the text fields outside of nested objects only
+        self.frequencies: dict[str, dict[int, Counter[str]]] = defaultdict(dict)
+        self._token_count: dict[str, int] = defaultdict(int)
+        self._by_length: dict[str, dict[int, list[str]]] = {}
+        if mappings:
+            self._read_mappings(mappings.get("properties", {}), "")
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+    def add(self, id: str, source: dict) -> None:
+        if id in self.numbers:
+            raise ValueError(f"duplicate document {id} in {self.name}")
+
+        number = len(self.sources)
+        self.sources.append(source)
+        self.ids.append(id)
+        self.numbers[id] = number
+        for (path, value) in self._leaves(source, ""):
+            self._index_value(number, path, value)
+
+        self._by_length.clear()
+
+    def type_of(self, path: str) -> FieldType | None:
+        if path in self.subfields:
+            return "keyword"
+
+        return self.types.get(path)
+
+    def values(self, source: dict, path: str) -> list[Any]:
+        return values(source, self.subfields.get(path, path))
+
+    def average_length(self, path: str) -> float:
+        return self._token_count[path] / len(self.sources) if self.sources else 0.0
+
+    def document_frequency(self, path: str, token: str) -> int:
+        return len(self.tokens[path].get(token, ()))
+
+    def similar_tokens(self, path: str, length: int, distance: int) -> Iterator[str]:
+        """
+        Tokens of the field which are not further than ``distance`` by length
+        """
+        if path not in self._by_length:
+            by_length: dict[int, list[str]] = defaultdict(list)
+            for token in self.tokens.get(path, {}):
+                by_length[len(token)].append(token)
+            self._by_length[path] = by_length
+
+        by_length = self._by_length[path]
+        for size in range(length - distance, length + distance + 1):
+            yield from by_length.get(size, ())
+
+    def _in_nested(self, path: str) -> bool:
+        parts = path.split(".")
+        return any(self.types.get(".".join(parts[:size])) == "nested" for size in range(1, len(parts)))
+
+    def _read_mappings(self, properties: dict, prefix: str) -> None:
+        for (name, field) in properties.items():
+            path = prefix + name
+            if "properties" in field:
+                self.types[path] = _MAPPING_TYPES.get(field.get("type", "object"), "object")
+                self._read_mappings(field["properties"], path + ".")
+                continue
+
+            self.types[path] = _MAPPING_TYPES.get(field.get("type", "keyword"), "keyword")
+            for (subname, subfield) in field.get("fields", {}).items():
+                if subfield.get("type") == "keyword":
+                    self.subfields[f"{path}.{subname}"] = path
+                    self._subfields_of[path].append(f"{path}.{subname}")
+
+    def _leaves(self, value: Any, path: str) -> Iterator[tuple[str, Any]]:
+        if isinstance(value, dict):
+            if path and path not in self.types:
+                self.types[path] = "object"
+            for (key, item) in value.items():
+                yield from self._leaves(item, f"{path}.{key}" if path else key)
+        elif isinstance(value, list):
+            if path not in self.types and any(isinstance(item, dict) for item in value):
+                self.types[path] = "nested"
+            for item in value:
+                yield from self._leaves(item, path)
+        elif value is not None:
+            yield (path, value)
+
+    def _index_value(self, number: int, path: str, value: Any) -> None:
+        field_type = self.types.get(path)
+        if field_type is None:
+            field_type = self.types[path] = _infer(value)
+
+        if field_type in ("text", "string"):
+            tokens = analyze(str(value))
+            self._token_count[path] += len(tokens)
+            for token in tokens:
+                self.tokens[path][token].add(number)
+            if not self._in_nested(path):
+                self.frequencies[path].setdefault(number, Counter()).update(tokens)
+        if field_type != "text":
+            self.keywords[path][value].add(number)
+
+        for subfield in self._subfields_of.get(path, ()):
+            self.keywords[subfield][value].add(number)
+
+
+def _infer(value: Any) -> FieldType:
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int | float):
+        return "number"
+
+    return "string"
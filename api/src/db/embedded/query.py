@@ -0,0 +1,395 @@
+"""
+Subset of the query DSL: ``match_all``, ``match`` (with fuzziness), ``term``, ``terms``,
+``range``, ``exists``, ``ids``, ``bool`` and ``nested`` with inner hits.
+
+Options of the clauses outside of the subset are rejected rather than ignored,
+so a query the engine can't answer like Elasticsearch fails loudly.
+
+A query is compiled into a tree of nodes. Every node narrows down the candidate
+documents with the postings of the index (``candidates``, ``None`` meaning every
+document) and then scores the documents it matches exactly (``score``, ``None``
+for the documents it doesn't match).
+"""
+
+import math
+from abc import ABC, abstractmethod
+from collections import Counter
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from typing import Any
+
+from db.embedded.analysis import analyze, edit_distance, fuzziness
+from db.embedded.index import Index, values
+
+_K1 = 1.2
+_B = 0.75
+
+
+class QueryError(ValueError):
+    pass
+
+
+@dataclass
+class InnerHit:
+    offset: int
+    score: float
+    source: dict
+
+
+@dataclass
+class Scope:
+    """
+    What the paths of the queries are resolved against:
+    the document or, inside ``nested``, one of its nested objects
+    """
+
+    number: int
+    source: dict
+    # inner hits by name, collected for the top level documents only
+    inner_hits: dict[str, list[InnerHit]] | None = field(default=None)
+
+
+class Node(ABC):
+    @abstractmethod
+    def candidates(self) -> set[int] | None: ...
+
+    @abstractmethod
+    def score(self, scope: Scope) -> float | None: ...
+
+    def constant_score(self) -> float | None:
+        """
+        Score of every document if the candidates are exactly the matching documents,
+        so the documents don't have to be checked one by one
+        """
+        return None
+
+
+def compile_query(query: dict, index: Index) -> Node:
+    if not isinstance(query, dict) or len(query) != 1:
+        raise QueryError(f"query must have exactly one clause: {query}")
+
+    ((kind, body),) = query.items()
+    if kind == "match_all":
+        check_options(kind, body, set())
+        return MatchAll()
+    if kind == "match":
+        return Match.build(body, index)
+    if kind == "term":
+        ((path, value),) = body.items()
+        if isinstance(value, dict):
+            check_options(kind, value, {"value", "boost"})
+            value = value["value"]
+        return Terms(index, path, [value])
+    if kind == "terms":
+        ((path, terms),) = ((key, value) for (key, value) in body.items() if key != "boost")
+        return Terms(index, path, list(terms))
+    if kind == "range":
+        ((path, bounds),) = body.items()
+        return Range(index, path, bounds)
+    if kind == "exists":
+        check_options(kind, body, {"field"})
+        return Exists(index, body["field"])
+    if kind == "ids":
+        check_options(kind, body, {"values"})
+        return Ids(index, body["values"])
+    if kind == "bool":
+        return Bool.build(body, index)
+    if kind == "nested":
+        check_options(kind, body, {"path", "query", "inner_hits"})
+        if (inner_hits := body.get("inner_hits")) is not None:
+            check_options("inner_hits", inner_hits, {"name", "from", "size", "_source", "docvalue_fields"})
+        return Nested(body["path"], compile_query(body["query"], index), inner_hits)
+
+    raise QueryError(f"unsupported query {kind}")
+
+
+def check_options(kind: str, options: dict, supported: set[str]) -> None:
+    if unsupported := set(options) - supported:
+        raise QueryError(f"unsupported {kind} options {sorted(unsupported)}")
+
+
+class MatchAll(Node):
+    def candidates(self) -> set[int] | None:
+        return None
+
+    def score(self, scope: Scope) -> float | None:
+        return 1.0
+
+    def constant_score(self) -> float | None:
+        return 1.0
+
+
+class Match(Node):
+    """
+    ``match`` on a text field scored with BM25 over the values in the scope,
+    on other fields the same as ``term``
+    """
+
+    def __init__(self, index: Index, path: str, terms: list[set[str]], operator: str):
+        self._index = index
+        self._path = path
+        # every analyzed term of the query with the tokens of the index it matches
+        self._terms = terms
+        self._operator = operator
+        self._idf = {
+            token: _idf(len(index), index.document_frequency(path, token)) for tokens in terms for token in tokens
+        }
+
+    @classmethod
+    def build(cls, body: dict, index: Index) -> Node:
+        ((path, options),) = body.items()
+        if not isinstance(options, dict):
+            options = {"query": options}
+
+        check_options("match", options, {"query", "fuzziness", "operator", "max_expansions"})
+        operator = options.get("operator", "or").lower()
+        if operator not in ("or", "and"):
+            raise QueryError(f"unsupported match operator {operator}")
+
+        query = options["query"]
+        if index.type_of(path) not in ("text", "string"):
+            return Terms(index, path, [query])
+
+        terms = []
+        max_expansions = options.get("max_expansions", 50)
+        for term in analyze(str(query)):
+            distance = fuzziness(term, options.get("fuzziness"))
+            if distance == 0:
+                terms.append({term} if term in index.tokens[path] else set())
+                continue
+            similar = []
+            for token in index.similar_tokens(path, len(term), distance):
+                if (found := edit_distance(term, token, distance)) <= distance:
+                    similar.append((found, -index.document_frequency(path, token), token))
+            # the closest and then the most frequent ones, like the top terms of Elasticsearch
+            terms.append({token for (_, _, token) in sorted(similar)[:max_expansions]})
+
+        return cls(index, path, terms, operator)
+
+    def candidates(self) -> set[int] | None:
+        postings = self._index.tokens[self._path]
+        matched = [set().union(*(postings[token] for token in tokens)) for tokens in self._terms]
+        if not matched:
+            return set()
+        if self._operator == "and":
+            return set.intersection(*matched)
+        return set().union(*matched)
+
+    def score(self, scope: Scope) -> float | None:
+        frequencies = self._index.frequencies[self._path].get(scope.number)
+        if frequencies is None or scope.source is not self._index.sources[scope.number]:
+            # nested object
+            frequencies = Counter(
+                token for value in self._index.values(scope.source, self._path) for token in analyze(str(value))
+            )
+        length = frequencies.total()
+        norm = _K1 * (1 - _B + _B * length / (self._index.average_length(self._path) or 1))
+
+        total = 0.0
+        matched = 0
+        for term_tokens in self._terms:
+            scores = [
+                self._idf[token] * frequencies[token] * (_K1 + 1) / (frequencies[token] + norm)
+                for token in term_tokens
+                if frequencies[token]
+            ]
+            if scores:
+                matched += 1
+                total += max(scores)
+
+        if matched == 0 or (self._operator == "and" and matched < len(self._terms)):
+            return None
+        return total
+
+
+class Terms(Node):
+    """
+    Exact values, on text fields the tokens
+    """
+
+    def __init__(self, index: Index, path: str, terms: list[Any]):
+        self._index = index
+        self._path = path
+        self._text = index.type_of(path) == "text"
+        self._terms = {str(term) if not isinstance(term, int | float | bool) else term for term in terms}
+
+    def candidates(self) -> set[int] | None:
+        postings = self._index.tokens[self._path] if self._text else self._index.keywords[self._path]
+        return set().union(*(postings.get(term, ()) for term in self._terms))
+
+    def score(self, scope: Scope) -> float | None:
+        found = self._index.values(scope.source, self._path)
+        if self._text:
+            found = [token for value in found for token in analyze(str(value))]
+        return 1.0 if any(value in self._terms for value in found) else None
+
+    def constant_score(self) -> float | None:
+        return 1.0
+
+
+class Range(Node):
+    def __init__(self, index: Index, path: str, bounds: dict):
+        self._index = index
+        self._path = path
+        check_options("range", bounds, {"gt", "gte", "lt", "lte", "boost"})
+        self._bounds = bounds
+
+    def candidates(self) -> set[int] | None:
+        keywords = self._index.keywords[self._path]
+        return set().union(*(documents for (value, documents) in keywords.items() if self._contains(value)))
+
+    def score(self, scope: Scope) -> float | None:
+        return 1.0 if any(self._contains(value) for value in self._index.values(scope.source, self._path)) else None
+
+    def _contains(self, value: Any) -> bool:
+        try:
+            return (
+                ("gt" not in self._bounds or value > self._bounds["gt"])
+                and ("gte" not in self._bounds or value >= self._bounds["gte"])
+                and ("lt" not in self._bounds or value < self._bounds["lt"])
+                and ("lte" not in self._bounds or value <= self._bounds["lte"])
+            )
+        except TypeError:
+            return False
+
+    def constant_score(self) -> float | None:
+        return 1.0
+
+
+class Exists(Node):
+    def __init__(self, index: Index, path: str):
+        self._index = index
+        self._path = path
+
+    def candidates(self) -> set[int] | None:
+        postings = self._index.keywords.get(self._path) or self._index.tokens.get(self._path) or {}
+        return set().union(*postings.values())
+
+    def score(self, scope: Scope) -> float | None:
+        return 1.0 if self._index.values(scope.source, self._path) else None
+
+    def constant_score(self) -> float | None:
+        return 1.0
+
+
+class Ids(Node):
+    def __init__(self, index: Index, ids: Iterable[str]):
+        self._numbers = {number for id in ids if (number := index.numbers.get(str(id))) is not None}
+
+    def candidates(self) -> set[int] | None:
+        return set(self._numbers)
+
+    def score(self, scope: Scope) -> float | None:
+        return 1.0 if scope.number in self._numbers else None
+
+    def constant_score(self) -> float | None:
+        return 1.0
+
+
+class Bool(Node):
+    def __init__(self, must: list[Node], filter: list[Node], should: list[Node], must_not: list[Node],
+                 minimum_should_match: int):
+        self._must = must
+        self._filter = filter
+        self._should = should
+        self._must_not = must_not
+        self._minimum_should_match = minimum_should_match
+
+    @classmethod
+    def build(cls, body: dict, index: Index) -> "Bool":
+        check_options("bool", body, {"must", "filter", "should", "must_not", "minimum_should_match"})
+
+        def clauses(name: str) -> list[Node]:
+            value = body.get(name, [])
+            return [compile_query(clause, index) for clause in (value if isinstance(value, list) else [value])]
+
+        must = clauses("must")
+        filter = clauses("filter")
+        should = clauses("should")
+        default = 0 if must or filter or not should else 1
+        minimum = body.get("minimum_should_match", default)
+        if not isinstance(minimum, int):
+            raise QueryError(f"unsupported minimum_should_match {minimum}")
+        return cls(must, filter, should, clauses("must_not"), minimum)
+
+    def candidates(self) -> set[int] | None:
+        result: set[int] | None = None
+        for node in (*self._must, *self._filter):
+            if (found := node.candidates()) is not None:
+                result = found if result is None else result & found
+        if result is None and self._should and self._minimum_should_match > 0:
+            found_should = [node.candidates() for node in self._should]
+            if all(found is not None for found in found_should):
+                result = set().union(*found_should)  # type: ignore[arg-type]
+        return result
+
+    def constant_score(self) -> float | None:
+        if self._should or self._must_not:
+            return None
+        scores = [node.constant_score() for node in (*self._must, *self._filter)]
+        if any(score is None for score in scores):
+            return None
+        # filters don't contribute to the score
+        return float(len(self._must)) if self._must else 0.0
+
+    def score(self, scope: Scope) -> float | None:
+        total = 0.0
+        for node in self._must:
+            if (score := node.score(scope)) is None:
+                return None
+            total += score
+        for node in self._filter:
+            if node.score(scope) is None:
+                return None
+        for node in self._must_not:
+            if node.score(scope) is not None:
+                return None
+
+        matched = 0
+        for node in self._should:
+            if (score := node.score(scope)) is not None:
+                matched += 1
+                total += score
+        if matched < self._minimum_should_match:
+            return None
+
+        return total if self._must or self._should else 0.0
+
+
+class Nested(Node):
+    """
+    Matches the documents having at least one nested object matching the query,
+    scored by the average of the objects
+    """
+
+    def __init__(self, path: str, query: Node, inner_hits: dict | None):
+        self._path = path
+        self._query = query
+        self._inner_hits_name = (inner_hits.get("name") or path) if inner_hits is not None else None
+
+    def candidates(self) -> set[int] | None:
+        return self._query.candidates()
+
+    def score(self, scope: Scope) -> float | None:
+        matched = []
+        for (offset, item) in enumerate(values(scope.source, self._path)):
+            nested = Scope(scope.number, wrap(self._path, item))
+            if (score := self._query.score(nested)) is not None:
+                matched.append(InnerHit(offset, score, item))
+
+        if not matched:
+            return None
+        if self._inner_hits_name is not None and scope.inner_hits is not None:
+            scope.inner_hits[self._inner_hits_name] = matched
+        return sum(hit.score for hit in matched) / len(matched)
+
+
+def wrap(path: str, item: Any) -> dict:
+    # paths of the nested query are absolute: {"actors": {"id": ...}} for actors.id
+    for part in reversed(path.split(".")):
+        item = {part: item}
+    return item
+
+
+def _idf(documents: int, frequency: int) -> float:
+    return math.log(1 + (documents - frequency + 0.5) / (frequency + 0.5))
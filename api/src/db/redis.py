@@ -1,9 +1,21 @@
+from core.settings import CacheSettings
 from redis.asyncio import Redis
+from services.cache.bypass import BypassCache
+from services.cache.codec import CODECS, CompressedCache
+from services.cache.instrumented_storage import InstrumentedCache
+from services.cache.memory_storage import MemoryCache
 from services.cache.none_storage import NoneCache
 from services.cache.redis_storage import RedisCache
+from services.cache.single_flight import RedisLockCache, SingleFlightCache
 from services.cache.storage import ICache
+from services.cache.swr import StaleWhileRevalidateCache
+from services.cache.tags import TagRegistry
+from services.cache.two_tier_storage import TwoTierCache
+from services.health import get_health_prober
 
 redis: Redis | None = None
+cache: ICache | None = None
+tag_registry: TagRegistry | None = None
 
 
 def get_redis() -> Redis:
@@ -15,11 +27,52 @@ def get_redis() -> Redis:
 
 
 def get_cache() -> ICache:
-    # In future we can move it to different location
-    # but as we don't have any other implementations
-    # of the cache provider let's keep it here.
-    global redis
+    # The instance is kept so the lru_cache'd services
+    # depending on it are created only once.
+    global cache
     if redis is None:
         return NoneCache()
 
-    return RedisCache(redis)
+    if cache is None:
+        cache = _create_cache(redis, CacheSettings())
+
+    return cache
+
+
+def get_tag_registry() -> TagRegistry | None:
+    """
+    Registry of the tags of the entries of ``get_cache``, there is none without Redis
+    """
+    global tag_registry
+    if redis is None:
+        return None
+
+    if tag_registry is None:
+        tag_registry = TagRegistry(redis, get_cache(), CacheSettings().tag_version_ttl, get_health_prober().redis)
+
+    return tag_registry
+
+
+def _create_cache(client: Redis, settings: CacheSettings) -> ICache:
+    cache: ICache = RedisCache(client)
+    if settings.codec != "none":
+        codec = CODECS[settings.codec](settings.compress_level)
+        cache = CompressedCache(cache, codec, settings.compress_min_bytes)
+
+    if settings.backend == "two_tier":
+        # the local tier keeps the values uncompressed
+        local = MemoryCache(settings.local_max_entries, settings.local_max_bytes)
+        cache = TwoTierCache(client, cache, local, settings.local_ttl)
+
+    # everything below talks to Redis, it's skipped while Redis is unavailable
+    breaker = get_health_prober().redis
+    cache = BypassCache(cache, breaker)
+
+    if settings.single_flight == "distributed":
+        cache = RedisLockCache(cache, client, breaker, settings.lock_timeout, settings.lock_wait_timeout)
+
+    if settings.single_flight != "none":
+        cache = SingleFlightCache(cache)
+
+    cache = StaleWhileRevalidateCache(cache, settings.early_refresh_beta)
+    return InstrumentedCache(cache)
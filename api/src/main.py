@@ -1,12 +1,19 @@
 import logging.config
+import math
+from http import HTTPStatus
 
 import uvicorn
-from api.v1 import films, genres, health, persons
+from api.v1 import cache, films, genres, health, metrics, persons, profiles
+from core.deadline import DeadlineExceededError, DeadlineMiddleware
 from core.lifecycle import lifespan
 from core.logger import LOGGING
+from core.metrics import MetricsMiddleware
+from core.profiler import ProfilerMiddleware
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.responses import ORJSONResponse
+from services.circuit_breaker import BackendUnavailableError
+from services.pagination import PaginationError
 
 load_dotenv()
 logging.config.dictConfig(LOGGING)
@@ -24,10 +31,39 @@ app = FastAPI(
     log_level=logging.DEBUG,
 )
 
+# below DeadlineMiddleware, the samples of a request are told apart by the task it runs in
+app.add_middleware(ProfilerMiddleware, exclude=("/api/v1/profiles",))
+app.add_middleware(MetricsMiddleware)
+# outermost, the disconnects cancel everything below
+app.add_middleware(DeadlineMiddleware)
+
+
+@app.exception_handler(PaginationError)
+async def pagination_error_handler(request: Request, exc: PaginationError) -> ORJSONResponse:
+    return ORJSONResponse(status_code=HTTPStatus.BAD_REQUEST, content={"detail": str(exc)})
+
+
+@app.exception_handler(BackendUnavailableError)
+async def backend_unavailable_handler(request: Request, exc: BackendUnavailableError) -> ORJSONResponse:
+    return ORJSONResponse(
+        status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(math.ceil(exc.retry_after_sec), 1))},
+    )
+
+
+@app.exception_handler(DeadlineExceededError)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceededError) -> ORJSONResponse:
+    return ORJSONResponse(status_code=HTTPStatus.GATEWAY_TIMEOUT, content={"detail": str(exc)})
+
+
 app.include_router(films.router, prefix="/api/v1/films", tags=["films"])
 app.include_router(genres.router, prefix="/api/v1/genres", tags=["genres"])
 app.include_router(persons.router, prefix="/api/v1/persons", tags=["persons"])
 app.include_router(health.router, prefix="/api/v1/health", tags=["health"])
+app.include_router(metrics.router, prefix="/api/v1/metrics", tags=["metrics"])
+app.include_router(cache.router, prefix="/api/v1/cache", tags=["cache"])
+app.include_router(profiles.router, prefix="/api/v1/profiles", tags=["profiles"])
 
 if __name__ == "__main__":
     uvicorn.run(
@@ -16,3 +16,22 @@ class Film(BaseOrjsonModel):
     directors: list[PersonId]
     actors: list[PersonId]
     writers: list[PersonId]
+
+
+class GenreFacet(BaseOrjsonModel):
+    # None when the genre is not in the catalog
+    id: UUID | None = None
+    name: str
+    count: int
+
+
+class RatingFacet(BaseOrjsonModel):
+    # rating_from is included, rating_to is not
+    rating_from: float | None = None
+    rating_to: float | None = None
+    count: int
+
+
+class FilmFacets(BaseOrjsonModel):
+    genres: list[GenreFacet]
+    imdb_rating: list[RatingFacet]
@@ -7,3 +7,8 @@ class Person(BaseOrjsonModel):
     id: UUID
     full_name: str
     gender: str | None = None
+
+
+class FilmRoles(BaseOrjsonModel):
+    film_id: UUID
+    roles: list[str]
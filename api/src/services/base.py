@@ -1,33 +1,314 @@
+import logging
+import types
 from abc import ABC
-from typing import Any, Literal, cast
+from collections.abc import AsyncIterator, Iterator, Sequence
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Literal, cast, get_args
 from uuid import UUID
 
-from elasticsearch import AsyncElasticsearch, NotFoundError
+import orjson
+from core import deadline
+from core.deadline import DeadlineExceededError
+from core.metrics import observe_elasticsearch, observe_elasticsearch_took
+from core.settings import ElasticsearchSettings, EntityCacheSettings
+from elasticsearch import AsyncElasticsearch, ConnectionTimeout, NotFoundError
+from pydantic import BaseModel
+from services.cache.storage import ICache
+from services.circuit_breaker import BackendUnavailableError
+from services.health import get_health_prober
+from services.pagination import Cursor, PaginationError, Page
+from services.query_batcher import get_query_batcher
 
 INDICES = Literal["movies", "persons", "genres"]
 
+# search_after value of the implicit point in time tiebreaker
+# which skips the document the cursor points to
+_SHARD_DOC_AFTER_ALL = 2**63 - 1
+
+
+@lru_cache
+def source_fields(model: type[BaseModel]) -> tuple[str, ...]:
+    """
+    ``_source`` includes required to build ``model``, nested models are expanded to dotted paths
+    """
+    fields: list[str] = []
+    for name, info in model.model_fields.items():
+        name = info.alias or name
+        if nested := _nested_model(info.annotation):
+            fields.extend(f"{name}.{field}" for field in source_fields(nested))
+        else:
+            fields.append(name)
+
+    return tuple(fields)
+
+
+def _source_clause(source: tuple[str, ...]) -> dict | bool:
+    # empty projection means no fields at all, e.g. when only ids are needed
+    return {"includes": list(source)} if source else False
+
+
+def _nested_model(annotation: Any) -> type[BaseModel] | None:
+    if isinstance(annotation, type) and not isinstance(annotation, types.GenericAlias):
+        return annotation if issubclass(annotation, BaseModel) else None
+
+    # list[Model], Model | None and so on
+    for arg in get_args(annotation):
+        if model := _nested_model(arg):
+            return model
+
+    return None
+
 
 class ServiceABC(ABC):
-    def __init__(self, elastic: AsyncElasticsearch):
+    def __init__(self, elastic: AsyncElasticsearch, cache: ICache):
         self.elastic = elastic
+        self.cache = cache
+        self._entity_cache_settings = EntityCacheSettings()
+        self._elastic_settings = ElasticsearchSettings()
+        self._batcher = get_query_batcher(elastic) if self._elastic_settings.batch_queries else None
+        # fails fast while Elasticsearch is unavailable
+        self._breaker = get_health_prober().elasticsearch
+        self._logger = logging.getLogger(__name__)
 
     async def _get_from_elastic(self, index: INDICES, id: UUID) -> dict | None:
+        """
+        Read-through lookup of a single document. Concurrent lookups
+        and searches are batched, see ``services.query_batcher``.
+        """
+        key = self._entity_key(index, id)
+        if cached := await self.cache.get(key):
+            return orjson.loads(cached)
+
+        if self._batcher is not None:
+            doc = await deadline.bounded(self._batcher.get(index, str(id)))
+        else:
+            (doc,) = await self._get_all_from_elastic(index, [id])
+        if doc is not None:
+            await self.cache.set(key, orjson.dumps(doc), self._entity_cache_settings.ttl(index))
+
+        return doc
+
+    async def _get_many_from_elastic(self, index: INDICES, ids: Sequence[UUID]) -> list[dict | None]:
+        """
+        Read-through lookup of several documents, returned in the order of ``ids``.
+        Cached documents are read with one multi-key fetch and the rest with one ``mget``
+        sent directly, whether the query batcher is enabled or not. The fetched documents
+        are cached with one multi-key write.
+        """
+        keys = [self._entity_key(index, id) for id in ids]
+        docs: list[dict | None] = [
+            orjson.loads(cached) if cached is not None else None for cached in await self.cache.get_many(keys)
+        ]
+        missing = list(dict.fromkeys(str(id) for (id, doc) in zip(ids, docs) if doc is None))
+        if not missing:
+            return docs
+
+        found = dict(zip(missing, await self._get_all_from_elastic(index, missing)))
+        ttl = self._entity_cache_settings.ttl(index)
+        await self.cache.set_many(
+            [(self._entity_key(index, id), orjson.dumps(doc), ttl) for (id, doc) in found.items() if doc is not None]
+        )
+
+        return [doc if doc is not None else found.get(str(id)) for (id, doc) in zip(ids, docs)]
+
+    async def _get_all_from_elastic(self, index: INDICES, ids: list[UUID] | list[str]) -> list[dict | None]:
+        """
+        Returns documents in the order of ``ids``, missing documents are ``None``
+        """
         try:
-            data = await self.elastic.get(index=index, id=id)
-            return cast(dict, data)["_source"]
+            with self._call_elastic(index, "mget") as params:
+                data = await self.elastic.mget({"ids": [str(id) for id in ids]}, index=index, **params)
         except NotFoundError:
-            return None
+            # index doesn't exist yet
+            return [None] * len(ids)
 
-    async def _get_all_from_elastic(self, index: INDICES, ids: list[UUID]) -> list[dict]:
-        data = await self.elastic.mget({"ids": ids}, index=index)
-        return [doc["_source"] for doc in cast(dict, data)["docs"]]
+        return [doc["_source"] if doc.get("found") else None for doc in cast(dict, data)["docs"]]
 
     async def _query_from_elastic(
-        self, index: INDICES, query: dict, size: int = 1000, skip: int = 0, sort: dict[str, int] | None = None
+        self,
+        index: INDICES,
+        query: dict,
+        size: int = 1000,
+        skip: int = 0,
+        sort: dict[str, int] | None = None,
+        source: tuple[str, ...] | None = None,
     ) -> list[Any]:
-        body = {"query": query, "size": size, "from": skip}
+        body: dict[str, Any] = {"query": query, "size": size, "from": skip}
+        if source is not None:
+            body["_source"] = _source_clause(source)
         if sort:
             body["sort"] = {key: {"order": "asc" if value > 0 else "desc"} for (key, value) in sort.items()}
-        data = await self.elastic.search(index=index, body=body)
-        docs = cast(dict, data)["hits"]["hits"]
+        data = await self._search(index, body, "query")
+        docs = data["hits"]["hits"]
         return [doc["_source"] for doc in docs]
+
+    async def _page_from_elastic(
+        self,
+        index: INDICES,
+        query: dict,
+        size: int,
+        skip: int = 0,
+        sort: dict[str, int] | None = None,
+        cursor: Cursor | None = None,
+        source: tuple[str, ...] | None = None,
+        aggregations: dict[str, Any] | None = None,
+    ) -> Page[dict]:
+        """
+        Reads a page either by offset (``skip``) or after the ``cursor``.
+        Hits are sorted by ``sort`` (relevance if not set) with ``id`` as a tiebreaker
+        so the last hit of every page can be turned into the cursor of the next one.
+        ``source`` limits the fields read from the documents, ``aggregations``
+        are computed over all the matching documents in the same search.
+        """
+        sort_clause = [{key: {"order": "asc" if value > 0 else "desc"}} for (key, value) in (sort or {}).items()]
+        if not sort_clause:
+            sort_clause = [{"_score": {"order": "desc"}}]
+        sort_clause.append({"id": {"order": "asc"}})
+        sort_fields = [
+            ("-" if order["order"] == "desc" else "") + key for item in sort_clause for (key, order) in item.items()
+        ]
+
+        body: dict[str, Any] = {"query": query, "size": size, "sort": sort_clause}
+        if source is not None:
+            body["_source"] = _source_clause(source)
+        if aggregations:
+            body["aggs"] = aggregations
+        if cursor is None:
+            if skip + size > self._elastic_settings.max_result_window:
+                raise PaginationError("page is too deep, use cursor")
+            body["from"] = skip
+        elif cursor.sort != sort_fields:
+            raise PaginationError("cursor was issued for another sort order")
+        else:
+            body["search_after"] = cursor.search_after
+
+        pit_id: str | None = None
+        if cursor is not None and (keep_alive := self._elastic_settings.pit_keep_alive):
+            try:
+                (data, pit_id) = await self._search_in_point_in_time(index, body, cursor.pit_id, keep_alive)
+            except NotFoundError:
+                # point in time expired, continue without it
+                data = await self._search(index, body, "page")
+        else:
+            data = await self._search(index, body, "page")
+
+        hits = data["hits"]["hits"]
+        next_cursor = None
+        if len(hits) == size:
+            # the implicit point in time tiebreaker is dropped, see _search_in_point_in_time
+            next_cursor = Cursor(hits[-1]["sort"][: len(sort_fields)], sort_fields, pit_id)
+
+        return Page([hit["_source"] for hit in hits], next_cursor, data.get("aggregations"))
+
+    async def _scan_from_elastic(
+        self,
+        index: INDICES,
+        query: dict,
+        page_size: int = 1000,
+        source: tuple[str, ...] | None = None,
+        keep_alive: str | None = None,
+    ) -> AsyncIterator[list[dict]]:
+        """
+        Walks all the documents matching ``query`` in ``id`` order
+        and yields the raw hits page by page. With ``keep_alive`` the walk
+        reads a point in time, so it sees the index as it was when it started.
+        """
+        body: dict[str, Any] = {"query": query, "size": page_size, "sort": [{"id": {"order": "asc"}}]}
+        if source is not None:
+            body["_source"] = _source_clause(source)
+
+        pit_id = await self._open_point_in_time(index, keep_alive) if keep_alive is not None else None
+        try:
+            while True:
+                if pit_id is None:
+                    data = await self._search(index, body, "scan")
+                else:
+                    # the index is implied by the point in time
+                    with self._call_elastic(index, "scan_pit") as params:
+                        pit = {"id": pit_id, "keep_alive": keep_alive}
+                        data = cast(dict, await self.elastic.search(body={**body, "pit": pit}, **params))
+                    observe_elasticsearch_took(index, "scan_pit", data)
+                    pit_id = data.get("pit_id", pit_id)
+
+                hits = data["hits"]["hits"]
+                if hits:
+                    yield hits
+                if len(hits) < page_size:
+                    return
+
+                # includes the implicit tiebreaker of the point in time if any
+                body["search_after"] = hits[-1]["sort"]
+        finally:
+            if pit_id is not None:
+                await self._close_point_in_time(index, pit_id)
+
+    async def _search_in_point_in_time(
+        self, index: INDICES, body: dict, pit_id: str | None, keep_alive: str
+    ) -> tuple[dict, str]:
+        if pit_id is None:
+            pit_id = await self._open_point_in_time(index, keep_alive)
+
+        # Searches in a point in time are implicitly sorted by _shard_doc as well.
+        # Cursors keep only the explicit sort values, which are unique thanks to the id,
+        # so the largest _shard_doc skips exactly the document the cursor points to.
+        body = {
+            **body,
+            "sort": [*body["sort"], {"_shard_doc": {"order": "asc"}}],
+            "search_after": [*body["search_after"], _SHARD_DOC_AFTER_ALL],
+            "pit": {"id": pit_id, "keep_alive": keep_alive},
+        }
+        # the index is implied by the point in time
+        with self._call_elastic(index, "page_pit") as params:
+            data = cast(dict, await self.elastic.search(body=body, **params))
+        observe_elasticsearch_took(index, "page_pit", data)
+        return (data, data.get("pit_id", pit_id))
+
+    async def _open_point_in_time(self, index: INDICES, keep_alive: str) -> str:
+        with self._call_elastic(index, "open_pit") as params:
+            opened = await self.elastic.transport.perform_request(
+                "POST", f"/{index}/_pit", params={"keep_alive": keep_alive, **params}
+            )
+        return cast(dict, opened)["id"]
+
+    async def _close_point_in_time(self, index: INDICES, pit_id: str) -> None:
+        try:
+            with self._call_elastic(index, "close_pit") as params:
+                await self.elastic.transport.perform_request("DELETE", "/_pit", params=params, body={"id": pit_id})
+        except Exception as e:
+            # expires on its own after the keep alive
+            self._logger.warning(f"Unable to close point in time of {index}: {e}")
+
+    async def _search(self, index: INDICES, body: dict, operation: str) -> dict:
+        """
+        ``search`` recording the round trip and the time reported by Elasticsearch,
+        ``operation`` tells apart the kinds of searches of the same index
+        """
+        if self._batcher is not None:
+            return await deadline.bounded(self._batcher.search(index, body, operation))
+
+        with self._call_elastic(index, operation) as params:
+            data = cast(dict, await self.elastic.search(index=index, body=body, **params))
+        observe_elasticsearch_took(index, operation, data)
+        return data
+
+    @contextmanager
+    def _call_elastic(self, index: INDICES, operation: str) -> Iterator[dict[str, Any]]:
+        """
+        Guards a call to Elasticsearch, the yielded parameters of the call
+        bound it by the time left until the deadline of the request.
+        A timeout counts as a failure of Elasticsearch even when the deadline passed with it,
+        otherwise a hung Elasticsearch would never open the circuit.
+        """
+        params = {} if (timeout := deadline.remaining()) is None else {"request_timeout": timeout}
+        try:
+            with self._breaker.guard(), observe_elasticsearch(index, operation):
+                yield params
+        except BackendUnavailableError as e:
+            if isinstance(e.__cause__, ConnectionTimeout) and deadline.exceeded():
+                raise DeadlineExceededError() from e
+            raise
+
+    @staticmethod
+    def _entity_key(index: INDICES, id: UUID | str) -> str:
+        return f"{index}:{id}"
@@ -0,0 +1,56 @@
+from collections.abc import Awaitable, Callable, Collection, Sequence
+from typing import Any, TypeVar
+
+from services.circuit_breaker import BackendUnavailableError, CircuitBreaker
+
+from .storage import CacheWrapper, ICache
+
+T = TypeVar("T")
+
+
+class BypassCache(CacheWrapper):
+    """
+    Degraded mode of the cache while Redis is unavailable: the inner cache is not
+    called while the circuit is open, reads miss, writes are dropped and ``get_or_set``
+    just computes the value. Deletes are not dropped, they fail.
+
+    Only the calls to the inner cache go through the circuit breaker, the factory
+    of ``get_or_set`` runs outside of it, so its errors and its time aren't taken
+    for the ones of Redis.
+    """
+
+    def __init__(self, inner: ICache, breaker: CircuitBreaker):
+        super().__init__(inner)
+        self._breaker = breaker
+
+    async def set(self, key: str, value: Any, timeout_sec: int) -> None:
+        await self._call(lambda: self._inner.set(key, value, timeout_sec), None)
+
+    async def get(self, key: str) -> Any:
+        return await self._call(lambda: self._inner.get(key), None)
+
+    async def get_many(self, keys: Sequence[str]) -> list[Any]:
+        return await self._call(lambda: self._inner.get_many(keys), [None] * len(keys))
+
+    async def set_many(self, items: Sequence[tuple[str, Any, int]]) -> None:
+        await self._call(lambda: self._inner.set_many(items), None)
+
+    async def delete(self, keys: Collection[str]) -> None:
+        with self._breaker.guard():
+            await self._inner.delete(keys)
+
+    async def get_or_set(
+        self, key: str, factory: Callable[[], Awaitable[Any]], timeout_sec: int, stale_sec: int = 0
+    ) -> Any:
+        # the guarded get and set around the factory
+        return await ICache.get_or_set(self, key, factory, timeout_sec, stale_sec)
+
+    async def _call(self, call: Callable[[], Awaitable[T]], fallback: T) -> T:
+        try:
+            with self._breaker.guard():
+                return await call()
+        except BackendUnavailableError as e:
+            if e.backend != self._breaker.backend:
+                raise
+
+            return fallback
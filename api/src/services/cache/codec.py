@@ -0,0 +1,125 @@
+"""
+Compression of the values stored in Redis.
+
+Values shorter than the threshold are stored as is, the way every value was stored
+before the codecs, so the entries written by the old and the new workers are read
+alike during a rollout. Compressed values start with the header byte of the codec.
+Header bytes are control characters which never start the plain values
+(JSON documents and the ASCII envelopes of the cache).
+
+The values are only compressed, not re-encoded (e.g. with msgpack): the cached
+JSON is sent to the clients as it is, another format would be decoded and turned
+back into JSON on every hit, while compression already removes the redundancy of JSON.
+"""
+
+import abc
+import time
+import zlib
+from collections.abc import Awaitable, Callable, Sequence
+from typing import Any
+
+import zstandard
+from core.metrics import cache_codec_duration, cache_compression_ratio
+
+from .storage import CacheWrapper, ICache
+
+
+class Codec(abc.ABC):
+    name: str
+    header: bytes
+
+    @abc.abstractmethod
+    def compress(self, data: bytes) -> bytes: ...
+
+    @abc.abstractmethod
+    def decompress(self, data: bytes) -> bytes: ...
+
+
+class ZlibCodec(Codec):
+    name = "zlib"
+    header = b"\x01"
+
+    def __init__(self, level: int = 3):
+        self._level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self._level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+
+class ZstdCodec(Codec):
+    name = "zstd"
+    header = b"\x02"
+
+    def __init__(self, level: int = 3):
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._decompressor.decompress(data)
+
+
+CODECS: dict[str, type[Codec]] = {"zlib": ZlibCodec, "zstd": ZstdCodec}
+
+
+class CompressedCache(CacheWrapper):
+    """
+    Compresses the values of at least ``min_bytes`` with ``codec``.
+    Values compressed by any known codec are read, so the codec can be changed
+    without flushing the cache. Compressions which don't pay off are discarded.
+    """
+
+    def __init__(self, inner: ICache, codec: Codec, min_bytes: int):
+        super().__init__(inner)
+        self._codec = codec
+        self._min_bytes = min_bytes
+        self._decoders: dict[int, Codec] = {
+            factory.header[0]: codec if isinstance(codec, factory) else factory() for factory in CODECS.values()
+        }
+
+    async def set(self, key: str, value: Any, timeout_sec: int) -> None:
+        await self._inner.set(key, self._encode(key, value), timeout_sec)
+
+    async def set_many(self, items: Sequence[tuple[str, Any, int]]) -> None:
+        await self._inner.set_many([
+            (key, self._encode(key, value), timeout_sec) for (key, value, timeout_sec) in items
+        ])
+
+    async def get(self, key: str) -> Any:
+        return self._decode(await self._inner.get(key))
+
+    async def get_many(self, keys: Sequence[str]) -> list[Any]:
+        return [self._decode(value) for value in await self._inner.get_many(keys)]
+
+    async def get_or_set(
+        self, key: str, factory: Callable[[], Awaitable[Any]], timeout_sec: int, stale_sec: int = 0
+    ) -> Any:
+        # the inner cache would store the value without encoding it
+        return await ICache.get_or_set(self, key, factory, timeout_sec, stale_sec)
+
+    def _encode(self, key: str, value: Any) -> Any:
+        if isinstance(value, str):
+            value = value.encode()
+        if len(value) < self._min_bytes:
+            return value
+
+        started = time.perf_counter()
+        compressed = self._codec.header + self._codec.compress(value)
+        cache_codec_duration.labels(self._codec.name, "compress").observe(time.perf_counter() - started)
+        cache_compression_ratio.labels(key.split(":", 1)[0], self._codec.name).observe(len(compressed) / len(value))
+        return compressed if len(compressed) < len(value) else value
+
+    def _decode(self, raw: Any) -> Any:
+        if not raw or (decoder := self._decoders.get(raw[0])) is None:
+            # stored uncompressed
+            return raw
+
+        started = time.perf_counter()
+        value = decoder.decompress(raw[1:])
+        cache_codec_duration.labels(decoder.name, "decompress").observe(time.perf_counter() - started)
+        return value
@@ -0,0 +1,72 @@
+from collections.abc import Awaitable, Callable, Collection, Sequence
+from typing import Any
+
+from core.metrics import cache_payload_size, cache_requests
+
+from .storage import CacheWrapper
+
+
+class InstrumentedCache(CacheWrapper):
+    """
+    Counts hits, misses, writes and deletes and records the payload sizes by the key prefix
+    (the part before the first colon, e.g. ``films`` or ``movies``)
+    """
+
+    async def set(self, key: str, value: Any, timeout_sec: int) -> None:
+        prefix = _prefix(key)
+        cache_requests.labels(prefix, "set").inc()
+        cache_payload_size.labels(prefix, "set").observe(len(value))
+        await self._inner.set(key, value, timeout_sec)
+
+    async def set_many(self, items: Sequence[tuple[str, Any, int]]) -> None:
+        for (key, value, _) in items:
+            prefix = _prefix(key)
+            cache_requests.labels(prefix, "set").inc()
+            cache_payload_size.labels(prefix, "set").observe(len(value))
+        await self._inner.set_many(items)
+
+    async def get(self, key: str) -> Any:
+        value = await self._inner.get(key)
+        self._observe_get(_prefix(key), value)
+        return value
+
+    async def get_many(self, keys: Sequence[str]) -> list[Any]:
+        values = await self._inner.get_many(keys)
+        for (key, value) in zip(keys, values):
+            self._observe_get(_prefix(key), value)
+        return values
+
+    async def delete(self, keys: Collection[str]) -> None:
+        for key in keys:
+            cache_requests.labels(_prefix(key), "delete").inc()
+        await self._inner.delete(keys)
+
+    async def get_or_set(
+        self, key: str, factory: Callable[[], Awaitable[Any]], timeout_sec: int, stale_sec: int = 0
+    ) -> Any:
+        prefix = _prefix(key)
+        computed = False
+
+        async def observed_factory() -> Any:
+            nonlocal computed
+            computed = True
+            value = await factory()
+            cache_requests.labels(prefix, "set").inc()
+            cache_payload_size.labels(prefix, "set").observe(len(value))
+            return value
+
+        value = await self._inner.get_or_set(key, observed_factory, timeout_sec, stale_sec)
+        self._observe_get(prefix, None if computed else value)
+        return value
+
+    @staticmethod
+    def _observe_get(prefix: str, value: Any) -> None:
+        if value is None:
+            cache_requests.labels(prefix, "miss").inc()
+        else:
+            cache_requests.labels(prefix, "hit").inc()
+            cache_payload_size.labels(prefix, "get").observe(len(value))
+
+
+def _prefix(key: str) -> str:
+    return key.split(":", 1)[0]
@@ -0,0 +1,60 @@
+import time
+from collections import OrderedDict
+from collections.abc import Collection
+from typing import Any
+
+from .storage import ICache
+
+
+class MemoryCache(ICache):
+    """
+    In-process LRU cache bounded both by the number of entries and by the
+    total size of the stored values. Values are expected to be ``bytes`` or ``str``.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._size = 0
+        # key -> (expires_at, size, value)
+        self._entries: OrderedDict[str, tuple[float, int, Any]] = OrderedDict()
+
+    async def set(self, key: str, value: Any, timeout_sec: int) -> None:
+        size = len(value)
+        self._pop(key)
+        if size > self._max_bytes or timeout_sec <= 0:
+            return
+
+        self._entries[key] = (time.monotonic() + timeout_sec, size, value)
+        self._size += size
+        while len(self._entries) > self._max_entries or self._size > self._max_bytes:
+            (_, (_, evicted_size, _)) = self._entries.popitem(last=False)
+            self._size -= evicted_size
+
+    async def get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        (expires_at, _, value) = entry
+        if expires_at <= time.monotonic():
+            self._pop(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    async def delete(self, keys: Collection[str]) -> None:
+        for key in keys:
+            self._pop(key)
+
+    def invalidate(self, key: str) -> None:
+        self._pop(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._size = 0
+
+    def _pop(self, key: str) -> None:
+        if (entry := self._entries.pop(key, None)) is not None:
+            self._size -= entry[1]
@@ -1,4 +1,5 @@
 import logging.config
+from collections.abc import Collection, Sequence
 from typing import Any
 
 from .storage import ICache
@@ -13,3 +14,10 @@ class NoneCache(ICache):
 
     async def get(self, key: str) -> Any:
         self._logger.info(f"Ignore load {key}")
+
+    async def get_many(self, keys: Sequence[str]) -> list[Any]:
+        self._logger.info(f"Ignore load of {len(keys)} keys")
+        return [None] * len(keys)
+
+    async def delete(self, keys: Collection[str]) -> None:
+        self._logger.info(f"Ignore delete of {len(keys)} keys")
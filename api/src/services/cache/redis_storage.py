@@ -1,3 +1,4 @@
+from collections.abc import Collection, Sequence
 from typing import Any
 
 from redis.asyncio import Redis
@@ -14,3 +15,17 @@ class RedisCache(ICache):
 
     async def get(self, key: str) -> Any:
         return await self._client.get(key)
+
+    async def get_many(self, keys: Sequence[str]) -> list[Any]:
+        # MGET fails on an empty list of keys
+        return await self._client.mget(keys) if keys else []
+
+    async def set_many(self, items: Sequence[tuple[str, Any, int]]) -> None:
+        async with self._client.pipeline(transaction=False) as pipe:
+            for (key, value, timeout_sec) in items:
+                pipe.set(key, value, timeout_sec)
+            await pipe.execute()
+
+    async def delete(self, keys: Collection[str]) -> None:
+        if keys:
+            await self._client.delete(*keys)
@@ -0,0 +1,84 @@
+import hashlib
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass, field
+
+import orjson
+
+from .tags import TagRegistry
+
+HEADERS_PREFIX = b"resp:"
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """
+    Response body cached together with the headers describing it.
+    ``tags`` name the documents the body was built from, they are registered
+    when the entry is stored and are not a part of it.
+    """
+
+    body: bytes
+    headers: dict[str, str] = field(default_factory=dict)
+    tags: frozenset[str] = frozenset()
+
+    @classmethod
+    def create(
+        cls, body: bytes, headers: dict[str, str] | None = None, tags: Iterable[str] = ()
+    ) -> "CachedResponse":
+        """
+        Builds the entry with a strong ETag so cache hits don't have to rehash the body
+        """
+        return cls(body, {**(headers or {}), "ETag": compute_etag(body)}, frozenset(tags))
+
+    @property
+    def etag(self) -> str:
+        # entries cached before ETags were introduced
+        return self.headers.get("ETag") or compute_etag(self.body)
+
+    def dumps(self) -> bytes:
+        if not self.headers:
+            return self.body
+
+        return HEADERS_PREFIX + orjson.dumps(self.headers) + b"\n" + self.body
+
+    @classmethod
+    def loads(cls, raw: bytes | str) -> "CachedResponse":
+        if isinstance(raw, str):
+            raw = raw.encode()
+
+        if not raw.startswith(HEADERS_PREFIX):
+            return cls(raw)
+
+        (headers, body) = raw[len(HEADERS_PREFIX) :].split(b"\n", 1)
+        return cls(body, orjson.loads(headers))
+
+
+@dataclass(frozen=True)
+class CachedEntry:
+    """
+    Response of a route cached under ``key`` and computed by ``load``.
+    The entry is kept in the namespace of ``indices`` and tagged with the tags
+    of the loaded response, see ``TagRegistry``.
+    """
+
+    key: str
+    load: Callable[[], Awaitable[CachedResponse]]
+    timeout_sec: int
+    stale_sec: int = 0
+    indices: tuple[str, ...] = ()
+
+    async def versioned_key(self, registry: TagRegistry | None) -> str | None:
+        return await registry.versioned_key(self.key, self.indices) if registry is not None else self.key
+
+    async def dump(self, key: str, registry: TagRegistry | None) -> bytes:
+        """
+        Computes the response stored under ``key`` (the versioned one)
+        """
+        response = await self.load()
+        if registry is not None and response.tags:
+            await registry.tag(key, response.tags, self.timeout_sec + self.stale_sec)
+        return response.dumps()
+
+
+def compute_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
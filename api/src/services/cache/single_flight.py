@@ -0,0 +1,140 @@
+import asyncio
+import contextvars
+import logging
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from core import deadline
+from core.deadline import DeadlineExceededError
+from redis.asyncio import Redis
+from redis.exceptions import LockError
+from services.circuit_breaker import BackendUnavailableError, CircuitBreaker, CircuitOpenError
+
+from .storage import CacheWrapper, ICache
+
+
+class SingleFlightCache(CacheWrapper):
+    """
+    Coalesces concurrent ``get_or_set`` misses of the same key within the worker:
+    the factory runs once in a separate task and every caller awaits its result.
+    The task is shared, so it runs in a context of its own and every caller stops
+    waiting at its own deadline. The task is cancelled only when all of its callers are gone.
+    """
+
+    def __init__(self, inner: ICache):
+        super().__init__(inner)
+        # key -> (task, number of callers awaiting it)
+        self._in_flight: dict[str, tuple[asyncio.Task, int]] = {}
+
+    async def get_or_set(
+        self, key: str, factory: Callable[[], Awaitable[Any]], timeout_sec: int, stale_sec: int = 0
+    ) -> Any:
+        if key in self._in_flight:
+            (task, waiters) = self._in_flight[key]
+        else:
+            coroutine = self._inner.get_or_set(key, factory, timeout_sec, stale_sec)
+            (task, waiters) = (asyncio.create_task(coroutine, context=contextvars.Context()), 0)
+            task.add_done_callback(lambda t: self._forget(key, t))
+
+        self._in_flight[key] = (task, waiters + 1)
+        try:
+            return await deadline.bounded(asyncio.shield(task))
+        except (asyncio.CancelledError, DeadlineExceededError):
+            if not task.done() and self._release(key) == 0:
+                task.cancel()
+            raise
+
+    def _release(self, key: str) -> int:
+        (task, waiters) = self._in_flight[key]
+        self._in_flight[key] = (task, waiters - 1)
+        return waiters - 1
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._in_flight.get(key, (None,))[0] is task:
+            del self._in_flight[key]
+
+        if not task.cancelled():
+            # mark the exception as retrieved, it's re-raised to the callers
+            task.exception()
+
+
+class RedisLockCache(CacheWrapper):
+    """
+    Coalesces ``get_or_set`` misses across workers and hosts with a Redis lock.
+
+    The lock owner computes the value, the others poll the cache until the value
+    appears. If it doesn't appear within ``wait_timeout_sec`` (the owner died or is
+    too slow) the waiter falls back to computing the value by itself.
+    The lock is taken through the circuit breaker of Redis, while it's open
+    every worker computes the value by itself.
+    """
+
+    def __init__(
+        self,
+        inner: ICache,
+        client: Redis,
+        breaker: CircuitBreaker,
+        lock_timeout_sec: float,
+        wait_timeout_sec: float,
+        poll_interval_sec: float = 0.05,
+    ):
+        super().__init__(inner)
+        self._client = client
+        self._breaker = breaker
+        self._lock_timeout_sec = lock_timeout_sec
+        self._wait_timeout_sec = wait_timeout_sec
+        self._poll_interval_sec = poll_interval_sec
+        self._logger = logging.getLogger(__name__)
+
+    async def get_or_set(
+        self, key: str, factory: Callable[[], Awaitable[Any]], timeout_sec: int, stale_sec: int = 0
+    ) -> Any:
+        if (value := await self._inner.get(key)) is not None:
+            return value
+
+        lock = self._client.lock(f"lock:{key}", timeout=self._lock_timeout_sec, blocking=False)
+        try:
+            with self._breaker.guard():
+                acquired = await lock.acquire()
+        except CircuitOpenError:
+            acquired = False
+        except Exception as e:
+            self._logger.error(f"Unable to acquire lock for {key}: {e}")
+            acquired = False
+        else:
+            if not acquired and (value := await self._wait_for(key)) is not None:
+                return value
+
+        try:
+            if acquired and (value := await self._inner.get(key)) is not None:
+                # the previous owner has just finished
+                return value
+
+            value = await factory()
+            await self._inner.set(key, value, timeout_sec)
+            return value
+        finally:
+            if acquired:
+                await self._release(lock, key)
+
+    async def _wait_for(self, key: str) -> Any:
+        loop = asyncio.get_running_loop()
+        wait_until = loop.time() + self._wait_timeout_sec
+        while loop.time() < wait_until:
+            await asyncio.sleep(self._poll_interval_sec)
+            if (value := await self._inner.get(key)) is not None:
+                return value
+
+        self._logger.warning(f"Timed out waiting for {key}, computing it locally")
+        return None
+
+    async def _release(self, lock, key: str) -> None:
+        try:
+            with self._breaker.guard():
+                await lock.release()
+        except LockError:
+            # lock expired while the value was computed
+            self._logger.warning(f"Lock for {key} expired before release")
+        except BackendUnavailableError as e:
+            # the lock expires on its own
+            self._logger.warning(f"Unable to release lock for {key}: {e}")
@@ -1,4 +1,5 @@
 import abc
+from collections.abc import Awaitable, Callable, Collection, Sequence
 from typing import Any
 
 
@@ -8,3 +9,73 @@ class ICache(abc.ABC):
 
     @abc.abstractmethod
     async def get(self, key: str) -> Any: ...
+
+    @abc.abstractmethod
+    async def delete(self, keys: Collection[str]) -> None: ...
+
+    async def get_many(self, keys: Sequence[str]) -> list[Any]:
+        """
+        Values of ``keys`` in the same order, ``None`` for the missing ones.
+        Backends able to fetch several keys in one round trip override it.
+        """
+        return [await self.get(key) for key in keys]
+
+    async def set_many(self, items: Sequence[tuple[str, Any, int]]) -> None:
+        """
+        Stores ``(key, value, timeout_sec)`` items, in one round trip if the backend can
+        """
+        for (key, value, timeout_sec) in items:
+            await self.set(key, value, timeout_sec)
+
+    async def get_or_set(
+        self, key: str, factory: Callable[[], Awaitable[Any]], timeout_sec: int, stale_sec: int = 0
+    ) -> Any:
+        """
+        Returns cached value or computes it with ``factory`` and stores it.
+        ``stale_sec`` allows serving the value that long after ``timeout_sec``
+        while it's recomputed, caches that can't do it ignore the parameter.
+        """
+        if (value := await self.get(key)) is not None:
+            return value
+
+        value = await factory()
+        await self.set(key, value, timeout_sec)
+        return value
+
+    async def listen(self) -> None:
+        """
+        Background loop following the backend notifications, runs until cancelled.
+        Most of the caches don't need it.
+        """
+
+
+class CacheWrapper(ICache):
+    """
+    Base class for caches adding behaviour on top of another cache
+    """
+
+    def __init__(self, inner: ICache):
+        self._inner = inner
+
+    async def set(self, key: str, value: Any, timeout_sec: int) -> None:
+        await self._inner.set(key, value, timeout_sec)
+
+    async def get(self, key: str) -> Any:
+        return await self._inner.get(key)
+
+    async def get_many(self, keys: Sequence[str]) -> list[Any]:
+        return await self._inner.get_many(keys)
+
+    async def set_many(self, items: Sequence[tuple[str, Any, int]]) -> None:
+        await self._inner.set_many(items)
+
+    async def delete(self, keys: Collection[str]) -> None:
+        await self._inner.delete(keys)
+
+    async def get_or_set(
+        self, key: str, factory: Callable[[], Awaitable[Any]], timeout_sec: int, stale_sec: int = 0
+    ) -> Any:
+        return await self._inner.get_or_set(key, factory, timeout_sec, stale_sec)
+
+    async def listen(self) -> None:
+        await self._inner.listen()
@@ -0,0 +1,98 @@
+import asyncio
+import contextvars
+import logging
+import math
+import random
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from .storage import CacheWrapper, ICache
+
+ENVELOPE_PREFIX = b"swr:"
+
+
+def pack(value: bytes | str, soft_expires_at: float, delta: float) -> bytes:
+    """
+    Prepends the soft expiry and the time it took to compute the value
+    """
+    if isinstance(value, str):
+        value = value.encode()
+
+    return ENVELOPE_PREFIX + f"{soft_expires_at:.3f}:{delta:.3f}:".encode() + value
+
+
+def unpack(raw: bytes | str) -> tuple[float, float, bytes]:
+    """
+    Returns ``(soft_expires_at, delta, value)``. Values stored without envelope
+    are treated as already stale.
+    """
+    if isinstance(raw, str):
+        raw = raw.encode()
+
+    if not raw.startswith(ENVELOPE_PREFIX):
+        return (0, 0, raw)
+
+    (soft_expires_at, delta, value) = raw[len(ENVELOPE_PREFIX) :].split(b":", 2)
+    return (float(soft_expires_at), float(delta), value)
+
+
+class StaleWhileRevalidateCache(CacheWrapper):
+    """
+    ``get_or_set`` with ``stale_sec`` keeps the entry for ``timeout_sec + stale_sec``.
+    After ``timeout_sec`` the stale value is returned at once and a single background
+    task of the worker recomputes it. To spread recomputations of the hot keys the
+    refresh may also start a bit before the soft expiry (probabilistic early
+    expiration, the closer to the expiry and the slower the factory the more likely).
+    """
+
+    def __init__(self, inner: ICache, beta: float = 1.0):
+        super().__init__(inner)
+        self._beta = beta
+        self._refreshing: dict[str, asyncio.Task] = {}
+        self._logger = logging.getLogger(__name__)
+
+    async def get_or_set(
+        self, key: str, factory: Callable[[], Awaitable[Any]], timeout_sec: int, stale_sec: int = 0
+    ) -> Any:
+        if stale_sec <= 0:
+            return await self._inner.get_or_set(key, factory, timeout_sec)
+
+        async def load() -> bytes:
+            return await self._load(factory, timeout_sec)
+
+        raw = await self._inner.get_or_set(key, load, timeout_sec + stale_sec)
+        (soft_expires_at, delta, value) = unpack(raw)
+        if self._should_refresh(soft_expires_at, delta):
+            self._refresh(key, load, timeout_sec + stale_sec)
+
+        return value
+
+    async def _load(self, factory: Callable[[], Awaitable[Any]], timeout_sec: int) -> bytes:
+        started = time.time()
+        value = await factory()
+        now = time.time()
+        return pack(value, now + timeout_sec, now - started)
+
+    def _should_refresh(self, soft_expires_at: float, delta: float) -> bool:
+        now = time.time()
+        if now >= soft_expires_at:
+            return True
+
+        # 1 - random() is in (0, 1] so log is defined
+        return now - delta * self._beta * math.log(1 - random.random()) >= soft_expires_at
+
+    def _refresh(self, key: str, load: Callable[[], Awaitable[bytes]], timeout_sec: int) -> None:
+        if key in self._refreshing:
+            return
+
+        async def refresh() -> None:
+            try:
+                await self._inner.set(key, await load(), timeout_sec)
+            except Exception as e:
+                self._logger.error(f"Failed to refresh {key}: {e}")
+            finally:
+                del self._refreshing[key]
+
+        # detached from the request, it's not bound by its deadline
+        self._refreshing[key] = asyncio.create_task(refresh(), context=contextvars.Context())
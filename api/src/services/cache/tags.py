@@ -0,0 +1,111 @@
+"""
+Tags of the cache entries, kept in Redis next to them.
+
+Entity tags (``movies:<id>``) name the documents an entry was built from. Every tag
+is a set of the keys of its entries, so invalidation deletes exactly these keys.
+
+Index tags (``movies``) are versioned namespaces for the entries which may change
+with any document of the index (lists and searches). The versions of the indices
+are part of the keys of such entries, invalidation increments the version and the
+old entries are never read again, they expire on their own.
+"""
+
+import time
+from collections.abc import Collection, Sequence
+from uuid import UUID
+
+from redis.asyncio import Redis
+from services.circuit_breaker import BackendUnavailableError, CircuitBreaker
+
+from .storage import ICache
+
+TAG_PREFIX = "cache:tag:"
+VERSION_PREFIX = "cache:version:"
+
+
+def entity_tag(index: str, id: UUID | str) -> str:
+    return f"{index}:{id}"
+
+
+class TagRegistry:
+    def __init__(self, client: Redis, cache: ICache, version_ttl_sec: float, breaker: CircuitBreaker):
+        self._client = client
+        # entries are deleted through the cache so its local tiers are dropped as well
+        self._cache = cache
+        # versions are read from Redis at most once in version_ttl_sec,
+        # so other workers see an invalidation of an index that much later
+        self._version_ttl_sec = version_ttl_sec
+        self._versions: dict[str, tuple[float, int]] = {}
+        # tags are skipped while Redis is unavailable, the cache is bypassed then anyway
+        self._breaker = breaker
+
+    async def versioned_key(self, key: str, indices: Sequence[str]) -> str | None:
+        """
+        ``key`` in the current namespace of ``indices``, ``None`` if the versions
+        can't be read, the entry mustn't be cached then
+        """
+        if not indices:
+            return key
+
+        try:
+            with self._breaker.guard():
+                versions = await self._get_versions(indices)
+        except BackendUnavailableError:
+            return None
+
+        return f"{key}:v" + ".".join(str(version) for version in versions)
+
+    async def tag(self, key: str, tags: Collection[str], timeout_sec: int) -> None:
+        """
+        Registers the entry ``key`` expiring in ``timeout_sec`` under every tag
+        """
+        try:
+            with self._breaker.guard():
+                async with self._client.pipeline(transaction=False) as pipe:
+                    for tag in tags:
+                        pipe.sadd(TAG_PREFIX + tag, key)
+                        # the set lives as long as the longest living of its entries
+                        pipe.expire(TAG_PREFIX + tag, timeout_sec, nx=True)
+                        pipe.expire(TAG_PREFIX + tag, timeout_sec, gt=True)
+                    await pipe.execute()
+        except BackendUnavailableError:
+            pass
+
+    async def invalidate(self, tags: Collection[str] = (), indices: Collection[str] = ()) -> int:
+        """
+        Deletes the entries tagged with any of ``tags`` and moves ``indices``
+        to new namespaces. Returns the number of deleted entries.
+        """
+        with self._breaker.guard():
+            return await self._invalidate(tags, indices)
+
+    async def _invalidate(self, tags: Collection[str], indices: Collection[str]) -> int:
+        keys: set[str] = set()
+        if tags:
+            async with self._client.pipeline(transaction=False) as pipe:
+                for tag in tags:
+                    pipe.smembers(TAG_PREFIX + tag)
+                for members in await pipe.execute():
+                    keys.update(member.decode() if isinstance(member, bytes) else member for member in members)
+
+        await self._cache.delete(keys)
+
+        async with self._client.pipeline(transaction=False) as pipe:
+            for tag in tags:
+                pipe.delete(TAG_PREFIX + tag)
+            for index in indices:
+                pipe.incr(VERSION_PREFIX + index)
+                self._versions.pop(index, None)
+            await pipe.execute()
+
+        return len(keys)
+
+    async def _get_versions(self, indices: Sequence[str]) -> list[int]:
+        now = time.monotonic()
+        expired = [index for index in indices if self._versions.get(index, (0, 0))[0] <= now]
+        if expired:
+            values = await self._client.mget([VERSION_PREFIX + index for index in expired])
+            for (index, value) in zip(expired, values):
+                self._versions[index] = (now + self._version_ttl_sec, int(value or 0))
+
+        return [self._versions[index][1] for index in indices]
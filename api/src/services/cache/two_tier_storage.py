@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import uuid
+from collections.abc import Collection, Sequence
+from typing import Any
+
+from redis.asyncio import Redis
+
+from .memory_storage import MemoryCache
+from .storage import ICache
+
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+
+class TwoTierCache(ICache):
+    """
+    In-process ``MemoryCache`` in front of the cache stored in Redis.
+
+    Every ``set`` and ``delete`` is published to ``INVALIDATION_CHANNEL`` so the other workers
+    drop their local copy of the key. ``listen`` must be running for a worker
+    to receive these messages.
+    """
+
+    def __init__(self, client: Redis, remote: ICache, local: MemoryCache, local_timeout_sec: int):
+        self._client = client
+        self._remote = remote
+        self._local = local
+        self._local_timeout_sec = local_timeout_sec
+        self._node_id = uuid.uuid4().hex
+        self._logger = logging.getLogger(__name__)
+
+    async def set(self, key: str, value: Any, timeout_sec: int) -> None:
+        await self._remote.set(key, value, timeout_sec)
+        await self._local.set(key, value, min(timeout_sec, self._local_timeout_sec))
+        await self._client.publish(INVALIDATION_CHANNEL, f"{self._node_id}:{key}")
+
+    async def set_many(self, items: Sequence[tuple[str, Any, int]]) -> None:
+        await self._remote.set_many(items)
+        for (key, value, timeout_sec) in items:
+            await self._local.set(key, value, min(timeout_sec, self._local_timeout_sec))
+        await self._publish([key for (key, _, _) in items])
+
+    async def get(self, key: str) -> Any:
+        if (value := await self._local.get(key)) is not None:
+            return value
+
+        value = await self._remote.get(key)
+        if value is not None:
+            await self._local.set(key, value, self._local_timeout_sec)
+
+        return value
+
+    async def get_many(self, keys: Sequence[str]) -> list[Any]:
+        """
+        Local hits first, the rest is read from Redis with one ``MGET``
+        """
+        values = [await self._local.get(key) for key in keys]
+        missing = [position for (position, value) in enumerate(values) if value is None]
+        if not missing:
+            return values
+
+        remote = await self._remote.get_many([keys[position] for position in missing])
+        for (position, value) in zip(missing, remote):
+            if value is not None:
+                values[position] = value
+                await self._local.set(keys[position], value, self._local_timeout_sec)
+
+        return values
+
+    async def delete(self, keys: Collection[str]) -> None:
+        await self._remote.delete(keys)
+        await self._local.delete(keys)
+        await self._publish(keys)
+
+    async def listen(self) -> None:
+        """
+        Follows invalidations published by the other workers until cancelled.
+        On connection errors the local tier is dropped as it can't be trusted anymore.
+        """
+        while True:
+            try:
+                async with self._client.pubsub() as pubsub:
+                    await pubsub.subscribe(INVALIDATION_CHANNEL)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._on_invalidate(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._logger.error(f"Cache invalidation channel failed: {e}")
+                self._local.clear()
+                await asyncio.sleep(1)
+
+    async def _publish(self, keys: Collection[str]) -> None:
+        async with self._client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.publish(INVALIDATION_CHANNEL, f"{self._node_id}:{key}")
+            await pipe.execute()
+
+    def _on_invalidate(self, data: str | bytes) -> None:
+        if isinstance(data, bytes):
+            data = data.decode()
+
+        (node_id, key) = data.split(":", 1)
+        if node_id != self._node_id:
+            self._local.invalidate(key)
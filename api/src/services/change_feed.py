@@ -0,0 +1,179 @@
+"""
+Follows the changes of the indices published by the ETL to a Redis stream.
+
+Every entry of the stream names the index and the reindexed documents::
+
+    XADD etl:changes MAXLEN ~ 100000 * index movies ids <id>,<id>,...
+
+``ids`` may be empty when the whole index was rewritten, then only the lists and
+searches of the index are dropped. The workers read the stream as a consumer group,
+so every change is handled once, and acknowledge an entry after it's handled.
+Entries of a worker which died before acknowledging them are claimed by the others.
+The hot lists and searches of the changed indices are recomputed once per read batch
+of entries, so a burst of changes doesn't leave their readers to Elasticsearch.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+from datetime import datetime
+from typing import Any, get_args
+from uuid import UUID
+
+from core.metrics import change_feed_entries
+from core.settings import ChangeFeedSettings
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+from services.base import INDICES
+from services.invalidation import InvalidationService
+from services.warmup import CacheWarmer
+
+
+class ChangesNotRetainedError(Exception):
+    """
+    The stream doesn't reach back to the requested time
+    """
+
+
+class ChangeFeedConsumer:
+    def __init__(
+        self,
+        client: Redis,
+        invalidation_service: InvalidationService,
+        settings: ChangeFeedSettings,
+        warmer: CacheWarmer | None = None,
+    ):
+        self._client = client
+        self._invalidation_service = invalidation_service
+        self._warmer = warmer
+        self._settings = settings
+        self._consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self._logger = logging.getLogger(__name__)
+
+    async def run(self) -> None:
+        """
+        Handles the changes until cancelled, on errors retries after a second
+        """
+        while True:
+            try:
+                await self._create_group()
+                while True:
+                    await self._handle(await self._claim())
+                    await self._handle(await self._read())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._logger.error(f"Change feed failed: {e}")
+                await asyncio.sleep(1)
+
+    async def _create_group(self) -> None:
+        try:
+            await self._client.xgroup_create(self._settings.stream, self._settings.group, id="$", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def _read(self) -> list[tuple[Any, dict]]:
+        response = await self._client.xreadgroup(
+            self._settings.group,
+            self._consumer,
+            {self._settings.stream: ">"},
+            count=self._settings.batch_size,
+            block=self._settings.block_ms,
+        )
+        return [entry for (_, entries) in response for entry in entries]
+
+    async def _claim(self) -> list[tuple[Any, dict]]:
+        (_, entries, *_) = await self._client.xautoclaim(
+            self._settings.stream,
+            self._settings.group,
+            self._consumer,
+            min_idle_time=self._settings.claim_idle_sec * 1000,
+            count=self._settings.batch_size,
+        )
+        return entries
+
+    async def _handle(self, entries: list[tuple[Any, dict]]) -> None:
+        changed: set[str] = set()
+        for (entry_id, fields) in entries:
+            change = _parse(fields)
+            if change is None:
+                self._logger.error(f"Malformed change {entry_id}: {fields}")
+                change_feed_entries.labels("unknown", "malformed").inc()
+            else:
+                (index, ids) = change
+                deleted = await self._invalidation_service.invalidate(index, ids, rewarm=True)
+                self._logger.info(f"Invalidated {deleted} entries of {len(ids)} changed documents of {index}")
+                change_feed_entries.labels(index, "handled").inc()
+                changed.add(index)
+
+            # a failed invalidation is not acknowledged and is claimed again later
+            await self._client.xack(self._settings.stream, self._settings.group, entry_id)
+
+        if changed and self._warmer is not None:
+            try:
+                await self._warmer.rewarm(changed)
+            except Exception as e:
+                # the readers compute the entries then
+                self._logger.warning(f"Unable to warm up the entries of {', '.join(sorted(changed))}: {e}")
+
+
+async def changed_since(
+    client: Redis, stream: str, index: INDICES, since: datetime, batch_size: int = 1000
+) -> list[UUID] | None:
+    """
+    Documents of ``index`` changed since ``since`` according to the stream,
+    ``None`` if the whole index was rewritten meanwhile. Entry ids are the times
+    the changes were published, so the stream must cover ``since``: either it has
+    an entry as old, or the trimmed entries were all older.
+    """
+    since_ms = int(since.timestamp() * 1000)
+    try:
+        info = await client.xinfo_stream(stream)
+    except ResponseError:
+        # there is no stream
+        raise ChangesNotRetainedError(f"changes of {index} are not recorded")
+
+    first_ms = _entry_ms(info["first-entry"][0]) if info.get("first-entry") else None
+    # Redis 7 reports the newest trimmed entry
+    trimmed_ms = _entry_ms(info.get("max-deleted-entry-id") or "0-0")
+    if not ((first_ms is not None and first_ms <= since_ms) or 0 < trimmed_ms < since_ms):
+        raise ChangesNotRetainedError(f"changes of {index} since {since.isoformat()} are not retained")
+
+    ids: dict[UUID, None] = {}
+    start = f"{since_ms}-0"
+    while entries := await client.xrange(stream, start, "+", count=batch_size):
+        for (_, fields) in entries:
+            change = _parse(fields)
+            if change is None or change[0] != index:
+                continue
+            if not change[1]:
+                return None
+            ids.update(dict.fromkeys(change[1]))
+
+        start = "(" + _text(entries[-1][0])
+
+    return list(ids)
+
+
+def _entry_ms(entry_id: bytes | str) -> int:
+    return int(_text(entry_id).split("-")[0])
+
+
+def _parse(fields: dict) -> tuple[INDICES, list[UUID]] | None:
+    fields = {_text(key): _text(value) for (key, value) in fields.items()}
+    index = fields.get("index")
+    if index not in get_args(INDICES):
+        return None
+
+    try:
+        ids = [UUID(id) for id in fields.get("ids", "").split(",") if id]
+    except ValueError:
+        return None
+
+    return (index, ids)  # type: ignore[return-value]
+
+
+def _text(value: bytes | str) -> str:
+    return value.decode() if isinstance(value, bytes) else value
@@ -0,0 +1,135 @@
+import logging
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import Literal
+
+from core.deadline import DeadlineExceededError
+from core.metrics import circuit_breaker_transitions
+
+
+class BackendUnavailableError(Exception):
+    def __init__(self, backend: str, retry_after_sec: float):
+        super().__init__(f"{backend} is unavailable")
+        self.backend = backend
+        self.retry_after_sec = retry_after_sec
+
+
+class CircuitOpenError(BackendUnavailableError):
+    """
+    The call wasn't even tried, the circuit is open
+    """
+
+
+class CircuitBreaker:
+    """
+    Closed: calls pass, ``failure_threshold`` consecutive failures open the circuit.
+    Open: calls fail fast with ``CircuitOpenError`` for ``reset_timeout_sec``,
+    then a single trial call is let through (half-open) and closes or reopens it.
+
+    Only the errors ``is_failure`` accepts count as failures, the others mean the
+    backend answered. Failures are raised as ``BackendUnavailableError``.
+    Health probes are reported with ``report``, so the circuit opens without waiting
+    for the calls to fail. A ping is cheaper than the calls and may answer while they still
+    fail, so an answered probe only lets the trial call of an open circuit through at once,
+    the circuit is closed by the calls alone.
+    """
+
+    def __init__(
+        self, backend: str, is_failure: Callable[[Exception], bool], failure_threshold: int, reset_timeout_sec: float
+    ):
+        self.backend = backend
+        self._is_failure = is_failure
+        self._failure_threshold = failure_threshold
+        self._reset_timeout_sec = reset_timeout_sec
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._trial = False
+        self._logger = logging.getLogger(__name__)
+
+    @property
+    def state(self) -> Literal["closed", "open", "half_open"]:
+        if self._opened_at is None:
+            return "closed"
+
+        if time.monotonic() - self._opened_at < self._reset_timeout_sec:
+            return "open"
+
+        return "half_open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+
+        if state == "open" or self._trial:
+            return False
+
+        self._trial = True
+        return True
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        if not self.allow():
+            raise CircuitOpenError(self.backend, self._retry_after())
+
+        try:
+            yield
+        except DeadlineExceededError:
+            # cut by the deadline of the request, says nothing about the backend
+            self._trial = False
+            raise
+        except Exception as e:
+            if not self._is_failure(e):
+                # the backend answered, with an error of the request
+                self._close()
+                raise
+
+            self._fail()
+            raise BackendUnavailableError(self.backend, self._retry_after()) from e
+        except BaseException:
+            # cancelled, the outcome is unknown
+            self._trial = False
+            raise
+        else:
+            self._close()
+
+    def report(self, available: bool) -> None:
+        """
+        Outcome of a health probe
+        """
+        if not available:
+            self._open()
+        elif self._opened_at is not None and not self._trial:
+            # half-open
+            self._opened_at = min(self._opened_at, time.monotonic() - self._reset_timeout_sec)
+
+    def _fail(self) -> None:
+        self._trial = False
+        self._failures += 1
+        if self._opened_at is not None or self._failures >= self._failure_threshold:
+            self._open()
+
+    def _open(self) -> None:
+        if self._opened_at is None:
+            self._logger.warning(f"Circuit of {self.backend} is open")
+            circuit_breaker_transitions.labels(self.backend, "open").inc()
+
+        self._opened_at = time.monotonic()
+        self._failures = 0
+        self._trial = False
+
+    def _close(self) -> None:
+        if self._opened_at is not None:
+            self._logger.warning(f"Circuit of {self.backend} is closed")
+            circuit_breaker_transitions.labels(self.backend, "closed").inc()
+
+        self._opened_at = None
+        self._failures = 0
+        self._trial = False
+
+    def _retry_after(self) -> float:
+        if self._opened_at is None:
+            return self._reset_timeout_sec
+
+        return max(self._opened_at + self._reset_timeout_sec - time.monotonic(), 0)
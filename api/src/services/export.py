@@ -0,0 +1,82 @@
+from collections.abc import AsyncIterator, Sequence
+from datetime import datetime
+from functools import lru_cache
+from uuid import UUID
+
+import orjson
+from core.settings import ChangeFeedSettings, ExportSettings
+from db.elastic import get_elastic
+from db.redis import get_cache, get_redis
+from elasticsearch import AsyncElasticsearch
+from fastapi import Depends
+from pydantic import BaseModel
+from redis.asyncio import Redis
+from services.base import INDICES, ServiceABC, source_fields
+from services.cache.storage import ICache
+from services.change_feed import changed_since
+
+
+class ExportService(ServiceABC):
+    """
+    Streams whole indices as NDJSON, one document per line in ``id`` order.
+    Only a page of documents is held in memory, the next one is read once
+    the previous one is sent, so a slow client slows down the reads as well.
+    """
+
+    def __init__(self, elastic: AsyncElasticsearch, cache: ICache, client: Redis):
+        super().__init__(elastic, cache)
+        self._client = client
+        self._settings = ExportSettings()
+        self._change_feed_settings = ChangeFeedSettings()
+
+    async def export(
+        self,
+        index: INDICES,
+        model: type[BaseModel],
+        fields: Sequence[str] | None = None,
+        updated_since: datetime | None = None,
+    ) -> AsyncIterator[bytes]:
+        """
+        Documents of ``index`` with the fields of ``model``, limited to ``fields`` (``id`` is always included).
+        ``updated_since`` limits them to the documents changed since then according to the change feed,
+        raises ``ChangesNotRetainedError`` if it doesn't reach back that far.
+        The checks are done before the first line is produced.
+        """
+        source = source_fields(model)
+        if fields is not None:
+            source = tuple(field for field in source if field.split(".")[0] in {"id", *fields})
+
+        ids = None
+        if updated_since is not None:
+            ids = await changed_since(self._client, self._change_feed_settings.stream, index, updated_since)
+
+        return self._stream(index, source, ids)
+
+    async def _stream(self, index: INDICES, source: tuple[str, ...], ids: list[UUID] | None) -> AsyncIterator[bytes]:
+        page_size = self._settings.page_size
+        if ids is None:
+            pages = self._scan_from_elastic(
+                index, {"match_all": {}}, page_size, source, keep_alive=self._settings.pit_keep_alive
+            )
+            async for hits in pages:
+                yield _ndjson(hits)
+            return
+
+        # documents deleted since then are missing
+        for start in range(0, len(ids), page_size):
+            query = {"ids": {"values": [str(id) for id in ids[start : start + page_size]]}}
+            async for hits in self._scan_from_elastic(index, query, page_size, source):
+                yield _ndjson(hits)
+
+
+def _ndjson(hits: list[dict]) -> bytes:
+    return b"".join(orjson.dumps(hit["_source"], option=orjson.OPT_APPEND_NEWLINE) for hit in hits)
+
+
+@lru_cache()
+def get_export_service(
+    elastic: AsyncElasticsearch = Depends(get_elastic),
+    cache: ICache = Depends(get_cache),
+    client: Redis = Depends(get_redis),
+) -> ExportService:
+    return ExportService(elastic, cache, client)
@@ -1,51 +1,154 @@
 from collections import defaultdict
-from collections.abc import Collection
+from collections.abc import Collection, Sequence
+from dataclasses import dataclass
 from functools import lru_cache
 from typing import Literal, get_args
 from uuid import UUID
 
 from db.elastic import get_elastic
+from db.redis import get_cache
 from elasticsearch import AsyncElasticsearch
 from fastapi import Depends
-from models.film import Film
-from services.base import ServiceABC
+from models.film import Film, FilmFacets, GenreFacet, RatingFacet
+from models.person import FilmRoles
+from pydantic import BaseModel
+from services.base import ServiceABC, source_fields
+from services.cache.storage import ICache
+from services.genre_catalog import GenreCatalog, get_genre_catalog
+from services.pagination import Cursor, Page
 
 FILM_CACHE_EXPIRE_IN_SECONDS = 60 * 5
 
 PERSON_ROLE = Literal["directors", "actors", "writers"]
 
+# buckets of the rating facet, the first and the last ones are open
+RATING_FACET_BOUNDS = (2, 4, 6, 8)
+FACETS_AGGREGATIONS = {
+    "genres": {"terms": {"field": "genres", "size": 100}},
+    "imdb_rating": {
+        "range": {
+            "field": "imdb_rating",
+            "ranges": [
+                {key: value for (key, value) in {"from": start, "to": end}.items() if value is not None}
+                for (start, end) in zip((None, *RATING_FACET_BOUNDS), (*RATING_FACET_BOUNDS, None))
+            ],
+        }
+    },
+}
+
+
+@dataclass
+class FacetedPage(Page[dict]):
+    # None unless requested
+    facets: FilmFacets | None = None
 
-class FilmService(ServiceABC):
-    def __init__(self, elastic: AsyncElasticsearch):
-        super().__init__(elastic)
 
-    async def search_films(self, query: str, page_number: int = 1, page_size: int = 10) -> list[Film]:
-        """Поиск фильмов по текстовому запросу и фильтрам."""
-        search_query = {"bool": {"must": [{"match": {"title": {"query": query, "fuzziness": "AUTO"}}}]}}
+class FilmService(ServiceABC):
+    def __init__(self, elastic: AsyncElasticsearch, cache: ICache, genre_catalog: GenreCatalog):
+        super().__init__(elastic, cache)
+        self._genre_catalog = genre_catalog
+
+    async def search_films(
+        self,
+        query: str,
+        page_number: int = 1,
+        page_size: int = 10,
+        cursor: Cursor | None = None,
+        model: type[BaseModel] = Film,
+        genre: UUID | None = None,
+        rating_from: float | None = None,
+        rating_to: float | None = None,
+        facets: bool = False,
+    ) -> FacetedPage:
+        """
+        Поиск фильмов по текстовому запросу и фильтрам.
+        Из документов читаются только поля, нужные для ``model``, они возвращаются как есть,
+        фильмам без рейтинга ставится 0.
+        Фильтры не влияют на релевантность и кэшируются Elasticsearch,
+        ``facets`` считает жанры и рейтинги найденных фильмов тем же запросом.
+        """
+        filters: list[dict] = []
+        if genre:
+            if (genre_name := await self._get_genre_name(genre)) is None:
+                # no film has an unknown genre
+                return FacetedPage([], facets=FilmFacets(genres=[], imdb_rating=[]) if facets else None)
+            filters.append({"term": {"genres": genre_name}})
+        if rating_from is not None or rating_to is not None:
+            bounds = {"gte": rating_from, "lt": rating_to}
+            filters.append({"range": {"imdb_rating": {key: val for (key, val) in bounds.items() if val is not None}}})
+
+        search_query = {
+            "bool": {"must": [{"match": {"title": {"query": query, "fuzziness": "AUTO"}}}], "filter": filters}
+        }
         from_index = (page_number - 1) * page_size
-        films_data = await self._query_from_elastic("movies", search_query, size=page_size, skip=from_index)
-        return [Film(**film) for film in films_data]
+        page = await self._page_from_elastic(
+            "movies",
+            search_query,
+            size=page_size,
+            skip=from_index,
+            cursor=cursor,
+            source=source_fields(model),
+            aggregations=FACETS_AGGREGATIONS if facets else None,
+        )
+        return FacetedPage(
+            _with_rating(page.items),
+            page.next_cursor,
+            facets=self._facets(page.aggregations) if facets else None,
+        )
+
+    def _facets(self, aggregations: dict | None) -> FilmFacets:
+        aggregations = aggregations or {}
+        snapshot = self._genre_catalog.snapshot
+        genres = [
+            GenreFacet(
+                id=snapshot.id_by_name.get(bucket["key"]) if snapshot else None,
+                name=bucket["key"],
+                count=bucket["doc_count"],
+            )
+            for bucket in aggregations.get("genres", {}).get("buckets", [])
+        ]
+        ratings = [
+            RatingFacet(rating_from=bucket.get("from"), rating_to=bucket.get("to"), count=bucket["doc_count"])
+            for bucket in aggregations.get("imdb_rating", {}).get("buckets", [])
+        ]
+        return FilmFacets(genres=genres, imdb_rating=ratings)
 
     async def get_all_films(
-        self, page_number: int, page_size: int, genre: UUID | None = None, sort: dict[str, int] | None = None
-    ) -> list[Film]:
-        """Возвращает все фильмы из базы."""
+        self,
+        page_number: int,
+        page_size: int,
+        genre: UUID | None = None,
+        sort: dict[str, int] | None = None,
+        cursor: Cursor | None = None,
+        model: type[BaseModel] = Film,
+    ) -> Page[dict]:
+        """
+        Возвращает все фильмы из базы.
+        Из документов читаются только поля, нужные для ``model``, они возвращаются как есть,
+        фильмам без рейтинга ставится 0.
+        """
 
         from_index = (page_number - 1) * page_size
         query = {"match_all": {}}
 
         if genre:
-            if genre_record := await self._get_from_elastic("genres", genre):
-                query = {"bool": {"filter": [{"term": {"genres": genre_record["name"]}}]}}
+            if genre_name := await self._get_genre_name(genre):
+                query = {"bool": {"filter": [{"term": {"genres": genre_name}}]}}
+
+        page = await self._page_from_elastic(
+            "movies", query, size=page_size, skip=from_index, sort=sort, cursor=cursor, source=source_fields(model)
+        )
+        return Page(_with_rating(page.items), page.next_cursor)
+
+    async def _get_genre_name(self, genre_id: UUID) -> str | None:
+        if (snapshot := self._genre_catalog.snapshot) and (genre := snapshot.by_id.get(genre_id)):
+            return genre.name
 
-        films_data = await self._query_from_elastic("movies", query, size=page_size, skip=from_index, sort=sort)
+        # catalog is not loaded yet or the genre was added after the last refresh
+        if genre_record := await self._get_from_elastic("genres", genre_id):
+            return genre_record["name"]
 
-        prepared_films = []
-        for film in films_data:
-            if film.get("imdb_rating") is None:
-                film["imdb_rating"] = 0
-            prepared_films.append(Film(**film))
-        return prepared_films
+        return None
 
     async def get_by_id(self, film_id: UUID) -> Film | None:
         """
@@ -54,52 +157,91 @@ class FilmService(ServiceABC):
         if doc := await self._get_from_elastic("movies", film_id):
             return Film(**doc)
 
-    async def find_by_all_persons(self, person_ids: list[UUID]) -> dict[UUID, list[Film]]:
-        subqueries = [FilmService._construct_find_by_all_persons_subquery(person_ids, m) for m in get_args(PERSON_ROLE)]
-        data = await self._query_from_elastic("movies", {"bool": {"should": subqueries}})
-        films = [Film(**doc) for doc in data]
-        return FilmService._group_by_person(films, person_ids)
+    async def get_many(self, film_ids: Sequence[UUID]) -> list[Film | None]:
+        """
+        Films in the order of ``film_ids``, ``None`` for the missing ones
+        """
+        docs = await self._get_many_from_elastic("movies", film_ids)
+        return [Film(**doc) if doc is not None else None for doc in docs]
+
+    async def find_roles_by_persons(self, person_ids: list[UUID]) -> dict[UUID, list[FilmRoles]]:
+        """
+        Films of every person with the roles the person had in them.
+        Matching role entries come back as inner hits with ids only,
+        all films are read page by page so nothing is truncated.
+        """
+        if not person_ids:
+            return {}
+
+        ids = [str(id) for id in person_ids]
+        subqueries = [
+            FilmService._construct_find_by_all_persons_subquery(ids, role, inner_hits_size=min(len(ids), 100))
+            for role in get_args(PERSON_ROLE)
+        ]
+        query = {"bool": {"should": subqueries}}
+
+        person_roles: dict[UUID, dict[UUID, list[str]]] = defaultdict(lambda: defaultdict(list))
+        async for hits in self._scan_from_elastic("movies", query, source=()):
+            for hit in hits:
+                film_id = UUID(hit["_id"])
+                # roles are checked in the same order for every film
+                for role in get_args(PERSON_ROLE):
+                    for inner_hit in hit["inner_hits"][role]["hits"]["hits"]:
+                        person_id = UUID(inner_hit["fields"][f"{role}.id"][0])
+                        person_roles[person_id][film_id].append(role)
+
+        return {
+            person_id: [FilmRoles(film_id=film_id, roles=roles) for (film_id, roles) in films.items()]
+            for (person_id, films) in person_roles.items()
+        }
 
-    async def find_by_person(self, person_id: UUID) -> list[Film]:
+    async def find_by_person(self, person_id: UUID, model: type[BaseModel] = Film) -> list[dict]:
         """
-        Search for films by person took part in production
+        Search for films by person took part in production, read page by page so nothing is truncated.
+        Only the fields required for ``model`` are read and returned as they are, a missing rating is 0
         """
         subqueries = [FilmService._construct_find_by_person_subquery(person_id, m) for m in get_args(PERSON_ROLE)]
-        data = await self._query_from_elastic("movies", {"bool": {"should": subqueries}})
-        return [Film(**doc) for doc in data]
+        query = {"bool": {"should": subqueries}}
+        return _with_rating([
+            hit["_source"]
+            async for hits in self._scan_from_elastic("movies", query, source=source_fields(model))
+            for hit in hits
+        ])
 
     @staticmethod
-    def _construct_find_by_all_persons_subquery(person_ids: Collection[UUID], property: str) -> dict:
+    def _construct_find_by_all_persons_subquery(
+        person_ids: Collection[str], property: str, inner_hits_size: int
+    ) -> dict:
         return {
-            "nested": {"path": property, "query": {"bool": {"should": [{"terms": {f"{property}.id": person_ids}}]}}}
+            "nested": {
+                "path": property,
+                "query": {"terms": {f"{property}.id": list(person_ids)}},
+                "inner_hits": {
+                    "name": property,
+                    "size": inner_hits_size,
+                    "_source": False,
+                    "docvalue_fields": [f"{property}.id"],
+                },
+            }
         }
 
     @staticmethod
     def _construct_find_by_person_subquery(person_id: UUID, property: str) -> dict:
         return {"nested": {"path": property, "query": {"bool": {"should": [{"match": {f"{property}.id": person_id}}]}}}}
 
-    @staticmethod
-    def _group_by_person(films: list[Film], persons: Collection[UUID]) -> dict[UUID, list[Film]]:
-        person_films = defaultdict(list)
-        for film in films:
-            ids = FilmService._extract_persons(film)
-            for person in ids.intersection(persons):
-                person_films[person].append(film)
-
-        return person_films
-
-    @staticmethod
-    def _extract_persons(film: Film) -> set[UUID]:
-        person_ids: set[UUID] = set()
-        for attr in get_args(PERSON_ROLE):
-            role_persons = [p.id for p in getattr(film, attr)]
-            person_ids.update(role_persons)
 
-        return person_ids
+def _with_rating(films: list[dict]) -> list[dict]:
+    # films without a rating are listed with 0, the responses require one
+    for film in films:
+        if film.get("imdb_rating") is None:
+            film["imdb_rating"] = 0
+    return films
 
 
 @lru_cache()
 def get_film_service(
     elastic: AsyncElasticsearch = Depends(get_elastic),
+    cache: ICache = Depends(get_cache),
+    genre_catalog: GenreCatalog = Depends(get_genre_catalog),
 ) -> FilmService:
-    return FilmService(elastic)
+    return FilmService(elastic, cache, genre_catalog)
@@ -1,23 +1,31 @@
+from collections.abc import Sequence
 from functools import lru_cache
 from uuid import UUID
 
 from db.elastic import get_elastic
+from db.redis import get_cache
 from elasticsearch import AsyncElasticsearch
 from fastapi import Depends
 from models.genre import Genre
 from services.base import ServiceABC
+from services.cache.storage import ICache
+from services.genre_catalog import GenreCatalog, get_genre_catalog
 
 CACHE_EXPIRE_IN_SECONDS = 60 * 5
 
 
 class GenreService(ServiceABC):
-    def __init__(self, elastic: AsyncElasticsearch):
-        super().__init__(elastic)
+    def __init__(self, elastic: AsyncElasticsearch, cache: ICache, catalog: GenreCatalog):
+        super().__init__(elastic, cache)
+        self._catalog = catalog
 
     async def get_all(self) -> list[Genre]:
         """
         Get all available genres
         """
+        if snapshot := self._catalog.snapshot:
+            return list(snapshot.genres)
+
         docs = await self._query_from_elastic("genres", {"match_all": {}})
         return [Genre(**doc) for doc in docs]
 
@@ -25,12 +33,36 @@ class GenreService(ServiceABC):
         """
         Get single genre by id
         """
+        if (snapshot := self._catalog.snapshot) and (genre := snapshot.by_id.get(genre_id)):
+            return genre
+
+        # catalog is not loaded yet or the genre was added after the last refresh
         if doc := await self._get_from_elastic("genres", genre_id):
             return Genre(**doc)
 
+    async def get_many(self, genre_ids: Sequence[UUID]) -> list[Genre | None]:
+        """
+        Genres in the order of ``genre_ids``, ``None`` for the missing ones
+        """
+        snapshot = self._catalog.snapshot
+        genres = [snapshot.by_id.get(id) if snapshot else None for id in genre_ids]
+        missing = [id for (id, genre) in zip(genre_ids, genres) if genre is None]
+        if not missing:
+            return genres
+
+        # catalog is not loaded yet or the genres were added after the last refresh
+        docs = iter(await self._get_many_from_elastic("genres", missing))
+        return [genre if genre is not None else _from_doc(next(docs)) for genre in genres]
+
+
+def _from_doc(doc: dict | None) -> Genre | None:
+    return Genre(**doc) if doc is not None else None
+
 
 @lru_cache()
 def get_genre_service(
     elastic: AsyncElasticsearch = Depends(get_elastic),
+    cache: ICache = Depends(get_cache),
+    catalog: GenreCatalog = Depends(get_genre_catalog),
 ) -> GenreService:
-    return GenreService(elastic)
+    return GenreService(elastic, cache, catalog)
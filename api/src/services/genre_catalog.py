@@ -0,0 +1,84 @@
+import asyncio
+import logging
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+from types import MappingProxyType
+from uuid import UUID
+
+from core.metrics import observe_elasticsearch, observe_elasticsearch_took
+from elasticsearch import AsyncElasticsearch
+from models.genre import Genre
+
+
+@dataclass(frozen=True)
+class GenreSnapshot:
+    genres: tuple[Genre, ...]
+    by_id: Mapping[UUID, Genre]
+    id_by_name: Mapping[str, UUID]
+
+    @classmethod
+    def build(cls, genres: Iterable[Genre]) -> "GenreSnapshot":
+        genres = tuple(genres)
+        return cls(
+            genres=genres,
+            by_id=MappingProxyType({genre.id: genre for genre in genres}),
+            id_by_name=MappingProxyType({genre.name: genre.id for genre in genres}),
+        )
+
+
+class GenreCatalog:
+    """
+    Keeps the whole (tiny) genres index in memory. The snapshot is
+    immutable and replaced as a whole on every refresh.
+    """
+
+    def __init__(self):
+        self.snapshot: GenreSnapshot | None = None
+        self._logger = logging.getLogger(__name__)
+
+    async def refresh(self, elastic: AsyncElasticsearch) -> None:
+        with observe_elasticsearch("genres", "catalog"):
+            data = await elastic.search(index="genres", body={"query": {"match_all": {}}, "size": 10_000})
+        observe_elasticsearch_took("genres", "catalog", data)
+        self.snapshot = GenreSnapshot.build(Genre(**doc["_source"]) for doc in data["hits"]["hits"])
+
+    async def run(self, elastic: AsyncElasticsearch, interval_sec: float, delay: bool = False) -> None:
+        """
+        Refreshes the snapshot every ``interval_sec`` until cancelled,
+        ``delay`` skips the first refresh if the snapshot was just loaded
+        """
+        if delay:
+            await asyncio.sleep(interval_sec)
+
+        while True:
+            try:
+                await self.refresh(elastic)
+            except Exception as e:
+                # keep serving the previous snapshot
+                self._logger.error(f"Unable to refresh genres catalog: {e}")
+
+            await asyncio.sleep(interval_sec)
+
+    async def invalidate(self, elastic: AsyncElasticsearch) -> None:
+        """
+        Reloads the snapshot after the genres were changed. If it can't be reloaded
+        the snapshot is dropped, so the genres are read from Elasticsearch until
+        the next refresh instead of being served stale. The catalogs of the other
+        workers catch up on their next refresh.
+        """
+        if self.snapshot is None:
+            # not in use or not loaded yet
+            return
+
+        try:
+            await self.refresh(elastic)
+        except Exception as e:
+            self._logger.error(f"Unable to refresh genres catalog, dropping it: {e}")
+            self.snapshot = None
+
+
+catalog = GenreCatalog()
+
+
+def get_genre_catalog() -> GenreCatalog:
+    return catalog
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+from core.settings import CircuitBreakerSettings
+from elasticsearch import AsyncElasticsearch, TransportError
+from redis import exceptions as redis_exceptions
+from redis.asyncio import Redis
+from services.circuit_breaker import CircuitBreaker
+
+
+def is_elasticsearch_failure(error: Exception) -> bool:
+    if isinstance(error, TransportError):
+        # connection errors and timeouts have no status code
+        return not isinstance(error.status_code, int) or error.status_code >= 500
+
+    return isinstance(error, TimeoutError)
+
+
+def is_redis_failure(error: Exception) -> bool:
+    return isinstance(error, (redis_exceptions.ConnectionError, redis_exceptions.TimeoutError, TimeoutError))
+
+
+@dataclass(frozen=True)
+class HealthSnapshot:
+    elasticsearch: bool
+    redis: bool
+    checked_at: float
+
+
+class HealthProber:
+    """
+    Pings Elasticsearch and Redis in the background. The last result backs /health
+    and feeds the circuit breakers the calls to the backends go through.
+    """
+
+    def __init__(self, settings: CircuitBreakerSettings):
+        self._settings = settings
+        self.elasticsearch = CircuitBreaker(
+            "elasticsearch", is_elasticsearch_failure, settings.failure_threshold, settings.reset_timeout
+        )
+        self.redis = CircuitBreaker("redis", is_redis_failure, settings.failure_threshold, settings.reset_timeout)
+        self.snapshot: HealthSnapshot | None = None
+        self._logger = logging.getLogger(__name__)
+
+    async def probe(self, elastic: AsyncElasticsearch, redis: Redis) -> HealthSnapshot:
+        (is_es_up, is_redis_up) = await asyncio.gather(
+            self._ping("Elasticsearch", elastic.ping), self._ping("Redis", redis.ping)
+        )
+        self.elasticsearch.report(is_es_up)
+        self.redis.report(is_redis_up)
+        self.snapshot = HealthSnapshot(is_es_up, is_redis_up, time.time())
+        return self.snapshot
+
+    async def run(self, elastic: AsyncElasticsearch, redis: Redis) -> None:
+        """
+        Probes the backends every ``probe_interval`` until cancelled
+        """
+        while True:
+            await self.probe(elastic, redis)
+            await asyncio.sleep(self._settings.probe_interval)
+
+    async def _ping(self, backend: str, ping: Callable[[], Awaitable[bool]]) -> bool:
+        try:
+            if await asyncio.wait_for(ping(), self._settings.probe_timeout):
+                return True
+            self._logger.error(f"{backend} health probe failed")
+        except Exception as e:
+            self._logger.error(f"{backend} health probe failed: {e!r}")
+
+        return False
+
+
+prober: HealthProber | None = None
+
+
+def get_health_prober() -> HealthProber:
+    # created on first use, after the settings are loaded
+    global prober
+    if prober is None:
+        prober = HealthProber(CircuitBreakerSettings())
+
+    return prober
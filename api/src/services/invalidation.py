@@ -0,0 +1,73 @@
+import asyncio
+from collections.abc import Sequence
+from functools import lru_cache
+from typing import get_args
+from uuid import UUID
+
+import orjson
+from db.elastic import get_elastic
+from db.redis import get_cache, get_tag_registry
+from elasticsearch import AsyncElasticsearch
+from fastapi import Depends
+from services.base import INDICES, ServiceABC
+from services.cache.storage import ICache
+from services.cache.tags import TagRegistry, entity_tag
+from services.film import PERSON_ROLE
+from services.genre_catalog import GenreCatalog, get_genre_catalog
+
+
+class InvalidationService(ServiceABC):
+    def __init__(
+        self, elastic: AsyncElasticsearch, cache: ICache, registry: TagRegistry | None, genre_catalog: GenreCatalog
+    ):
+        super().__init__(elastic, cache)
+        self._registry = registry
+        self._genre_catalog = genre_catalog
+
+    async def invalidate(self, index: INDICES, ids: Sequence[UUID], rewarm: bool = False) -> int:
+        """
+        Drops the cached documents ``ids`` of ``index``, the entries built from them
+        and the lists and searches of the index, the genres catalog is reloaded
+        before the entries are rebuilt from it. Returns the number of deleted entries
+        built from the documents. ``rewarm`` caches the fresh documents which were cached,
+        so the entries are rebuilt without reading them from Elasticsearch one by one.
+        """
+        keys = [self._entity_key(index, id) for id in ids]
+        hot: set[str] = set()
+        if rewarm:
+            hot = {key for (key, cached) in zip(keys, await self.cache.get_many(keys)) if cached is not None}
+        docs = await self._get_all_from_elastic(index, ids) if hot or (index == "movies" and ids) else []
+
+        tags = [entity_tag(index, id) for id in ids]
+        if index == "movies":
+            # entries of the persons which have just been added to the films aren't tagged with them yet
+            tags.extend(
+                entity_tag("persons", person["id"])
+                for film in docs if film is not None
+                for role in get_args(PERSON_ROLE)
+                for person in film.get(role) or []
+            )
+
+        if index == "genres":
+            await self._genre_catalog.invalidate(self.elastic)
+
+        await self.cache.delete(keys)
+        deleted = await self._registry.invalidate(tags, [index]) if self._registry is not None else 0
+
+        ttl = self._entity_cache_settings.ttl(index)
+        await asyncio.gather(*(
+            self.cache.set(key, orjson.dumps(doc), ttl)
+            for (key, doc) in zip(keys, docs) if key in hot and doc is not None
+        ))
+
+        return deleted
+
+
+@lru_cache()
+def get_invalidation_service(
+    elastic: AsyncElasticsearch = Depends(get_elastic),
+    cache: ICache = Depends(get_cache),
+    registry: TagRegistry | None = Depends(get_tag_registry),
+    genre_catalog: GenreCatalog = Depends(get_genre_catalog),
+) -> InvalidationService:
+    return InvalidationService(elastic, cache, registry, genre_catalog)
@@ -0,0 +1,90 @@
+import asyncio
+import contextvars
+from collections.abc import Awaitable, Callable, Hashable
+from dataclasses import dataclass, field
+from typing import Any, Generic, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+
+# the keys and the metadata of the loads
+BatchFunction = Callable[[list[K], list[Any]], Awaitable[list[Any]]]
+
+
+@dataclass(eq=False)
+class _Batch(Generic[K]):
+    futures: dict[K, list[asyncio.Future]] = field(default_factory=dict)
+    metadata: list[Any] = field(default_factory=list)
+    task: asyncio.Task | None = None
+
+    def abandoned(self) -> bool:
+        return all(future.cancelled() for futures in self.futures.values() for future in futures)
+
+
+class BatchLoader(Generic[K]):
+    """
+    Collects keys requested within one event loop tick (or ``window_sec`` after
+    the first one) and resolves them with a single call to ``batch_fn``.
+    ``batch_fn`` must return results in the same order as the keys it was given,
+    exceptions among the results are raised by the loads of their keys.
+    The ``metadata`` of the loads joining a batch, e.g. the deadlines of the requests,
+    is passed to ``batch_fn`` too, in the order of the loads.
+
+    The batch is shared by the callers, so it runs in a context of its own
+    and is cancelled only when all of them are.
+    """
+
+    def __init__(self, batch_fn: BatchFunction[K], window_sec: float = 0):
+        self._batch_fn = batch_fn
+        self._window_sec = window_sec
+        self._pending: _Batch[K] | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def load(self, key: K, metadata: Any = None) -> Any:
+        loop = asyncio.get_running_loop()
+        if self._pending is None:
+            self._pending = _Batch()
+            context = contextvars.Context()
+            if self._window_sec > 0:
+                loop.call_later(self._window_sec, self._schedule_dispatch, context=context)
+            else:
+                loop.call_soon(self._schedule_dispatch, context=context)
+
+        batch = self._pending
+        future = loop.create_future()
+        batch.futures.setdefault(key, []).append(future)
+        batch.metadata.append(metadata)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            if batch.task is not None and batch.abandoned():
+                batch.task.cancel()
+            raise
+
+    def _schedule_dispatch(self) -> None:
+        batch, self._pending = self._pending, None
+        if batch is None or batch.abandoned():
+            return
+
+        batch.task = asyncio.create_task(self._dispatch(batch))
+        # keep a strong reference until the task is done
+        self._tasks.add(batch.task)
+        batch.task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, batch: _Batch[K]) -> None:
+        try:
+            results = await self._batch_fn(list(batch.futures), batch.metadata)
+        except Exception as e:
+            for futures in batch.futures.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        for futures, result in zip(batch.futures.values(), results):
+            for future in futures:
+                if future.done():
+                    continue
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
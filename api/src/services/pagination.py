@@ -0,0 +1,57 @@
+import base64
+import binascii
+import json
+import math
+import sys
+from dataclasses import dataclass
+from typing import Any, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class PaginationError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class Cursor:
+    """
+    Position after the last hit of a page: its sort values (``search_after``),
+    the sorted fields to check the cursor is used with the same sort and
+    the point in time the page was read from, if any.
+    """
+
+    search_after: list[Any]
+    sort: list[str]
+    pit_id: str | None = None
+
+    def encode(self) -> str:
+        # json and not orjson: missing float sort values may come as +-Infinity
+        payload = json.dumps({"a": [_finite(v) for v in self.search_after], "s": self.sort, "p": self.pit_id})
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, value: str) -> "Cursor":
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)))
+            return cls(search_after=list(payload["a"]), sort=list(payload["s"]), pit_id=payload.get("p"))
+        except (binascii.Error, ValueError, TypeError, KeyError) as e:
+            raise PaginationError("malformed cursor") from e
+
+
+@dataclass
+class Page(Generic[T]):
+    items: list[T]
+    # None when there are no more items
+    next_cursor: Cursor | None = None
+    # raw results of the aggregations requested together with the page
+    aggregations: dict[str, Any] | None = None
+
+
+def _finite(value: Any) -> Any:
+    # Elasticsearch uses +-Infinity for documents missing a float sort field,
+    # the largest double parsed back as float gives the same value.
+    if isinstance(value, float) and math.isinf(value):
+        return math.copysign(sys.float_info.max, value)
+
+    return value
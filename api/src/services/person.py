@@ -1,29 +1,43 @@
+from collections.abc import Sequence
 from functools import lru_cache
 from uuid import UUID
 
 from db.elastic import get_elastic
+from db.redis import get_cache
 from elasticsearch import AsyncElasticsearch
 from fastapi import Depends
 from models.person import Person
 from services.base import ServiceABC
+from services.cache.storage import ICache
+from services.pagination import Cursor, Page
 
 
 class PersonService(ServiceABC):
-    def __init__(self, elastic: AsyncElasticsearch):
-        super().__init__(elastic)
+    def __init__(self, elastic: AsyncElasticsearch, cache: ICache):
+        super().__init__(elastic, cache)
 
     async def get_by_id(self, person_id: UUID) -> Person | None:
         if doc := await self._get_from_elastic("persons", person_id):
             return Person(**doc)
 
-    async def search(self, search: str, page_number: int = 1, page_size: int = 50) -> list[Person]:
+    async def get_many(self, person_ids: Sequence[UUID]) -> list[Person | None]:
+        """
+        Persons in the order of ``person_ids``, ``None`` for the missing ones
+        """
+        docs = await self._get_many_from_elastic("persons", person_ids)
+        return [Person(**doc) if doc is not None else None for doc in docs]
+
+    async def search(
+        self, search: str, page_number: int = 1, page_size: int = 50, cursor: Cursor | None = None
+    ) -> Page[Person]:
         query = {"bool": {"must": [{"match": {"full_name": search}}]}}
-        entities = await self._query_from_elastic("persons", query, page_size, (page_number - 1) * page_size)
-        return [Person(**doc) for doc in entities]
+        page = await self._page_from_elastic("persons", query, page_size, (page_number - 1) * page_size, cursor=cursor)
+        return Page([Person(**doc) for doc in page.items], page.next_cursor)
 
 
 @lru_cache()
 def get_person_service(
     elastic: AsyncElasticsearch = Depends(get_elastic),
+    cache: ICache = Depends(get_cache),
 ) -> PersonService:
-    return PersonService(elastic)
+    return PersonService(elastic, cache)
@@ -1,11 +1,12 @@
 import asyncio
+from collections.abc import Sequence
 from functools import lru_cache
 from uuid import UUID
 
 from fastapi import Depends
-from models.film import Film
-from models.person import Person
+from models.person import FilmRoles, Person
 from services.film import FilmService, get_film_service
+from services.pagination import Cursor, Page
 from services.person import PersonService, get_person_service
 
 
@@ -18,15 +19,31 @@ class PersonFilmService:
         self._film_service = film_service
         self._person_service = person_service
 
-    async def search(self, query: str, page_number: int = 1, page_size: int = 50) -> list[tuple[Person, list[Film]]]:
-        persons = await self._person_service.search(query, page_number, page_size)
-        person_films = await self._film_service.find_by_all_persons([p.id for p in persons])
-        return [(person, person_films.get(person.id, [])) for person in persons]
+    async def search(
+        self, query: str, page_number: int = 1, page_size: int = 50, cursor: Cursor | None = None
+    ) -> Page[tuple[Person, list[FilmRoles]]]:
+        persons = await self._person_service.search(query, page_number, page_size, cursor)
+        person_films = await self._film_service.find_roles_by_persons([p.id for p in persons.items])
+        return Page([(person, person_films.get(person.id, [])) for person in persons.items], persons.next_cursor)
 
-    async def get_person_with_films(self, person_id: UUID) -> tuple[Person | None, list[Film]]:
-        filmsTask = self._film_service.find_by_person(person_id)
+    async def get_person_with_films(self, person_id: UUID) -> tuple[Person | None, list[FilmRoles]]:
+        filmsTask = self._film_service.find_roles_by_persons([person_id])
         personTask = self._person_service.get_by_id(person_id)
-        return await asyncio.gather(personTask, filmsTask)
+        (person, person_films) = await asyncio.gather(personTask, filmsTask)
+        return (person, person_films.get(person_id, []))
+
+    async def get_persons_with_films(
+        self, person_ids: Sequence[UUID]
+    ) -> list[tuple[Person, list[FilmRoles]] | None]:
+        """
+        Persons in the order of ``person_ids`` with their films, ``None`` for the missing ones.
+        Films of all the persons are found with a single search.
+        """
+        (persons, person_films) = await asyncio.gather(
+            self._person_service.get_many(person_ids),
+            self._film_service.find_roles_by_persons(list(dict.fromkeys(person_ids))),
+        )
+        return [(person, person_films.get(person.id, [])) if person else None for person in persons]
 
 
 @lru_cache()
@@ -0,0 +1,168 @@
+"""
+Batching of the concurrent Elasticsearch queries of all the services (DataLoader).
+
+The gets and searches issued within one event loop tick (or the configured window)
+are sent together: gets only as one ``mget`` across the indices, otherwise one
+``_msearch`` with the gets of every index turned into an ``ids`` search.
+A single query is sent as is. The results are fanned back out to the callers.
+Unlike ``mget`` the searches see the documents only after the refresh of the index.
+
+A batch is bounded by the latest deadline of its requests, every request
+stops waiting for it at its own deadline.
+"""
+
+import time
+from collections import defaultdict
+from collections.abc import Collection, Iterator
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Literal, cast
+
+import orjson
+from core import deadline
+from core.deadline import DeadlineExceededError
+from core.metrics import observe_elasticsearch, observe_elasticsearch_took
+from core.settings import ElasticsearchSettings
+from elasticsearch import AsyncElasticsearch, ConnectionTimeout, NotFoundError, TransportError
+from elasticsearch.exceptions import HTTP_EXCEPTIONS
+from services.circuit_breaker import BackendUnavailableError
+from services.health import get_health_prober
+from services.loader import BatchLoader
+
+# ("get", index, id) or ("search", index, operation, body serialized with sorted keys)
+Query = tuple[Literal["get"], str, str] | tuple[Literal["search"], str, str, bytes]
+
+
+class QueryBatcher:
+    def __init__(self, elastic: AsyncElasticsearch, window_sec: float = 0):
+        self.elastic = elastic
+        self._loader: BatchLoader[Query] = BatchLoader(self._dispatch, window_sec)
+        self._breaker = get_health_prober().elasticsearch
+
+    async def get(self, index: str, id: str) -> dict | None:
+        """
+        ``_source`` of the document, ``None`` if it's missing
+        """
+        return await self._loader.load(("get", index, id), deadline.current())
+
+    async def search(self, index: str, body: dict, operation: str) -> dict:
+        """
+        Response of the search, identical concurrent searches are sent once.
+        ``operation`` labels the time reported by Elasticsearch, like for the searches sent directly.
+        """
+        query: Query = ("search", index, operation, orjson.dumps(body, option=orjson.OPT_SORT_KEYS))
+        return await self._loader.load(query, deadline.current())
+
+    async def _dispatch(self, queries: list[Query], deadlines: list[float | None]) -> list[Any]:
+        # the batch is needed until the last of its requests gives up, None is no deadline
+        batch_deadline = None if None in deadlines or not deadlines else max(cast(list[float], deadlines))
+
+        searches = [query for query in queries if query[0] == "search"]
+        if not searches:
+            return await self._mget(cast(list[tuple[Literal["get"], str, str]], queries), batch_deadline)
+        if len(queries) == 1:
+            (_, index, operation, body) = queries[0]
+            return [await self._search(index, operation, body, batch_deadline)]
+
+        return await self._msearch(queries, batch_deadline)
+
+    async def _mget(self, gets: list[tuple[Literal["get"], str, str]], batch_deadline: float | None) -> list[Any]:
+        indices = {index for (_, index, _) in gets}
+        with self._call(_label(indices), "mget", batch_deadline) as params:
+            docs = [{"_index": index, "_id": id} for (_, index, id) in gets]
+            data = await self.elastic.mget({"docs": docs}, **params)
+
+        # documents of missing indices come with an error
+        return [doc["_source"] if doc.get("found") else None for doc in cast(dict, data)["docs"]]
+
+    async def _search(self, index: str, operation: str, body: bytes, batch_deadline: float | None) -> dict:
+        with self._call(index, operation, batch_deadline) as params:
+            data = cast(dict, await self.elastic.search(index=index, body=orjson.loads(body), **params))
+        observe_elasticsearch_took(index, operation, data)
+        return data
+
+    @contextmanager
+    def _call(self, label: str, operation: str, batch_deadline: float | None) -> Iterator[dict[str, Any]]:
+        """
+        Like ``ServiceABC._call_elastic`` with the deadline of the batch
+        """
+        params: dict[str, Any] = {}
+        if batch_deadline is not None:
+            if (left := batch_deadline - time.monotonic()) <= 0:
+                raise DeadlineExceededError()
+            params["request_timeout"] = left
+
+        try:
+            with self._breaker.guard(), observe_elasticsearch(label, operation):
+                yield params
+        except BackendUnavailableError as e:
+            # counted as a failure of Elasticsearch first
+            timed_out = isinstance(e.__cause__, ConnectionTimeout)
+            if timed_out and batch_deadline is not None and time.monotonic() >= batch_deadline:
+                raise DeadlineExceededError() from e
+            raise
+
+    async def _msearch(self, queries: list[Query], batch_deadline: float | None) -> list[Any]:
+        ids: dict[str, list[str]] = defaultdict(list)
+        for query in queries:
+            if query[0] == "get":
+                ids[query[1]].append(query[2])
+
+        lines: list[dict] = []
+        for query in queries:
+            if query[0] == "search":
+                lines.extend(({"index": query[1]}, orjson.loads(query[3])))
+        for (index, index_ids) in ids.items():
+            lines.extend(({"index": index}, {"query": {"ids": {"values": index_ids}}, "size": len(index_ids)}))
+
+        indices = {query[1] for query in queries}
+        with self._call(_label(indices), "msearch", batch_deadline) as params:
+            data = await self.elastic.msearch(body=lines, **params)
+        responses = iter(cast(dict, data)["responses"])
+
+        searched: list[Any] = []
+        for query in queries:
+            if query[0] == "search":
+                response = next(responses)
+                if "error" in response:
+                    searched.append(_error(response))
+                else:
+                    observe_elasticsearch_took(query[1], query[2], response)
+                    searched.append(response)
+
+        found: dict[tuple[str, str], dict | BaseException] = {}
+        for index in ids:
+            response = next(responses)
+            if "error" not in response:
+                found.update(((index, hit["_id"]), hit["_source"]) for hit in response["hits"]["hits"])
+            elif not isinstance(error := _error(response), NotFoundError):
+                found.update(((index, id), error) for id in ids[index])
+
+        # missing documents and the documents of missing indices are None
+        searched_iterator = iter(searched)
+        return [
+            next(searched_iterator) if query[0] == "search" else found.get((query[1], query[2])) for query in queries
+        ]
+
+
+def _error(response: dict) -> TransportError:
+    """
+    Failed search of ``_msearch``, raised as the client raises the failed requests
+    """
+    status = response.get("status", 500)
+    error = response["error"]
+    error_type = error.get("type", "unknown") if isinstance(error, dict) else str(error)
+    return HTTP_EXCEPTIONS.get(status, TransportError)(status, error_type, error)
+
+
+def _label(indices: Collection[str]) -> str:
+    # the batches of several indices are labeled together to keep the series bounded
+    return next(iter(indices)) if len(indices) == 1 else "multi"
+
+
+@lru_cache()
+def get_query_batcher(elastic: AsyncElasticsearch) -> QueryBatcher:
+    """
+    The batcher of ``elastic`` shared by all the services
+    """
+    return QueryBatcher(elastic, ElasticsearchSettings().batch_window_ms / 1000)
@@ -0,0 +1,180 @@
+"""
+Typeahead of film titles and person names, answered from the worker memory.
+
+Every name is indexed under each of its word starts ("star wars" is found by "st"
+and by "wa") in a sorted array searched with ``bisect``. The arrays are built from
+Elasticsearch in a thread and replaced as a whole on every refresh, like the genres catalog.
+The suggestions are kept serialized, a response is just joined from them.
+"""
+
+import asyncio
+import heapq
+import logging
+import re
+import unicodedata
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any
+
+import orjson
+from db.elastic import get_elastic
+from db.redis import get_cache
+from elasticsearch import AsyncElasticsearch
+from fastapi import Depends
+from services.base import INDICES, ServiceABC
+from services.cache.storage import ICache
+
+MAX_LIMIT = 20
+# prefixes matching more keys have their best items precomputed,
+# so a lookup never reads more keys than that
+LARGE_RANGE = 1000
+# sorts after any continuation of a prefix
+_LAST_CHAR = "\U0010ffff"
+
+_WORD = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    """
+    Lower case words without diacritics separated by single spaces
+    """
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(_WORD.findall(text))
+
+
+@dataclass(frozen=True)
+class PrefixIndex:
+    # payloads, best first
+    items: tuple[Any, ...]
+    # sorted normalized word starts and the numbers of their items
+    keys: tuple[str, ...]
+    numbers: tuple[int, ...]
+    # best item numbers of the prefixes matching more than LARGE_RANGE keys
+    top: dict[str, tuple[int, ...]]
+
+    @classmethod
+    def build(cls, items: Iterable[tuple[str, Any]]) -> "PrefixIndex":
+        """
+        ``items`` are ``(name, payload)`` pairs, best first
+        """
+        items = list(items)
+        entries: list[tuple[str, int]] = []
+        for (number, (name, _)) in enumerate(items):
+            words = normalize(name).split(" ")
+            entries.extend((" ".join(words[start:]), number) for start in range(len(words)) if words[start])
+        entries.sort()
+
+        keys = tuple(key for (key, _) in entries)
+        numbers = tuple(number for (_, number) in entries)
+        return cls(
+            items=tuple(payload for (_, payload) in items),
+            keys=keys,
+            numbers=numbers,
+            top=_top_of_large_ranges(keys, numbers),
+        )
+
+    def lookup(self, prefix: str, limit: int) -> list[Any]:
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + _LAST_CHAR, start)
+        if end - start > LARGE_RANGE:
+            numbers = list(self.top[prefix][:limit])
+        else:
+            # an item matching by several words is found several times
+            numbers = heapq.nsmallest(limit, set(self.numbers[start:end]))
+
+        return [self.items[number] for number in numbers]
+
+
+def _top_of_large_ranges(keys: Sequence[str], numbers: Sequence[int]) -> dict[str, tuple[int, ...]]:
+    top: dict[str, tuple[int, ...]] = {}
+    # prefixes with their ranges of keys, the ranges of the longer ones are within them
+    ranges = [("", 0, len(keys))]
+    while ranges:
+        (prefix, start, end) = ranges.pop()
+        if prefix:
+            top[prefix] = tuple(sorted(set(numbers[start:end]))[:MAX_LIMIT])
+
+        # the keys equal to the prefix come first and have no next char
+        position = bisect_right(keys, prefix, start, end)
+        while position < end:
+            longer = keys[position][: len(prefix) + 1]
+            longer_end = bisect_left(keys, longer + _LAST_CHAR, position, end)
+            if longer_end - position > LARGE_RANGE:
+                ranges.append((longer, position, longer_end))
+            position = longer_end
+
+    return top
+
+
+class SuggestService(ServiceABC):
+    def __init__(self, elastic: AsyncElasticsearch, cache: ICache):
+        super().__init__(elastic, cache)
+        self.films: PrefixIndex | None = None
+        self.persons: PrefixIndex | None = None
+        self._logger = logging.getLogger(__name__)
+
+    def suggest_films(self, prefix: str, limit: int) -> bytes | None:
+        """
+        JSON array of the best rated films with a word of the title starting with ``prefix``,
+        ``None`` until the index is loaded
+        """
+        return _json_array(self.films.lookup(prefix, limit)) if self.films is not None else None
+
+    def suggest_persons(self, prefix: str, limit: int) -> bytes | None:
+        return _json_array(self.persons.lookup(prefix, limit)) if self.persons is not None else None
+
+    async def refresh(self) -> None:
+        films = await self._read("movies", ("id", "title", "imdb_rating"))
+        # best rated first, the films without rating last
+        films.sort(key=lambda doc: (-(doc.get("imdb_rating") or -1), doc["title"]))
+        self.films = await asyncio.to_thread(PrefixIndex.build, ((doc["title"], orjson.dumps(doc)) for doc in films))
+
+        persons = await self._read("persons", ("id", "full_name"))
+        # shorter names first, they are complete sooner
+        persons.sort(key=lambda doc: (len(doc["full_name"]), doc["full_name"]))
+        self.persons = await asyncio.to_thread(
+            PrefixIndex.build, ((doc["full_name"], orjson.dumps(doc)) for doc in persons)
+        )
+
+    async def run(self, interval_sec: float, delay: bool = False) -> None:
+        """
+        Refreshes the indices every ``interval_sec`` until cancelled,
+        ``delay`` skips the first refresh if they were just loaded
+        """
+        if delay:
+            await asyncio.sleep(interval_sec)
+
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                # keep serving the previous indices
+                self._logger.error(f"Unable to refresh suggestions: {e}")
+
+            await asyncio.sleep(interval_sec)
+
+    async def _read(self, index: INDICES, source: tuple[str, ...]) -> list[dict]:
+        docs: list[dict] = []
+        async for hits in self._scan_from_elastic(index, {"match_all": {}}, source=source):
+            docs.extend(hit["_source"] for hit in hits)
+
+        return docs
+
+
+def _json_array(items: list[bytes]) -> bytes:
+    return b"[" + b",".join(items) + b"]"
+
+
+@lru_cache()
+def get_suggest_service(
+    elastic: AsyncElasticsearch = Depends(get_elastic),
+    cache: ICache = Depends(get_cache),
+) -> SuggestService:
+    return SuggestService(elastic, cache)
@@ -0,0 +1,116 @@
+"""
+Computes the hot responses in advance, at startup and then periodically,
+so they don't expire and every deploy doesn't start with a burst of identical
+searches. Only one worker does it per interval, elected with a Redis key.
+The hot entries of the changed indices are also recomputed right after
+their namespaces are bumped, by the worker which handled the change.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections.abc import Callable, Collection
+
+from core.settings import WarmupSettings
+from redis.asyncio import Redis
+from services.cache.response import CachedEntry
+from services.cache.storage import ICache
+from services.cache.swr import pack
+from services.cache.tags import TagRegistry
+from services.genre import GenreService
+
+LOCK_KEY = "warmup:lock"
+
+# the hot entries of the routes given the ids of all the genres
+HotEntries = Callable[[list[uuid.UUID]], list[CachedEntry]]
+
+
+class CacheWarmer:
+    def __init__(
+        self,
+        client: Redis,
+        cache: ICache,
+        registry: TagRegistry | None,
+        genre_service: GenreService,
+        hot_entries: HotEntries,
+        settings: WarmupSettings,
+    ):
+        self._client = client
+        self._cache = cache
+        self._registry = registry
+        self._genre_service = genre_service
+        self._hot_entries = hot_entries
+        self._settings = settings
+        self._node_id = uuid.uuid4().hex
+        self._logger = logging.getLogger(__name__)
+
+    async def run(self, delay: bool = False) -> None:
+        """
+        Warms the cache every interval until cancelled,
+        ``delay`` skips the first run if the startup warm-up just happened
+        """
+        if delay:
+            await asyncio.sleep(self._settings.interval)
+
+        while True:
+            try:
+                await self.warm()
+            except Exception as e:
+                self._logger.error(f"Cache warm-up failed: {e}")
+
+            await asyncio.sleep(self._settings.interval)
+
+    async def warm(self) -> int:
+        """
+        Computes the hot entries if no other worker does it in this interval,
+        returns the number of stored entries
+        """
+        elected = await self._client.set(LOCK_KEY, self._node_id, nx=True, ex=self._settings.interval)
+        if not elected:
+            return 0
+
+        return await self._warm_hot_entries()
+
+    async def rewarm(self, indices: Collection[str]) -> int:
+        """
+        Computes the hot entries kept in the namespaces of ``indices`` once they are bumped,
+        so their readers don't all miss them at once, returns the number of stored entries
+        """
+        return await self._warm_hot_entries(set(indices))
+
+    async def _warm_hot_entries(self, indices: set[str] | None = None) -> int:
+        started = time.perf_counter()
+        genres = await self._genre_service.get_all()
+        entries = [
+            entry for entry in self._hot_entries([genre.id for genre in genres])
+            if indices is None or indices.intersection(entry.indices)
+        ]
+        semaphore = asyncio.Semaphore(self._settings.concurrency)
+
+        async def compute(entry: CachedEntry) -> tuple[str, bytes, int] | None:
+            async with semaphore:
+                try:
+                    return await self._compute(entry)
+                except Exception as e:
+                    self._logger.warning(f"Unable to warm up {entry.key}: {e}")
+                    return None
+
+        items = [item for item in await asyncio.gather(*(compute(entry) for entry in entries)) if item is not None]
+        await self._cache.set_many(items)
+        self._logger.info(f"Warmed up {len(items)} of {len(entries)} entries in {time.perf_counter() - started:.1f}s")
+        return len(items)
+
+    async def _compute(self, entry: CachedEntry) -> tuple[str, bytes, int] | None:
+        key = await entry.versioned_key(self._registry)
+        if key is None:
+            return None
+
+        started = time.time()
+        value = await entry.dump(key, self._registry)
+        if entry.stale_sec <= 0:
+            return (key, value, entry.timeout_sec)
+
+        # the same envelope the stale-while-revalidate cache stores
+        now = time.time()
+        return (key, pack(value, now + entry.timeout_sec, now - started), entry.timeout_sec + entry.stale_sec)
@@ -0,0 +1,256 @@
+"""
+Synthetic catalog of the benchmark.
+
+Documents are not stored: every field is derived from the document number
+with a hash, so only the indexes needed to answer the queries of the services
+are kept in memory. A million films take under 200 MB and half a minute to build.
+"""
+
+from array import array
+from bisect import bisect_right
+from collections import defaultdict
+from collections.abc import Iterator, Sequence
+from itertools import product
+from uuid import UUID
+
+ROLES = ("directors", "actors", "writers")
+ROLE_SIZES = {"directors": 1, "actors": 3, "writers": 1}
+
+GENRE_NAMES = (
+    "Action", "Adventure", "Animation", "Biography", "Comedy", "Crime", "Documentary", "Drama", "Family",
+    "Fantasy", "History", "Horror", "Music", "Mystery", "Romance", "Sci-Fi", "Sport", "Thriller", "War", "Western",
+)
+_SYLLABLES = (
+    "ka", "lo", "mi", "ra", "te", "zu", "no", "shi", "va", "de", "bor", "lin", "mar", "tor", "gen", "wel",
+    "sa", "ri", "po", "ne", "chi", "fa", "gu", "he", "jo", "ky", "lu", "me", "ni", "or", "pe", "qu",
+)
+WORDS = tuple(a + b for (a, b) in product(_SYLLABLES, repeat=2))
+FIRST_NAMES = WORDS[:64]
+LAST_NAMES = WORDS[-256:]
+
+TITLE_WORDS = 3
+# ratings are stored as tenths, 1.0 - 10.0
+RATINGS = range(10, 101)
+
+_ROLE_SALTS = {role: 20 + ix * 10 for (ix, role) in enumerate(ROLES)}
+_ROLE_OFFSETS = {role: sum(ROLE_SIZES[other] for other in ROLES[:ix]) for (ix, role) in enumerate(ROLES)}
+_PERSONS_PER_FILM = sum(ROLE_SIZES.values())
+
+_MASK = 2**64 - 1
+_MOVIE, _PERSON, _GENRE = 1, 2, 3
+
+
+def _mix(value: int, salt: int) -> int:
+    # splitmix64 finalizer
+    value = (value * 0x9E3779B97F4A7C15 + salt * 0xD1B54A32D192ED03) & _MASK
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK
+    return value ^ (value >> 31)
+
+
+def make_id(kind: int, number: int) -> str:
+    # ids of the same kind sort in the order of the numbers,
+    # formatted by hand as building UUID objects dominates the profile
+    value = f"{(kind << 120) | number:032x}"
+    return f"{value[:8]}-{value[8:12]}-{value[12:16]}-{value[16:20]}-{value[20:]}"
+
+
+def parse_id(id: str | UUID) -> tuple[int, int]:
+    value = UUID(str(id)).int
+    return (value >> 120, value & ((1 << 120) - 1))
+
+
+def tokenize(text: str) -> list[str]:
+    return text.lower().split()
+
+
+class RatingOrder:
+    """
+    Films sorted by the rating and then by id, kept as one bucket per rating value
+    """
+
+    def __init__(self, buckets: dict[int, array], descending: bool):
+        ratings = sorted(buckets, reverse=descending)
+        self._ratings = ratings
+        # ascending in the order of the buckets
+        self._keys = [-rating if descending else rating for rating in ratings]
+        self._buckets = [buckets[rating] for rating in ratings]
+        self._starts = [0]
+        for bucket in self._buckets:
+            self._starts.append(self._starts[-1] + len(bucket))
+        self._descending = descending
+
+    def __len__(self) -> int:
+        return self._starts[-1]
+
+    def slice(self, start: int, stop: int) -> Iterator[tuple[int, int]]:
+        """Yields (rating, film) pairs in positions [start, stop)"""
+        stop = min(stop, len(self))
+        position = start
+        index = bisect_right(self._starts, position) - 1
+        while position < stop and index < len(self._buckets):
+            bucket = self._buckets[index]
+            offset = position - self._starts[index]
+            for film in bucket[offset:offset + stop - position]:
+                yield (self._ratings[index], film)
+                position += 1
+            index += 1
+
+    def position_after(self, rating: int, film: int) -> int:
+        index = bisect_right(self._keys, -rating if self._descending else rating)
+        if index and self._ratings[index - 1] == rating:
+            return self._starts[index - 1] + bisect_right(self._buckets[index - 1], film)
+
+        return self._starts[index]
+
+
+class Catalog:
+    def __init__(self, films: int, persons: int | None = None, genres: int = len(GENRE_NAMES)):
+        self.films = films
+        self.persons = persons or max(films // 10, 100)
+        self.genres = min(genres, len(GENRE_NAMES))
+
+        # term -> films or persons having it, in ascending order
+        self.title_index: dict[str, array] = defaultdict(lambda: array("I"))
+        self.name_index: dict[str, array] = defaultdict(lambda: array("I"))
+        # role -> person -> films
+        self.person_films: dict[str, list[array]] = {role: [] for role in ROLES}
+        by_rating: dict[int, array] = defaultdict(lambda: array("I"))
+        by_genre_rating: list[dict[int, array]] = [defaultdict(lambda: array("I")) for _ in range(self.genres)]
+
+        for role in ROLES:
+            self.person_films[role] = [array("I") for _ in range(self.persons)]
+        # film -> persons of all the roles, ROLE_SIZES items per role
+        self._film_persons = array("I")
+
+        for film in range(films):
+            rating = self.rating(film)
+            by_rating[rating].append(film)
+            for genre in self.film_genres(film):
+                by_genre_rating[genre][rating].append(film)
+            # the same word may repeat in a title
+            for word in set(self.title_words(film)):
+                self.title_index[word].append(film)
+            for role in ROLES:
+                persons = [_mix(film, _ROLE_SALTS[role] + ix) % self.persons for ix in range(ROLE_SIZES[role])]
+                self._film_persons.extend(persons)
+                for person in persons:
+                    films_of_person = self.person_films[role][person]
+                    if not films_of_person or films_of_person[-1] != film:
+                        films_of_person.append(film)
+
+        for person in range(self.persons):
+            for word in set(tokenize(self.person_name(person))):
+                self.name_index[word].append(person)
+
+        self.by_rating = {False: RatingOrder(by_rating, False), True: RatingOrder(by_rating, True)}
+        self.by_genre_rating = [
+            {False: RatingOrder(buckets, False), True: RatingOrder(buckets, True)} for buckets in by_genre_rating
+        ]
+
+    # films
+
+    def rating(self, film: int) -> int:
+        return RATINGS[_mix(film, 1) % len(RATINGS)]
+
+    def title_words(self, film: int) -> list[str]:
+        return [WORDS[_mix(film, 10 + ix) % len(WORDS)] for ix in range(TITLE_WORDS)]
+
+    def film_genres(self, film: int) -> list[int]:
+        first = _mix(film, 2) % self.genres
+        second = _mix(film, 3) % self.genres
+        return [first] if first == second else sorted((first, second))
+
+    def film_persons(self, film: int, role: str) -> array:
+        start = film * _PERSONS_PER_FILM + _ROLE_OFFSETS[role]
+        return self._film_persons[start:start + ROLE_SIZES[role]]
+
+    def film(self, film: int) -> dict:
+        description = None
+        if _mix(film, 4) % 4:
+            description = " ".join(WORDS[_mix(film, 40 + ix) % len(WORDS)] for ix in range(12))
+
+        doc = {
+            "id": make_id(_MOVIE, film),
+            "title": " ".join(self.title_words(film)).capitalize(),
+            "description": description,
+            "imdb_rating": self.rating(film) / 10,
+            "genres": [GENRE_NAMES[genre] for genre in self.film_genres(film)],
+        }
+        for role in ROLES:
+            people = [{"id": make_id(_PERSON, person), "name": self.person_name(person)}
+                      for person in dict.fromkeys(self.film_persons(film, role))]
+            doc[role] = people
+            doc[f"{role}_names"] = " ".join(person["name"] for person in people)
+
+        return doc
+
+    def film_number(self, id: str | UUID) -> int | None:
+        return self._number(id, _MOVIE, self.films)
+
+    # persons
+
+    def person_name(self, person: int) -> str:
+        first = FIRST_NAMES[_mix(person, 50) % len(FIRST_NAMES)]
+        last = LAST_NAMES[_mix(person, 51) % len(LAST_NAMES)]
+        return f"{first.capitalize()} {last.capitalize()}"
+
+    def person(self, person: int) -> dict:
+        return {"id": make_id(_PERSON, person), "full_name": self.person_name(person), "gender": None}
+
+    def person_number(self, id: str | UUID) -> int | None:
+        return self._number(id, _PERSON, self.persons)
+
+    # genres
+
+    def genre(self, genre: int) -> dict:
+        name = GENRE_NAMES[genre]
+        return {"id": make_id(_GENRE, genre), "name": name, "description": f"{name} films"}
+
+    def genre_number(self, id: str | UUID) -> int | None:
+        return self._number(id, _GENRE, self.genres)
+
+    def genre_by_name(self, name: str) -> int | None:
+        try:
+            genre = GENRE_NAMES.index(name)
+        except ValueError:
+            return None
+
+        return genre if genre < self.genres else None
+
+    # ids of the generated documents
+
+    def film_ids(self) -> Sequence[str]:
+        return _Ids(_MOVIE, self.films)
+
+    def person_ids(self) -> Sequence[str]:
+        return _Ids(_PERSON, self.persons)
+
+    def genre_ids(self) -> Sequence[str]:
+        return _Ids(_GENRE, self.genres)
+
+    @staticmethod
+    def _number(id: str | UUID, kind: int, count: int) -> int | None:
+        try:
+            (id_kind, number) = parse_id(id)
+        except ValueError:
+            return None
+
+        return number if id_kind == kind and number < count else None
+
+
+class _Ids(Sequence[str]):
+    def __init__(self, kind: int, count: int):
+        self._kind = kind
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index):  # type: ignore[override]
+        if isinstance(index, slice):
+            return [make_id(self._kind, number) for number in range(self._count)[index]]
+        if not -self._count <= index < self._count:
+            raise IndexError(index)
+
+        return make_id(self._kind, index % self._count)
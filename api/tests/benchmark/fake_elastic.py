@@ -0,0 +1,341 @@
+"""
+In-process stand-in for ``AsyncElasticsearch`` serving the synthetic catalog.
+
+Only the requests the services actually send are understood, anything else
+raises so a change of the queries doesn't silently benchmark the wrong thing.
+Relevance is the number of matched terms, fuzziness is ignored.
+"""
+
+import asyncio
+import json
+import time
+from bisect import bisect_left
+from collections import Counter
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+from catalog import ROLES, Catalog, parse_id, tokenize
+from elasticsearch import NotFoundError
+
+SCHEMAS = Path(__file__).parents[1] / "functional" / "src" / "testdata" / "schemas"
+
+
+class UnsupportedQuery(ValueError):
+    pass
+
+
+class FakeElasticsearch:
+    def __init__(self, catalog: Catalog, latency_sec: float = 0):
+        self.catalog = catalog
+        self.latency_sec = latency_sec
+        self.mappings = {path.stem: json.loads(path.read_text())["mappings"] for path in SCHEMAS.glob("*.json")}
+        self.requests: Counter[str] = Counter()
+        # time spent serving the requests, the fake shares the CPU with the application
+        self.busy_sec = 0.0
+        self._check_mappings()
+
+    async def ping(self, **kwargs) -> bool:
+        return True
+
+    async def close(self) -> None:
+        pass
+
+    async def mget(self, body: dict, index: str | None = None, **kwargs) -> dict:
+        # {"ids": [...]} of one index or {"docs": [{"_index": ..., "_id": ...}]} across the indices
+        if "ids" in body:
+            gets = [(index, id) for id in body["ids"]]
+        else:
+            gets = [(doc["_index"], doc["_id"]) for doc in body["docs"]]
+        for index in {index for (index, _) in gets}:
+            self._check_index(index)
+            self.requests[f"{index}:mget"] += 1
+        await self._network()
+
+        started = time.perf_counter()
+        docs = []
+        for (index, id) in gets:
+            source = self._get(index, id)
+            doc = {"_index": index, "_id": id, "found": source is not None}
+            if source is not None:
+                doc["_source"] = source
+            docs.append(doc)
+
+        self.busy_sec += time.perf_counter() - started
+        return {"docs": docs}
+
+    async def search(self, body: dict, index: str | None = None, **kwargs) -> dict:
+        if index is None:
+            raise UnsupportedQuery("searches without an index (point in time) are not supported")
+        self._check_index(index)
+        self.requests[f"{index}:search"] += 1
+        await self._network()
+        return self._search(index, body)
+
+    async def msearch(self, body: list[dict], **kwargs) -> dict:
+        # header and body lines of every search
+        searches = list(zip(body[::2], body[1::2]))
+        for (header, _) in searches:
+            self._check_index(header["index"])
+            self.requests[f"{header['index']}:msearch"] += 1
+        await self._network()
+        return {"responses": [self._search(header["index"], search) for (header, search) in searches]}
+
+    def _search(self, index: str, body: dict) -> dict:
+        started = time.perf_counter()
+        query = body.get("query", {"match_all": {}})
+        if "ids" in query:
+            # documents of the batched gets
+            docs = (self._get(index, id) for id in query["ids"]["values"])
+            hits = [self._hit(index, doc, 1.0, body) for doc in docs if doc is not None]
+        elif "match_all" in query and _sort(body)[0] == "id":
+            hits = self._scan_by_id(index, body)
+        elif index == "genres":
+            hits = self._search_genres(query, body)
+        elif index == "persons":
+            hits = self._search_persons(query, body)
+        else:
+            hits = self._search_movies(query, body)
+
+        took = time.perf_counter() - started
+        self.busy_sec += took
+        return {
+            "took": int(took * 1000),
+            "timed_out": False,
+            "hits": {"hits": hits},
+        }
+
+    # searches
+
+    def _scan_by_id(self, index: str, body: dict) -> list[dict]:
+        """
+        Pages of the scans walking a whole index, e.g. the refresh of the suggestions,
+        the numbers of the generated documents are in the order of their ids
+        """
+        (_, order) = _sort(body)
+        if order["order"] != "asc":
+            raise UnsupportedQuery(f"documents can be scanned in the ascending id order only, not {order}")
+
+        (ids, document) = {
+            "movies": (self.catalog.film_ids(), self.catalog.film),
+            "persons": (self.catalog.person_ids(), self.catalog.person),
+            "genres": (self.catalog.genre_ids(), self.catalog.genre),
+        }[index]
+        if after := body.get("search_after"):
+            (_, number) = parse_id(after[0])
+            start = number + 1
+        else:
+            start = body.get("from", 0)
+
+        numbers = range(len(ids))[start:start + body.get("size", 10)]
+        return [self._hit(index, document(number), None, body, [ids[number]]) for number in numbers]
+
+    def _search_genres(self, query: dict, body: dict) -> list[dict]:
+        if "match_all" not in query:
+            raise UnsupportedQuery(query)
+
+        genres = range(self.catalog.genres)
+        start = body.get("from", 0)
+        return [self._hit("genres", self.catalog.genre(genre), 1.0, body)
+                for genre in genres[start:start + body.get("size", 10)]]
+
+    def _search_persons(self, query: dict, body: dict) -> list[dict]:
+        text = _single_match(query, "full_name")
+        ranked = _rank(self.catalog.name_index, tokenize(text))
+        hits = []
+        for (score, person) in _page(ranked, body):
+            doc = self.catalog.person(person)
+            hits.append(self._hit("persons", doc, score, body, [score, doc["id"]]))
+        return hits
+
+    def _search_movies(self, query: dict, body: dict) -> list[dict]:
+        if "match_all" in query:
+            return self._films_by_rating(self.catalog.by_rating, body)
+
+        clauses = query.get("bool", {})
+        if filters := clauses.get("filter"):
+            genre = self.catalog.genre_by_name(filters[0]["term"]["genres"])
+            if genre is None:
+                return []
+            return self._films_by_rating(self.catalog.by_genre_rating[genre], body)
+
+        if "must" in clauses:
+            text = _single_match(query, "title")
+            ranked = _rank(self.catalog.title_index, tokenize(text))
+            return [self._hit("movies", self.catalog.film(film), score, body, [score, self._film_id(film)])
+                    for (score, film) in _page(ranked, body)]
+
+        if "should" in clauses:
+            return self._films_by_persons(clauses["should"], body)
+
+        raise UnsupportedQuery(query)
+
+    def _films_by_rating(self, orders: dict, body: dict) -> list[dict]:
+        (field, order) = _sort(body)
+        if field != "imdb_rating":
+            raise UnsupportedQuery(f"films can be listed by imdb_rating only, not {field}")
+
+        ordered = orders[order["order"] == "desc"]
+        if after := body.get("search_after"):
+            film = self.catalog.film_number(after[1])
+            start = ordered.position_after(round(after[0] * 10), -1 if film is None else film)
+        else:
+            start = body.get("from", 0)
+
+        hits = []
+        for (rating, film) in ordered.slice(start, start + body.get("size", 10)):
+            hits.append(self._hit("movies", self.catalog.film(film), None, body, [rating / 10, self._film_id(film)]))
+        return hits
+
+    def _films_by_persons(self, subqueries: list[dict], body: dict) -> list[dict]:
+        """
+        Both the ``match`` on a single person and ``terms`` with inner hits,
+        films are returned in the id order
+        """
+        wanted: dict[str, set[int]] = {}
+        inner_hits: dict[str, dict] = {}
+        for subquery in subqueries:
+            nested = subquery["nested"]
+            role = nested["path"]
+            if role not in ROLES:
+                raise UnsupportedQuery(subquery)
+            wanted[role] = {person for id in _nested_ids(nested["query"], role)
+                            if (person := self.catalog.person_number(id)) is not None}
+            if "inner_hits" in nested:
+                inner_hits[role] = nested["inner_hits"]
+
+        films = sorted({film for (role, persons) in wanted.items()
+                        for person in persons for film in self.catalog.person_films[role][person]})
+        if after := body.get("search_after"):
+            film = self.catalog.film_number(after[0])
+            start = bisect_left(films, film + 1 if film is not None else 0)
+        else:
+            start = body.get("from", 0)
+
+        hits = []
+        for film in films[start:start + body.get("size", 10)]:
+            # the roles scan reads no fields, don't generate the documents for it
+            doc = self.catalog.film(film) if body.get("_source", True) is not False else {"id": self._film_id(film)}
+            hit = self._hit("movies", doc, 1.0, body, [doc["id"]])
+            if inner_hits:
+                hit["inner_hits"] = {
+                    options.get("name", role): self._inner_hits(film, role, wanted[role], options)
+                    for (role, options) in inner_hits.items()
+                }
+            hits.append(hit)
+        return hits
+
+    def _inner_hits(self, film: int, role: str, persons: set[int], options: dict) -> dict:
+        matched = [person for person in dict.fromkeys(self.catalog.film_persons(film, role)) if person in persons]
+        person_ids = self.catalog.person_ids()
+        return {
+            "hits": {
+                "hits": [
+                    {"_nested": {"field": role, "offset": offset}, "fields": {f"{role}.id": [person_ids[person]]}}
+                    for (offset, person) in enumerate(matched[:options.get("size", 3)])
+                ]
+            }
+        }
+
+    # documents
+
+    def _get(self, index: str, id: str) -> dict | None:
+        if index == "movies":
+            number = self.catalog.film_number(id)
+            return None if number is None else self.catalog.film(number)
+        if index == "persons":
+            number = self.catalog.person_number(id)
+            return None if number is None else self.catalog.person(number)
+
+        number = self.catalog.genre_number(id)
+        return None if number is None else self.catalog.genre(number)
+
+    def _hit(self, index: str, doc: dict, score: float | None, body: dict, sort: list | None = None) -> dict:
+        hit: dict[str, Any] = {"_index": index, "_id": doc["id"], "_score": score}
+        source = body.get("_source", True)
+        if source is not False:
+            hit["_source"] = doc if source is True else _project(doc, source["includes"])
+        if sort is not None:
+            hit["sort"] = sort
+        return hit
+
+    def _film_id(self, film: int) -> str:
+        return self.catalog.film_ids()[film]
+
+    def _check_index(self, index: str) -> None:
+        if index not in self.mappings:
+            raise NotFoundError(404, "index_not_found_exception", {"index": index})
+
+    def _check_mappings(self) -> None:
+        # the mappings are strict, the generated documents must fit them
+        samples = {"movies": self.catalog.film(0), "persons": self.catalog.person(0), "genres": self.catalog.genre(0)}
+        for (index, doc) in samples.items():
+            if unknown := set(doc) - set(self.mappings[index]["properties"]):
+                raise ValueError(f"fields {unknown} are not in the {index} mapping")
+
+    async def _network(self) -> None:
+        await asyncio.sleep(self.latency_sec)
+
+
+def _sort(body: dict) -> tuple[str, dict]:
+    # the first sort clause, the field and its options
+    sort = body.get("sort", [])
+    return next(iter(sort[0].items())) if sort else ("_score", {"order": "desc"})
+
+
+def _single_match(query: dict, field: str) -> str:
+    try:
+        (clause,) = query["bool"]["must"]
+        match = clause["match"][field]
+    except (KeyError, TypeError, ValueError):
+        raise UnsupportedQuery(query) from None
+
+    return match["query"] if isinstance(match, dict) else match
+
+
+def _rank(index: dict, terms: Iterable[str]) -> list[tuple[float, int]]:
+    counts: Counter[int] = Counter()
+    for term in set(terms):
+        if term in index:
+            counts.update(index[term])
+    return sorted(((float(count), number) for (number, count) in counts.items()), key=_score_key)
+
+
+def _score_key(hit: tuple[float, int]) -> tuple[float, int]:
+    return (-hit[0], hit[1])
+
+
+def _page(ranked: list[tuple[float, int]], body: dict) -> list[tuple[float, int]]:
+    if after := body.get("search_after"):
+        (_, number) = parse_id(after[1])
+        start = bisect_left(ranked, (-after[0], number + 1), key=_score_key)
+    else:
+        start = body.get("from", 0)
+
+    return ranked[start:start + body.get("size", 10)]
+
+
+def _nested_ids(query: dict, role: str) -> list[str]:
+    if "terms" in query:
+        return query["terms"][f"{role}.id"]
+    # {"bool": {"should": [{"match": {"<role>.id": id}}]}}
+    return [str(clause["match"][f"{role}.id"]) for clause in query["bool"]["should"]]
+
+
+def _project(doc: dict, includes: list[str]) -> dict:
+    projected: dict[str, Any] = {}
+    nested: dict[str, list[str]] = {}
+    for path in includes:
+        (head, _, rest) = path.partition(".")
+        if rest:
+            nested.setdefault(head, []).append(rest)
+        elif head in doc:
+            projected[head] = doc[head]
+
+    for (head, paths) in nested.items():
+        if isinstance(value := doc.get(head), list):
+            projected[head] = [_project(item, paths) for item in value]
+        elif isinstance(value, dict):
+            projected[head] = _project(value, paths)
+
+    return projected
@@ -0,0 +1,246 @@
+"""
+Load test of the whole application without Elasticsearch and Redis.
+
+The real ``main:app`` with its lifespan is driven in process, the clients created
+by ``core.lifecycle`` are replaced by the fake Elasticsearch serving the synthetic
+catalog and by fakeredis. Every route is measured twice: on cache hits (a small
+set of warmed up URLs) and on cache misses (every URL requested once).
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import sys
+import time
+from collections.abc import Callable, Iterator
+from dataclasses import asdict, dataclass
+from functools import partial
+from pathlib import Path
+
+import httpx
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeRedis
+
+from catalog import FIRST_NAMES, LAST_NAMES, WORDS, Catalog
+from fake_elastic import FakeElasticsearch
+
+# the application itself
+sys.path.insert(0, str(Path(__file__).parents[2] / "src"))
+
+# large prime to spread the documents requested one after another over the catalog
+_STRIDE = 1_000_003
+
+
+@dataclass(frozen=True)
+class Route:
+    name: str
+    # URL of the n-th distinct cache key of the route
+    url: Callable[[Catalog, int], str]
+    # number of distinct cache keys
+    keys: Callable[[Catalog], int]
+
+
+def _films_url(catalog: Catalog, n: int) -> str:
+    (n, page) = divmod(n, 10_000 // 50)
+    (n, genre) = divmod(n, catalog.genres + 1)
+    sort = "-imdb_rating" if n % 2 else "imdb_rating"
+    url = f"/api/v1/films/?page_number={page + 1}&page_size=50&sort={sort}"
+    return url + (f"&genre={catalog.genre_ids()[genre - 1]}" if genre else "")
+
+
+def _films_search_url(catalog: Catalog, n: int) -> str:
+    (first, second) = divmod(n, len(WORDS))
+    return f"/api/v1/films/search?query={WORDS[first]}%20{WORDS[second]}&page_size=10"
+
+
+def _persons_search_url(catalog: Catalog, n: int) -> str:
+    (first, last) = divmod(n, len(LAST_NAMES))
+    return f"/api/v1/persons/search?query={FIRST_NAMES[first]}%20{LAST_NAMES[last]}&page_size=10"
+
+
+def _spread(ids, n: int) -> str:
+    return ids[n * _STRIDE % len(ids)]
+
+
+ROUTES = (
+    Route("films", _films_url, lambda catalog: 2 * (catalog.genres + 1) * (10_000 // 50)),
+    Route("films_search", _films_search_url, lambda catalog: len(WORDS) ** 2),
+    Route("film", lambda catalog, n: f"/api/v1/films/{_spread(catalog.film_ids(), n)}", lambda c: c.films),
+    Route("genres", lambda catalog, n: "/api/v1/genres/", lambda catalog: 1),
+    Route("genre", lambda catalog, n: f"/api/v1/genres/{catalog.genre_ids()[n]}", lambda c: c.genres),
+    Route("persons_search", _persons_search_url, lambda catalog: len(FIRST_NAMES) * len(LAST_NAMES)),
+    Route("person", lambda catalog, n: f"/api/v1/persons/{_spread(catalog.person_ids(), n)}", lambda c: c.persons),
+    Route(
+        "person_films",
+        lambda catalog, n: f"/api/v1/persons/{_spread(catalog.person_ids(), n)}/films",
+        lambda c: c.persons,
+    ),
+)
+
+
+@dataclass
+class Result:
+    route: str
+    path: str
+    requests: int
+    errors: int
+    es_requests: int
+    # CPU time of the fake Elasticsearch per request, included in the latencies
+    es_busy_ms: float
+    # CPU time of the process per request without the fake Elasticsearch, the client is included
+    cpu_ms: float
+    rps: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+
+async def measure(client: httpx.AsyncClient, urls: Iterator[str], concurrency: int) -> tuple[list[float], int, float]:
+    latencies: list[float] = []
+    errors = 0
+
+    async def worker() -> None:
+        nonlocal errors
+        # the iterator is shared, every worker takes the next URL
+        for url in urls:
+            started = time.perf_counter()
+            response = await client.get(url)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return (latencies, errors, time.perf_counter() - started)
+
+
+def summarize(
+    route: str,
+    path: str,
+    latencies: list[float],
+    errors: int,
+    elapsed: float,
+    es_requests: int,
+    es_busy_sec: float,
+    cpu_sec: float,
+) -> Result:
+    if len(latencies) > 1:
+        percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+        (p50, p95, p99) = (percentiles[49], percentiles[94], percentiles[98])
+    else:
+        p50 = p95 = p99 = latencies[0] if latencies else 0.0
+
+    return Result(
+        route=route,
+        path=path,
+        requests=len(latencies),
+        errors=errors,
+        es_requests=es_requests,
+        es_busy_ms=es_busy_sec * 1000 / len(latencies) if latencies else 0.0,
+        cpu_ms=cpu_sec * 1000 / len(latencies) if latencies else 0.0,
+        rps=len(latencies) / elapsed if elapsed else 0.0,
+        p50_ms=p50 * 1000,
+        p95_ms=p95 * 1000,
+        p99_ms=p99 * 1000,
+    )
+
+
+async def run_route(
+    client: httpx.AsyncClient, es: FakeElasticsearch, catalog: Catalog, route: Route, args: argparse.Namespace
+) -> list[Result]:
+    keys = route.keys(catalog)
+    hot = min(args.hot_keys, keys)
+    hot_urls = [route.url(catalog, n) for n in range(hot)]
+    results = []
+
+    # misses go first, the hot keys would be cached by the warm-up otherwise
+    misses = min(args.requests, keys - hot)
+    if misses > 0:
+        urls = (route.url(catalog, n) for n in range(hot, hot + misses))
+        results.append(await run_path(client, es, route.name, "miss", urls, args.concurrency))
+
+    for url in hot_urls:
+        await client.get(url)
+    urls = (hot_urls[n % hot] for n in range(args.requests))
+    results.append(await run_path(client, es, route.name, "hit", urls, args.concurrency))
+
+    return results
+
+
+async def run_path(
+    client: httpx.AsyncClient, es: FakeElasticsearch, route: str, path: str, urls: Iterator[str], concurrency: int
+) -> Result:
+    (es_requests, es_busy_sec, cpu_sec) = (es.requests.total(), es.busy_sec, time.process_time())
+    (latencies, errors, elapsed) = await measure(client, urls, concurrency)
+    es_busy_sec = es.busy_sec - es_busy_sec
+    cpu_sec = time.process_time() - cpu_sec - es_busy_sec
+    return summarize(
+        route, path, latencies, errors, elapsed, es.requests.total() - es_requests, es_busy_sec, cpu_sec
+    )
+
+
+async def main(args: argparse.Namespace) -> list[Result]:
+    started = time.perf_counter()
+    catalog = Catalog(args.films, args.persons)
+    print(f"catalog of {catalog.films} films and {catalog.persons} persons built in "
+          f"{time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    es = FakeElasticsearch(catalog, args.es_latency_ms / 1000)
+    server = FakeServer()
+
+    import core.lifecycle
+
+    core.lifecycle.AsyncElasticsearch = lambda *args, **kwargs: es
+    core.lifecycle.Redis = partial(FakeRedis, server=server)
+
+    from main import app
+
+    # the application logs every cache miss
+    logging.disable(logging.INFO)
+
+    routes = [route for route in ROUTES if not args.routes or route.name in args.routes]
+    results = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            for route in routes:
+                results.extend(await run_route(client, es, catalog, route, args))
+
+    return results
+
+
+def print_table(results: list[Result]) -> None:
+    columns = (
+        "route", "path", "requests", "errors", "es_requests", "es_busy_ms", "cpu_ms",
+        "rps", "p50_ms", "p95_ms", "p99_ms",
+    )
+    print(" ".join(f"{column:>14}" for column in columns))
+    for result in results:
+        values = asdict(result)
+        print(" ".join(f"{values[column]:>14.2f}" if isinstance(values[column], float) else f"{values[column]:>14}"
+                       for column in columns))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--films", type=int, default=1_000_000, help="number of films in the catalog")
+    parser.add_argument("--persons", type=int, default=None, help="number of persons, a tenth of films by default")
+    parser.add_argument("--concurrency", type=int, default=32, help="number of requests in flight")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per route and path")
+    parser.add_argument("--hot-keys", type=int, default=50, help="distinct URLs requested on the cache hit path")
+    parser.add_argument("--es-latency-ms", type=float, default=0, help="simulated Elasticsearch round trip")
+    parser.add_argument("--routes", nargs="*", choices=[route.name for route in ROUTES], help="routes to measure")
+    parser.add_argument("--json", action="store_true", help="print results as JSON lines")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    results = asyncio.run(main(arguments))
+    if arguments.json:
+        for result in results:
+            print(json.dumps(asdict(result)))
+    else:
+        print_table(results)
@@ -1,4 +1,6 @@
+import json
 import urllib.parse
+from typing import Any
 
 import aiohttp
 import pytest_asyncio
@@ -41,3 +43,41 @@ def make_get_request(http_client: aiohttp.ClientSession):
             return response.status, body
 
     return inner
+
+
+@pytest_asyncio.fixture()
+def make_request(http_client: aiohttp.ClientSession):
+    """
+    Same as make_get_request but accepts request headers
+    and returns response headers as well
+    """
+    api_settings = FastAPISettings()
+
+    async def inner(path: str, query_data: dict | None = None, headers: dict | None = None, method: str = "GET",
+                    json: Any = None):
+        url = encode_url(api_settings.url, path, query_data)
+        async with http_client.request(method, url, headers=headers, json=json) as response:
+            # 304 and other empty responses don't have a content type
+            body = await response.json(content_type=None)
+            if response.status >= 500:
+                raise ValueError(body)
+
+            return response.status, response.headers, body
+
+    return inner
+
+
+@pytest_asyncio.fixture()
+def make_ndjson_request(http_client: aiohttp.ClientSession):
+    """
+    GET of a streamed NDJSON response, returns the parsed lines
+    """
+    api_settings = FastAPISettings()
+
+    async def inner(path: str, query_data: dict | None = None):
+        url = encode_url(api_settings.url, path, query_data)
+        async with http_client.get(url) as response:
+            lines = [json.loads(line) async for line in response.content if line.strip()]
+            return response.status, response.headers, lines
+
+    return inner
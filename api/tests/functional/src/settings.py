@@ -15,3 +15,13 @@ class ElasticsearchSettings(BaseSettings):
 class FastAPISettings(BaseSettings):
     model_config = SettingsConfigDict(env_prefix="FASTAPI_")
     url: str = ""
+
+
+class CacheSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="CACHE_")
+    invalidation_token: str = ""
+
+
+class ProfilerSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="PROFILER_")
+    token: str = ""
@@ -0,0 +1,88 @@
+import asyncio
+import uuid
+from http import HTTPStatus
+
+import pytest
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+from ..settings import CacheSettings
+from .utils import construct_es_documents
+
+person_id = str(uuid.uuid4())
+
+film = {
+    "id": str(uuid.uuid4()),
+    "imdb_rating": 7.5,
+    "genres": [],
+    "title": "The Star",
+    "description": "New World",
+    "directors_names": [],
+    "actors_names": ["Ann"],
+    "writers_names": [],
+    "actors": [{"id": person_id, "name": "Ann"}],
+    "writers": [],
+    "directors": [],
+}
+
+person = {"id": person_id, "full_name": "Ann"}
+
+
+@pytest.mark.asyncio
+async def test_invalidate_reindexed_film(make_request, make_get_request, es_write_data):
+    # arrange
+    await es_write_data(construct_es_documents("movies", [film]), "movies")
+    await es_write_data(construct_es_documents("persons", [person]), "persons")
+    (_, cached_film) = await make_get_request(f"/api/v1/films/{film['id']}")
+    (_, cached_person) = await make_get_request(f"/api/v1/persons/{person_id}")
+
+    # act
+    await es_write_data(construct_es_documents("movies", [{**film, "title": "The Moon", "actors": []}]), "movies")
+    headers = {"X-Invalidation-Token": CacheSettings().invalidation_token}
+    (status, _, body) = await make_request(
+        "/api/v1/cache/invalidate", method="POST", headers=headers, json={"index": "movies", "ids": [film["id"]]}
+    )
+    (_, fresh_film) = await make_get_request(f"/api/v1/films/{film['id']}")
+    (_, fresh_person) = await make_get_request(f"/api/v1/persons/{person_id}")
+
+    # assert
+    assert status == HTTPStatus.OK
+    assert body["deleted"] == 2
+    assert cached_film["title"] == "The Star"
+    assert fresh_film["title"] == "The Moon"
+    assert len(cached_person["films"]) == 1
+    assert fresh_person["films"] == []
+
+
+@pytest.mark.asyncio
+async def test_invalidate_with_wrong_token(make_request):
+    (status, _, _) = await make_request(
+        "/api/v1/cache/invalidate", method="POST", headers={"X-Invalidation-Token": "wrong"},
+        json={"index": "movies", "ids": []},
+    )
+
+    assert status == HTTPStatus.FORBIDDEN
+
+
+@pytest.mark.asyncio
+async def test_change_feed(make_get_request, es_write_data, redis_client: Redis):
+    # arrange
+    await es_write_data(construct_es_documents("movies", [film]), "movies")
+    await make_get_request(f"/api/v1/films/{film['id']}")
+    try:
+        # the group is created by the API as well, make sure the change isn't published before it
+        await redis_client.xgroup_create("etl:changes", "api", id="0", mkstream=True)
+    except ResponseError:
+        pass
+
+    # act
+    await es_write_data(construct_es_documents("movies", [{**film, "title": "The Moon"}]), "movies")
+    await redis_client.xadd("etl:changes", {"index": "movies", "ids": film["id"]})
+    for _ in range(50):
+        (_, body) = await make_get_request(f"/api/v1/films/{film['id']}")
+        if body["title"] == "The Moon":
+            break
+        await asyncio.sleep(0.1)
+
+    # assert
+    assert body["title"] == "The Moon"
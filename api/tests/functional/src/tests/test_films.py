@@ -1,3 +1,4 @@
+import asyncio
 import uuid
 from http import HTTPStatus
 
@@ -145,11 +146,30 @@ async def test_get_film(make_get_request, es_write_data, redis_client: Redis):
     keys_after = await redis_client.keys()
 
     # assert
-    assert len(keys_after) == len(keys_before), "Cache should not be set"
+    assert len(keys_after) > len(keys_before), "Cache key must be set"
+    assert f"movies:{target_film['id']}" in keys_after
     assert status == HTTPStatus.OK
     assert body["id"] == target_film["id"]
 
 
+@pytest.mark.asyncio(scope="function")
+async def test_get_film_from_cache(make_get_request, es_write_data, es_client):
+    # arrange
+    es_films = construct_es_documents("movies", films_data)
+    await es_write_data(es_films, "movies")
+
+    target_film = films_data[4]
+    await make_get_request(f"/api/v1/films/{target_film['id']}")
+    await es_client.delete(index="movies", id=target_film["id"], refresh="wait_for")
+
+    # act
+    (status, body) = await make_get_request(f"/api/v1/films/{target_film['id']}")
+
+    # assert
+    assert status == HTTPStatus.OK, "Film must be served from the cache"
+    assert body["id"] == target_film["id"]
+
+
 @pytest.mark.asyncio(scope="function")
 async def test_get_film_not_found(make_get_request):
     # arrange
@@ -161,3 +181,142 @@ async def test_get_film_not_found(make_get_request):
     # assert
     # TODO (agrebennikov): it should not return 404!
     assert status == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.asyncio(scope="function")
+async def test_list_films_cursor(make_request, es_write_data):
+    # arrange
+    es_films = construct_es_documents("movies", films_data)
+    await es_write_data(es_films, "movies")
+
+    # act
+    seen: list[str] = []
+    query_data: dict = {"page_size": 6, "sort": "-imdb_rating"}
+    while True:
+        (status, headers, body) = await make_request("/api/v1/films", query_data)
+        assert status == HTTPStatus.OK
+        seen.extend(film["id"] for film in body)
+        if "X-Next-Cursor" not in headers:
+            break
+        query_data = {"page_size": 6, "sort": "-imdb_rating", "cursor": headers["X-Next-Cursor"]}
+
+    # assert
+    assert len(seen) == len(films_data)
+    assert len(set(seen)) == len(films_data)
+
+
+@pytest.mark.asyncio(scope="function")
+async def test_list_films_cursor_for_another_sort(make_request, es_write_data):
+    # arrange
+    es_films = construct_es_documents("movies", films_data)
+    await es_write_data(es_films, "movies")
+    (_, headers, _) = await make_request("/api/v1/films", {"page_size": 5, "sort": "imdb_rating"})
+
+    # act
+    query_data = {"page_size": 5, "sort": "-imdb_rating", "cursor": headers["X-Next-Cursor"]}
+    (status, _, _) = await make_request("/api/v1/films", query_data)
+
+    # assert
+    assert status == HTTPStatus.BAD_REQUEST
+
+
+@pytest.mark.asyncio(scope="function")
+async def test_list_films_not_modified(make_request, es_write_data):
+    # arrange
+    es_films = construct_es_documents("movies", films_data)
+    await es_write_data(es_films, "movies")
+    (_, headers, _) = await make_request("/api/v1/films", {"page_size": 5})
+
+    # act
+    (status, _, body) = await make_request("/api/v1/films", {"page_size": 5}, {"If-None-Match": headers["ETag"]})
+    (other_status, _, _) = await make_request("/api/v1/films", {"page_size": 6}, {"If-None-Match": headers["ETag"]})
+
+    # assert
+    assert status == HTTPStatus.NOT_MODIFIED
+    assert body is None
+    assert other_status == HTTPStatus.OK
+
+
+@pytest.mark.asyncio(scope="function")
+async def test_films_batch(make_request, es_write_data, redis_client: Redis):
+    # arrange
+    es_films = construct_es_documents("movies", films_data)
+    await es_write_data(es_films, "movies")
+    missing_id = str(uuid.uuid4())
+    ids = [films_data[3]["id"], missing_id, films_data[0]["id"], films_data[3]["id"]]
+
+    # act
+    (status, _, body) = await make_request("/api/v1/films/batch", method="POST", json={"ids": ids})
+    cached = await redis_client.exists(f"movies:{films_data[3]['id']}", f"movies:{films_data[0]['id']}")
+    (_, _, cached_body) = await make_request("/api/v1/films/batch", method="POST", json={"ids": ids})
+
+    # assert
+    assert status == HTTPStatus.OK
+    assert [item["id"] for item in body] == ids
+    assert [item["found"] for item in body] == [True, False, True, True]
+    assert body[1]["data"] is None
+    assert body[0]["data"]["title"] == films_data[3]["title"]
+    assert cached == 2, "Found films must be cached"
+    assert cached_body == body
+
+
+@pytest.mark.asyncio(scope="function")
+async def test_films_batch_too_large(make_request):
+    # act
+    ids = [str(uuid.uuid4()) for _ in range(101)]
+    (status, _, _) = await make_request("/api/v1/films/batch", method="POST", json={"ids": ids})
+
+    # assert
+    assert status == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.asyncio(scope="function")
+async def test_films_export(make_ndjson_request, es_write_data):
+    # arrange
+    es_films = construct_es_documents("movies", films_data)
+    await es_write_data(es_films, "movies")
+
+    # act
+    (status, headers, lines) = await make_ndjson_request("/api/v1/films/export", {"fields": "title,imdb_rating"})
+
+    # assert
+    assert status == HTTPStatus.OK
+    assert headers["Content-Type"] == "application/x-ndjson"
+    assert sorted(line["id"] for line in lines) == sorted(film["id"] for film in films_data)
+    assert all(set(line) == {"id", "title", "imdb_rating"} for line in lines)
+
+
+@pytest.mark.asyncio(scope="function")
+async def test_films_export_unknown_field(make_request):
+    # act
+    (status, _, _) = await make_request("/api/v1/films/export", {"fields": "title,budget"})
+
+    # assert
+    assert status == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.asyncio(scope="function")
+async def test_films_suggest(make_get_request, es_write_data):
+    # arrange
+    film = {**films_data[0], "id": str(uuid.uuid4()), "title": "Zyxwv Voyage", "imdb_rating": 9.9}
+    await es_write_data(construct_es_documents("movies", [film]), "movies")
+
+    # act
+    for _ in range(50):
+        (status, body) = await make_get_request("/api/v1/films/suggest", {"prefix": "voya"})
+        if any(item["id"] == film["id"] for item in body):
+            break
+        await asyncio.sleep(0.1)
+
+    # assert
+    assert status == HTTPStatus.OK
+    assert {"id": film["id"], "title": "Zyxwv Voyage", "imdb_rating": 9.9} in body
+
+
+@pytest.mark.asyncio(scope="function")
+async def test_films_suggest_limit_too_large(make_request):
+    # act
+    (status, _, _) = await make_request("/api/v1/films/suggest", {"prefix": "st", "limit": 100})
+
+    # assert
+    assert status == HTTPStatus.UNPROCESSABLE_ENTITY
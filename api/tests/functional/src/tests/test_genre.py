@@ -4,6 +4,7 @@ from http import HTTPStatus
 import pytest
 from redis.asyncio import Redis
 
+from ..settings import CacheSettings
 from .utils import construct_es_documents
 
 genres_data = [
@@ -73,3 +74,25 @@ async def test_genre_search_cache(make_get_request, es_write_data, redis_client:
     keys_after = await redis_client.keys()
 
     assert len(keys_after) == len(keys_before)
+
+
+@pytest.mark.asyncio
+async def test_updated_genre_listed_after_invalidation(make_request, make_get_request, es_write_data):
+    # arrange
+    await es_write_data(construct_es_documents("genres", genres_data), "genres")
+    (_, cached) = await make_get_request("/api/v1/genres/")
+    renamed = {**genres_data[0], "name": "renamed-genre"}
+
+    # act
+    await es_write_data(construct_es_documents("genres", [renamed]), "genres")
+    headers = {"X-Invalidation-Token": CacheSettings().invalidation_token}
+    (status, _, _) = await make_request(
+        "/api/v1/cache/invalidate", method="POST", headers=headers, json={"index": "genres", "ids": [renamed["id"]]}
+    )
+    (_, fresh) = await make_get_request("/api/v1/genres/")
+
+    # assert
+    assert status == HTTPStatus.OK
+    assert {genre["name"] for genre in cached} == {genre["name"] for genre in genres_data}
+    assert renamed["name"] in {genre["name"] for genre in fresh}
+    assert genres_data[0]["name"] not in {genre["name"] for genre in fresh}
@@ -0,0 +1,33 @@
+import uuid
+from http import HTTPStatus
+
+import aiohttp
+import pytest
+
+from ..settings import FastAPISettings
+from .utils import construct_es_documents
+
+genres_data = [
+    {
+        "id": str(uuid.uuid4()),
+        "name": "genre",
+        "description": "Description for genre"
+    }
+]
+
+
+@pytest.mark.asyncio
+async def test_metrics(make_get_request, es_write_data, http_client: aiohttp.ClientSession):
+    es_genres = construct_es_documents("genres", genres_data)
+    await es_write_data(es_genres, "genres")
+
+    await make_get_request(f"/api/v1/genres/{genres_data[0]['id']}")
+    await make_get_request(f"/api/v1/genres/{genres_data[0]['id']}")
+
+    async with http_client.get(FastAPISettings().url + "/api/v1/metrics/") as response:
+        body = await response.text()
+
+    assert response.status == HTTPStatus.OK
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/v1/genres/{genre_id}"' in body
+    assert 'cache_requests_total{prefix="genres",result="hit"}' in body
+    assert "elasticsearch_request_duration_seconds" in body
@@ -1,3 +1,4 @@
+import asyncio
 from http import HTTPStatus
 from uuid import uuid4
 
@@ -61,6 +62,44 @@ async def test_get_person(make_get_request, es_write_data):
     assert "gender" not in body or body["gender"] is None
 
 
+@pytest.mark.asyncio
+async def test_concurrent_lookups(make_get_request, es_write_data):
+    es_persons = construct_es_documents("persons", persons_data)
+    es_films = construct_es_documents("movies", films_data)
+    await es_write_data(es_persons, "persons")
+    await es_write_data(es_films, "movies")
+
+    # sent together as one batch, every response gets its own document
+    responses = await asyncio.gather(
+        make_get_request(f"/api/v1/persons/{person_id}"),
+        *(make_get_request(f"/api/v1/films/{film['id']}") for film in films_data),
+        make_get_request(f"/api/v1/films/{uuid4()}"),
+    )
+
+    assert [status for (status, _) in responses] == [HTTPStatus.OK] * 4 + [HTTPStatus.NOT_FOUND]
+    assert responses[0][1]["full_name"] == "John Doe"
+    assert len(responses[0][1]["films"]) == len(films_data)
+    assert [body["title"] for (_, body) in responses[1:4]] == [film["title"] for film in films_data]
+
+
+@pytest.mark.asyncio
+async def test_get_person_roles(make_get_request, es_write_data):
+    es_persons = construct_es_documents("persons", persons_data)
+    es_films = construct_es_documents("movies", films_data)
+    await es_write_data(es_persons, "persons")
+    await es_write_data(es_films, "movies")
+
+    (status, body) = await make_get_request(f"/api/v1/persons/{person_id}")
+
+    assert status == HTTPStatus.OK
+    roles = {film["uuid"]: film["roles"] for film in body["films"]}
+    assert roles == {
+        films_data[0]["id"]: ["directors"],
+        films_data[1]["id"]: ["actors"],
+        films_data[2]["id"]: ["writers"],
+    }
+
+
 @pytest.mark.asyncio
 async def test_get_person_not_found(make_get_request, es_write_data):
     es_persons = construct_es_documents("persons", persons_data)
@@ -151,3 +190,59 @@ async def test_list_person_films(make_get_request, es_write_data):
     assert any(film["title"] == "The Star" for film in body)
     assert any(film["title"] == "The Moon" for film in body)
     assert any(film["title"] != "Inception" for film in body)
+
+
+@pytest.mark.asyncio
+async def test_list_person_films_without_rating(make_get_request, es_write_data):
+    unrated = {key: value for (key, value) in films_data[0].items() if key != "imdb_rating"}
+    es_persons = construct_es_documents("persons", persons_data)
+    es_films = construct_es_documents("movies", [unrated, *films_data[1:]])
+    await es_write_data(es_persons, "persons")
+    await es_write_data(es_films, "movies")
+
+    (status, body) = await make_get_request(f"/api/v1/persons/{person_id}/films")
+
+    assert status == HTTPStatus.OK
+    assert {"id": unrated["id"], "title": "The Star", "imdb_rating": 0} in body
+
+
+@pytest.mark.asyncio
+async def test_persons_batch(make_request, es_write_data):
+    es_persons = construct_es_documents("persons", persons_data)
+    es_films = construct_es_documents("movies", films_data)
+    await es_write_data(es_persons, "persons")
+    await es_write_data(es_films, "movies")
+    missing_id = str(uuid4())
+
+    (status, _, body) = await make_request(
+        "/api/v1/persons/batch", method="POST", json={"ids": [missing_id, str(person_id)]}
+    )
+
+    assert status == HTTPStatus.OK
+    assert [item["found"] for item in body] == [False, True]
+    assert body[0]["id"] == missing_id
+    assert body[1]["data"]["full_name"] == "John Doe"
+    assert len(body[1]["data"]["films"]) == 3
+
+
+@pytest.mark.asyncio
+async def test_suggest_persons(make_get_request, es_write_data):
+    person = {"id": str(uuid4()), "full_name": "Quillon Zyxwv", "gender": None}
+    await es_write_data(construct_es_documents("persons", [person]), "persons")
+
+    # the suggestions are refreshed in the background
+    for _ in range(50):
+        (status, body) = await make_get_request("/api/v1/persons/suggest", {"prefix": "zyx"})
+        if status == HTTPStatus.OK and any(item["id"] == person["id"] for item in body):
+            break
+        await asyncio.sleep(0.1)
+
+    assert status == HTTPStatus.OK
+    assert {"id": person["id"], "full_name": "Quillon Zyxwv"} in body
+
+
+@pytest.mark.asyncio
+async def test_suggest_persons_prefix_required(make_get_request):
+    (status, _) = await make_get_request("/api/v1/persons/suggest")
+
+    assert status == HTTPStatus.UNPROCESSABLE_ENTITY
@@ -0,0 +1,46 @@
+import asyncio
+import uuid
+from http import HTTPStatus
+
+import pytest
+
+from ..settings import ProfilerSettings
+from .utils import construct_es_documents
+
+genre = {"id": str(uuid.uuid4()), "name": "Profiled", "description": "Genre of the profiled request"}
+
+
+@pytest.mark.asyncio
+async def test_profile_requested_by_token(make_request, es_write_data):
+    # arrange
+    await es_write_data(construct_es_documents("genres", [genre]), "genres")
+    headers = {"X-Profile-Token": ProfilerSettings().token}
+
+    # act
+    (status, response_headers, _) = await make_request(f"/api/v1/genres/{genre['id']}", headers=headers)
+    profile_id = response_headers.get("X-Profile-Id")
+    # the capture is written after the response
+    for _ in range(50):
+        (_, _, captures) = await make_request("/api/v1/profiles/", {"route": "GET_api_v1_genres_genre_id"}, headers)
+        if any(capture["id"] == profile_id for capture in captures):
+            break
+        await asyncio.sleep(0.1)
+
+    # assert
+    assert status == HTTPStatus.OK
+    assert profile_id is not None
+    capture = next(capture for capture in captures if capture["id"] == profile_id)
+    assert capture["status"] == HTTPStatus.OK
+    assert capture["route"] == "GET_api_v1_genres_genre_id"
+
+
+@pytest.mark.asyncio
+async def test_profile_not_requested_with_wrong_token(make_request):
+    # act
+    (status, response_headers, _) = await make_request("/api/v1/genres/", headers={"X-Profile-Token": "wrong"})
+    (list_status, _, _) = await make_request("/api/v1/profiles/", headers={"X-Profile-Token": "wrong"})
+
+    # assert
+    assert status == HTTPStatus.OK
+    assert "X-Profile-Id" not in response_headers
+    assert list_status == HTTPStatus.FORBIDDEN
@@ -59,3 +59,72 @@ async def test_search(make_get_request, es_write_data, redis_client: Redis, quer
     if status < 400:
         assert len(keys_after) > len(keys_before), "Cache key must be set"
         assert len(body) == expected_answer["length"]
+
+
+@pytest.mark.asyncio(scope="function")
+async def test_search_deadline_exceeded(make_request, es_write_data):
+
+    # arrange
+    bulk_query = construct_es_documents("movies", es_films)
+    await es_write_data(bulk_query, "movies")
+
+    # act & assert
+    # the deadline passes before Elasticsearch is called
+    with pytest.raises(ValueError, match="deadline exceeded"):
+        await make_request(
+            "/api/v1/films/search",
+            {"query": "Mashed potato", "page_size": 7},
+            headers={"X-Request-Timeout": "0.000001"},
+        )
+
+
+@pytest.mark.asyncio(scope="function")
+async def test_search_facets(make_get_request, es_write_data):
+
+    # arrange
+    bulk_query = construct_es_documents("movies", es_films)
+    await es_write_data(bulk_query, "movies")
+
+    # act
+    (status, body) = await make_get_request(
+        "/api/v1/films/search", {"query": "The Star", "page_size": 20, "rating_from": 5, "facets": "true"}
+    )
+
+    # assert
+    stars = [film for film in es_films if film["title"] == "The Star" and film["imdb_rating"] >= 5]
+    assert status == HTTPStatus.OK
+    assert sorted(film["id"] for film in body["items"]) == sorted(film["id"] for film in stars)
+    assert {(genre["name"], genre["count"]) for genre in body["facets"]["genres"]} == (
+        {("Action", len(stars)), ("Sci-Fi", len(stars))} if stars else set()
+    )
+    assert sum(bucket["count"] for bucket in body["facets"]["imdb_rating"]) == len(stars)
+
+
+@pytest.mark.asyncio(scope="function")
+async def test_search_rating_bounds_reversed(make_get_request):
+
+    # act
+    (status, body) = await make_get_request(
+        "/api/v1/films/search", {"query": "The Star", "rating_from": 8, "rating_to": 5}
+    )
+
+    # assert
+    assert status == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert "rating_from" in body["detail"]
+
+
+@pytest.mark.asyncio(scope="function")
+async def test_search_film_without_rating(make_get_request, es_write_data):
+
+    # arrange
+    unrated = {key: value for (key, value) in es_films[0].items() if key != "imdb_rating"}
+    unrated["id"] = str(uuid.uuid4())
+    bulk_query = construct_es_documents("movies", [*es_films, unrated])
+    await es_write_data(bulk_query, "movies")
+
+    # act
+    (status, body) = await make_get_request("/api/v1/films/search", {"query": "The Star", "page_size": 50})
+
+    # assert
+    assert status == HTTPStatus.OK
+    assert {"id": unrated["id"], "title": "The Star", "imdb_rating": 0} in body
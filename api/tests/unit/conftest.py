@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the application itself, the tests import its modules directly
+sys.path.insert(0, str(Path(__file__).parents[2] / "src"))
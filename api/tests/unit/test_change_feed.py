@@ -0,0 +1,62 @@
+import uuid
+from collections.abc import Collection, Sequence
+
+import fakeredis
+import pytest
+from core.settings import ChangeFeedSettings
+from services.change_feed import ChangeFeedConsumer
+
+SETTINGS = ChangeFeedSettings(block_ms=10)
+
+
+class RecordingInvalidation:
+    def __init__(self):
+        self.changes: list[tuple[str, list[uuid.UUID]]] = []
+
+    async def invalidate(self, index: str, ids: Sequence[uuid.UUID], rewarm: bool = False) -> int:
+        self.changes.append((index, list(ids)))
+        return len(ids)
+
+
+class RecordingWarmer:
+    def __init__(self):
+        self.rewarmed: list[set[str]] = []
+
+    async def rewarm(self, indices: Collection[str]) -> int:
+        self.rewarmed.append(set(indices))
+        return 0
+
+
+async def publish(redis: fakeredis.FakeAsyncRedis, index: str, *ids: uuid.UUID) -> None:
+    await redis.xadd(SETTINGS.stream, {"index": index, "ids": ",".join(str(id) for id in ids)})
+
+
+@pytest.mark.asyncio
+async def test_hot_entries_rewarmed_once_per_batch_of_changes():
+    redis = fakeredis.FakeAsyncRedis()
+    (invalidation, warmer) = (RecordingInvalidation(), RecordingWarmer())
+    consumer = ChangeFeedConsumer(redis, invalidation, SETTINGS, warmer)  # type: ignore[arg-type]
+    await consumer._create_group()
+    films = [uuid.uuid4() for _ in range(3)]
+    for film in films:
+        await publish(redis, "movies", film)
+    await publish(redis, "persons", uuid.uuid4())
+
+    await consumer._handle(await consumer._read())
+
+    assert [change[0] for change in invalidation.changes] == ["movies"] * 3 + ["persons"]
+    assert warmer.rewarmed == [{"movies", "persons"}]
+    assert (await redis.xpending(SETTINGS.stream, SETTINGS.group))["pending"] == 0
+
+
+@pytest.mark.asyncio
+async def test_malformed_changes_not_rewarmed():
+    redis = fakeredis.FakeAsyncRedis()
+    warmer = RecordingWarmer()
+    consumer = ChangeFeedConsumer(redis, RecordingInvalidation(), SETTINGS, warmer)  # type: ignore[arg-type]
+    await consumer._create_group()
+    await publish(redis, "budgets", uuid.uuid4())
+
+    await consumer._handle(await consumer._read())
+
+    assert warmer.rewarmed == []
@@ -0,0 +1,217 @@
+import asyncio
+import time
+from collections.abc import Collection
+from typing import Any
+
+import pytest
+from core import deadline
+from core.deadline import DeadlineExceededError
+from core.settings import CircuitBreakerSettings
+from elasticsearch import ConnectionTimeout
+from redis.exceptions import ConnectionError, ResponseError
+from services import health
+from services.base import ServiceABC
+from services.cache.bypass import BypassCache
+from services.cache.memory_storage import MemoryCache
+from services.cache.storage import ICache
+from services.circuit_breaker import BackendUnavailableError, CircuitBreaker, CircuitOpenError
+from services.health import HealthProber, is_redis_failure
+
+RESET_TIMEOUT_SEC = 0.05
+
+
+def redis_breaker() -> CircuitBreaker:
+    return CircuitBreaker("redis", is_redis_failure, failure_threshold=2, reset_timeout_sec=RESET_TIMEOUT_SEC)
+
+
+def call(breaker: CircuitBreaker, error: Exception | None = None) -> None:
+    with breaker.guard():
+        if error is not None:
+            raise error
+
+
+def fail(breaker: CircuitBreaker) -> None:
+    with pytest.raises(BackendUnavailableError):
+        call(breaker, ConnectionError("down"))
+
+
+class UnavailableCache(ICache):
+    """
+    Redis which doesn't answer
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    async def set(self, key: str, value: Any, timeout_sec: int) -> None:
+        self.calls += 1
+        raise ConnectionError("down")
+
+    async def get(self, key: str) -> Any:
+        self.calls += 1
+        raise ConnectionError("down")
+
+    async def delete(self, keys: Collection[str]) -> None:
+        self.calls += 1
+        raise ConnectionError("down")
+
+
+class SlowElasticsearch:
+    """
+    Elasticsearch answering after ``latency_sec``, the calls time out as the client times them out
+    """
+
+    def __init__(self, latency_sec: float):
+        self.latency_sec = latency_sec
+        self.calls = 0
+
+    async def search(self, index: str, body: dict, request_timeout: float | None = None, **kwargs) -> dict:
+        self.calls += 1
+        if request_timeout is not None and request_timeout < self.latency_sec:
+            await asyncio.sleep(request_timeout)
+            raise ConnectionTimeout("TIMEOUT", "read timed out", None)
+
+        await asyncio.sleep(self.latency_sec)
+        return {"took": 1, "hits": {"hits": []}}
+
+
+@pytest.mark.asyncio
+async def test_transitions():
+    breaker = redis_breaker()
+    assert breaker.state == "closed"
+
+    fail(breaker)
+    assert breaker.state == "closed"
+    fail(breaker)
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        call(breaker)
+
+    await asyncio.sleep(RESET_TIMEOUT_SEC)
+    assert breaker.state == "half_open"
+    with breaker.guard():
+        # a single trial call at a time
+        assert not breaker.allow()
+    assert breaker.state == "closed"
+    call(breaker)
+
+
+@pytest.mark.asyncio
+async def test_failed_trial_reopens():
+    breaker = redis_breaker()
+    fail(breaker)
+    fail(breaker)
+    await asyncio.sleep(RESET_TIMEOUT_SEC)
+
+    fail(breaker)
+
+    assert breaker.state == "open"
+
+
+def test_errors_of_answering_backend_dont_count():
+    breaker = redis_breaker()
+    fail(breaker)
+
+    for _ in range(3):
+        with pytest.raises(ResponseError):
+            call(breaker, ResponseError("WRONGTYPE"))
+    fail(breaker)
+
+    assert breaker.state == "closed"
+
+
+def test_health_probes():
+    breaker = redis_breaker()
+
+    breaker.report(False)
+    assert breaker.state == "open"
+    breaker.report(True)
+    assert breaker.state == "half_open"
+    call(breaker)
+    assert breaker.state == "closed"
+    breaker.report(True)
+    assert breaker.state == "closed"
+
+
+def test_answered_probe_doesnt_close_circuit_of_failing_calls():
+    breaker = redis_breaker()
+    fail(breaker)
+    fail(breaker)
+
+    breaker.report(True)
+
+    assert breaker.state == "half_open"
+    # a single trial call is let through, the others still fail fast
+    with pytest.raises(BackendUnavailableError):
+        with breaker.guard():
+            with pytest.raises(CircuitOpenError):
+                call(breaker)
+            raise ConnectionError("down")
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        call(breaker)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("error", [TimeoutError(), ValueError("broken")])
+async def test_factory_errors_arent_redis_failures(error):
+    breaker = redis_breaker()
+    cache = BypassCache(MemoryCache(100, 1 << 20), breaker)
+
+    async def factory() -> bytes:
+        raise error
+
+    for _ in range(3):
+        with pytest.raises(type(error)):
+            await cache.get_or_set("film:1", factory, 60)
+
+    assert breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_values_computed_while_redis_is_unavailable():
+    breaker = redis_breaker()
+    inner = UnavailableCache()
+    cache = BypassCache(inner, breaker)
+    calls = 0
+
+    async def factory() -> bytes:
+        nonlocal calls
+        calls += 1
+        return b"film"
+
+    values = [await cache.get_or_set("film:1", factory, 60) for _ in range(3)]
+
+    assert values == [b"film"] * 3
+    assert calls == 3
+    assert breaker.state == "open"
+    # the failed get and set of the first call, then Redis isn't called
+    assert inner.calls == 2
+    with pytest.raises(CircuitOpenError):
+        await cache.delete(["film:1"])
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("batch_queries", ["true", "false"])
+async def test_elasticsearch_timeouts_open_the_circuit(monkeypatch, batch_queries):
+    monkeypatch.setenv("ES_BATCH_QUERIES", batch_queries)
+    prober = HealthProber(CircuitBreakerSettings(failure_threshold=2, reset_timeout=60))
+    monkeypatch.setattr(health, "prober", prober)
+    elastic = SlowElasticsearch(latency_sec=1)
+    service = ServiceABC(elastic, MemoryCache(100, 1 << 20))
+
+    async def search() -> dict:
+        # a request with 50ms left
+        deadline._deadline.set(time.monotonic() + 0.05)
+        return await service._search("movies", {"query": {"match_all": {}}}, "query")
+
+    for _ in range(2):
+        with pytest.raises(DeadlineExceededError):
+            await asyncio.create_task(search())
+    # let a batch sent for the requests finish its call
+    await asyncio.sleep(0.1)
+
+    assert prober.elasticsearch.state == "open"
+    with pytest.raises(CircuitOpenError):
+        await asyncio.create_task(search())
+    assert elastic.calls == 2
@@ -0,0 +1,64 @@
+import random
+
+import pytest
+from services.cache.codec import CODECS, CompressedCache, ZlibCodec, ZstdCodec
+from services.cache.memory_storage import MemoryCache
+
+PAYLOAD = b'{"id": "film", "title": "The Star", "description": "' + b"New World " * 200 + b'"}'
+
+
+def compressed(inner: MemoryCache, codec_name: str) -> CompressedCache:
+    return CompressedCache(inner, CODECS[codec_name](), min_bytes=64)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(("codec_name", "header"), [("zlib", b"\x01"), ("zstd", b"\x02")])
+async def test_round_trip(codec_name, header):
+    inner = MemoryCache(100, 1 << 20)
+    cache = compressed(inner, codec_name)
+
+    await cache.set("film:1", PAYLOAD, 60)
+    await cache.set_many([("film:2", PAYLOAD.decode(), 60)])
+
+    stored = await inner.get("film:1")
+    assert stored[:1] == header
+    assert len(stored) < len(PAYLOAD)
+    assert await cache.get("film:1") == PAYLOAD
+    assert await cache.get_many(["film:2", "film:3"]) == [PAYLOAD, None]
+
+
+@pytest.mark.asyncio
+async def test_values_of_other_codec_are_read():
+    inner = MemoryCache(100, 1 << 20)
+    await compressed(inner, "zlib").set("film:1", PAYLOAD, 60)
+
+    assert await compressed(inner, "zstd").get("film:1") == PAYLOAD
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("legacy", [PAYLOAD, b"swr:1.000:0.010:" + PAYLOAD, b"[]"])
+async def test_legacy_uncompressed_values_are_read(legacy):
+    inner = MemoryCache(100, 1 << 20)
+    # written by a worker without the codecs
+    await inner.set("film:1", legacy, 60)
+
+    assert await compressed(inner, "zstd").get("film:1") == legacy
+
+
+@pytest.mark.asyncio
+async def test_small_and_incompressible_values_are_stored_as_is():
+    inner = MemoryCache(100, 1 << 20)
+    cache = compressed(inner, "zstd")
+    incompressible = bytes(random.Random(0).choices(range(33, 127), k=96))
+
+    await cache.set("small", b'{"id": 1}', 60)
+    await cache.set("random", incompressible, 60)
+
+    assert await inner.get("small") == b'{"id": 1}'
+    assert await inner.get("random") == incompressible
+    assert await cache.get("random") == incompressible
+
+
+@pytest.mark.parametrize("codec", [ZlibCodec(), ZstdCodec()])
+def test_codec(codec):
+    assert codec.decompress(codec.compress(PAYLOAD)) == PAYLOAD
@@ -0,0 +1,60 @@
+"""
+Deadlines of the requests through the whole application, driven in process
+with the fake Elasticsearch of the load test and fakeredis
+"""
+
+import asyncio
+import sys
+from functools import partial
+from http import HTTPStatus
+from pathlib import Path
+
+import httpx
+import pytest
+import pytest_asyncio
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeRedis
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "benchmark"))
+
+from catalog import Catalog  # noqa: E402
+from fake_elastic import FakeElasticsearch  # noqa: E402
+
+ES_LATENCY_SEC = 0.3
+
+
+@pytest_asyncio.fixture(scope="function")
+async def client(monkeypatch):
+    for (name, value) in {
+        "WARMUP_ENABLED": "false",
+        "GENRE_CATALOG_REFRESH_INTERVAL": "0",
+        "SUGGEST_REFRESH_INTERVAL": "0",
+        "CHANGE_FEED_ENABLED": "false",
+    }.items():
+        monkeypatch.setenv(name, value)
+
+    import core.lifecycle
+
+    es = FakeElasticsearch(Catalog(100, 10), ES_LATENCY_SEC)
+    monkeypatch.setattr(core.lifecycle, "AsyncElasticsearch", lambda *args, **kwargs: es)
+    monkeypatch.setattr(core.lifecycle, "Redis", partial(FakeRedis, server=FakeServer()))
+
+    from main import app
+
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            yield client
+
+
+@pytest.mark.asyncio
+async def test_shared_miss_keeps_deadline_of_every_request(client: httpx.AsyncClient):
+    hasty = asyncio.create_task(client.get("/api/v1/films/?page_size=7", headers={"X-Request-Timeout": "0.1"}))
+    # the hasty request starts the computation of the page, the other one joins it
+    await asyncio.sleep(0.01)
+    patient = asyncio.create_task(client.get("/api/v1/films/?page_size=7"))
+
+    (hasty_response, patient_response) = await asyncio.gather(hasty, patient)
+
+    assert hasty_response.status_code == HTTPStatus.GATEWAY_TIMEOUT
+    assert patient_response.status_code == HTTPStatus.OK
+    assert len(patient_response.json()) == 7
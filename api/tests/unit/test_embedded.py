@@ -0,0 +1,283 @@
+import json
+import threading
+from pathlib import Path
+
+import pytest
+from db.embedded.client import EmbeddedElasticsearch
+from elasticsearch import RequestError
+
+# mappings of the indices the functional tests create
+SCHEMAS = Path(__file__).parents[1] / "functional" / "src" / "testdata" / "schemas"
+
+(ANN, BOB, CARL) = ("p-ann", "p-bob", "p-carl")
+
+MOVIES = [
+    {
+        "id": "m-wars",
+        "title": "The Star Wars",
+        "imdb_rating": 8.5,
+        "genres": ["g-action", "g-fantasy"],
+        "actors": [{"id": ANN, "name": "Ann"}, {"id": BOB, "name": "Bob"}],
+        "directors": [{"id": CARL, "name": "Carl"}],
+        "writers": [],
+    },
+    {
+        "id": "m-trek",
+        "title": "Star Trek",
+        "imdb_rating": 7.0,
+        "genres": ["g-action"],
+        "actors": [{"id": ANN, "name": "Ann"}],
+        "directors": [],
+        "writers": [{"id": BOB, "name": "Bob"}],
+    },
+    {
+        "id": "m-moon",
+        "title": "The Moon",
+        "imdb_rating": 5.0,
+        "genres": ["g-drama"],
+        "actors": [{"id": BOB, "name": "Bob"}],
+        "directors": [],
+        "writers": [],
+    },
+    {
+        # not rated
+        "id": "m-lost",
+        "title": "Lost Star",
+        "genres": ["g-fantasy"],
+        "actors": [],
+        "directors": [{"id": CARL, "name": "Carl"}],
+        "writers": [],
+    },
+]
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory) -> EmbeddedElasticsearch:
+    dump = tmp_path_factory.mktemp("embedded") / "dump.ndjson"
+    with open(dump, "w", encoding="utf-8") as file:
+        for movie in MOVIES:
+            file.write(json.dumps({"index": {"_index": "movies", "_id": movie["id"]}}) + "\n")
+            file.write(json.dumps(movie) + "\n")
+
+    return EmbeddedElasticsearch.from_dump(str(dump), str(SCHEMAS))
+
+
+async def search_ids(engine: EmbeddedElasticsearch, body: dict) -> list[str]:
+    data = await engine.search(index="movies", body=body)
+    return [hit["_id"] for hit in data["hits"]["hits"]]
+
+
+@pytest.mark.asyncio
+async def test_match_with_fuzziness(engine):
+    exact = {"query": {"match": {"title": {"query": "Stra"}}}}
+    fuzzy = {"query": {"match": {"title": {"query": "Stra", "fuzziness": "AUTO"}}}}
+
+    found = await search_ids(engine, fuzzy)
+
+    assert await search_ids(engine, exact) == []
+    assert set(found) == {"m-wars", "m-trek", "m-lost"}
+    # the longer title weighs the term less (BM25 length norm)
+    assert found[-1] == "m-wars"
+
+
+@pytest.mark.asyncio
+async def test_match_operator(engine):
+    body = {"query": {"match": {"title": {"query": "star moon", "operator": "and"}}}}
+
+    assert await search_ids(engine, body) == []
+
+
+@pytest.mark.asyncio
+async def test_bool(engine):
+    body = {
+        "query": {
+            "bool": {
+                "must": [{"match": {"title": "star"}}],
+                "filter": [{"term": {"genres": "g-action"}}],
+                "must_not": [{"range": {"imdb_rating": {"lt": 8}}}],
+            }
+        }
+    }
+    should = {
+        "query": {
+            "bool": {
+                "should": [{"terms": {"genres": ["g-drama"]}}, {"range": {"imdb_rating": {"gte": 8}}}],
+                "minimum_should_match": 1,
+            }
+        },
+        "sort": [{"id": {"order": "asc"}}],
+    }
+
+    assert await search_ids(engine, body) == ["m-wars"]
+    assert await search_ids(engine, should) == ["m-moon", "m-wars"]
+
+
+@pytest.mark.asyncio
+async def test_nested_with_inner_hits(engine):
+    # the query of FilmService.find_roles_by_persons
+    body = {
+        "query": {
+            "bool": {
+                "should": [
+                    {
+                        "nested": {
+                            "path": role,
+                            "query": {"terms": {f"{role}.id": [BOB]}},
+                            "inner_hits": {
+                                "name": role,
+                                "size": 1,
+                                "_source": False,
+                                "docvalue_fields": [f"{role}.id"],
+                            },
+                        }
+                    }
+                    for role in ("directors", "actors", "writers")
+                ]
+            }
+        },
+        "sort": [{"id": {"order": "asc"}}],
+        "_source": False,
+    }
+
+    data = await engine.search(index="movies", body=body)
+    hits = {hit["_id"]: hit for hit in data["hits"]["hits"]}
+
+    assert list(hits) == ["m-moon", "m-trek", "m-wars"]
+    assert all("_source" not in hit for hit in hits.values())
+    actors = hits["m-wars"]["inner_hits"]["actors"]["hits"]
+    assert actors["total"] == {"value": 1, "relation": "eq"}
+    assert actors["hits"][0]["_nested"] == {"field": "actors", "offset": 1}
+    assert actors["hits"][0]["fields"] == {"actors.id": [BOB]}
+    assert "_source" not in actors["hits"][0]
+    assert hits["m-wars"]["inner_hits"]["directors"]["hits"]["hits"] == []
+    assert hits["m-trek"]["inner_hits"]["writers"]["hits"]["hits"][0]["fields"] == {"writers.id": [BOB]}
+
+
+@pytest.mark.asyncio
+async def test_sort_and_search_after(engine):
+    body = {
+        "query": {"match_all": {}},
+        "size": 2,
+        "sort": [{"imdb_rating": {"order": "desc"}}, {"id": {"order": "asc"}}],
+    }
+
+    first = (await engine.search(index="movies", body=body))["hits"]["hits"]
+    after = {**body, "search_after": first[-1]["sort"]}
+    second = (await engine.search(index="movies", body=after))["hits"]["hits"]
+
+    assert [hit["_id"] for hit in first] == ["m-wars", "m-trek"]
+    assert [hit["sort"] for hit in first] == [[8.5, "m-wars"], [7.0, "m-trek"]]
+    assert all(hit["_score"] is None for hit in first)
+    # documents without the field are the last in both directions
+    assert [hit["_id"] for hit in second] == ["m-moon", "m-lost"]
+
+
+@pytest.mark.asyncio
+async def test_source_filtering(engine):
+    includes = {"query": {"ids": {"values": ["m-wars"]}}, "_source": ["id", "actors.name"]}
+    excludes = {"query": {"ids": {"values": ["m-wars"]}}, "_source": {"excludes": ["actors", "directors", "genres"]}}
+
+    (included,) = (await engine.search(index="movies", body=includes))["hits"]["hits"]
+    (excluded,) = (await engine.search(index="movies", body=excludes))["hits"]["hits"]
+
+    assert included["_source"] == {"id": "m-wars", "actors": [{"name": "Ann"}, {"name": "Bob"}]}
+    assert excluded["_source"] == {"id": "m-wars", "title": "The Star Wars", "imdb_rating": 8.5, "writers": []}
+
+
+@pytest.mark.asyncio
+async def test_aggregations(engine):
+    # the facets of the film search
+    body = {
+        "query": {"match_all": {}},
+        "size": 0,
+        "aggs": {
+            "genres": {"terms": {"field": "genres", "size": 2}},
+            "imdb_rating": {
+                "range": {"field": "imdb_rating", "ranges": [{"to": 6}, {"from": 6, "to": 8}, {"from": 8}]}
+            },
+        },
+    }
+
+    data = await engine.search(index="movies", body=body)
+
+    assert data["hits"]["hits"] == []
+    assert data["aggregations"]["genres"] == {
+        "doc_count_error_upper_bound": 0,
+        "sum_other_doc_count": 1,
+        "buckets": [{"key": "g-action", "doc_count": 2}, {"key": "g-fantasy", "doc_count": 2}],
+    }
+    assert data["aggregations"]["imdb_rating"] == {
+        "buckets": [
+            {"key": "*-6.0", "to": 6.0, "doc_count": 1},
+            {"key": "6.0-8.0", "from": 6.0, "to": 8.0, "doc_count": 1},
+            {"key": "8.0-*", "from": 8.0, "doc_count": 1},
+        ]
+    }
+
+
+@pytest.mark.asyncio
+async def test_mget(engine):
+    by_ids = await engine.mget({"ids": ["m-moon", "m-none"]}, index="movies")
+    by_docs = await engine.mget({"docs": [{"_index": "movies", "_id": "m-trek"}, {"_index": "films", "_id": "m-trek"}]})
+
+    assert [doc["found"] for doc in by_ids["docs"]] == [True, False]
+    assert by_ids["docs"][0]["_source"]["title"] == "The Moon"
+    assert by_docs["docs"][0]["_source"]["title"] == "Star Trek"
+    assert by_docs["docs"][1]["error"]["type"] == "index_not_found_exception"
+
+
+@pytest.mark.asyncio
+async def test_msearch(engine):
+    body = [
+        {"index": "movies"},
+        {"query": {"ids": {"values": ["m-lost"]}}},
+        {"index": "movies"},
+        {"query": {"match_phrase": {"title": "star trek"}}},
+        {"index": "films"},
+        {"query": {"match_all": {}}},
+    ]
+
+    responses = (await engine.msearch(body=body))["responses"]
+
+    assert [response["status"] for response in responses] == [200, 400, 404]
+    assert [hit["_id"] for hit in responses[0]["hits"]["hits"]] == ["m-lost"]
+    assert responses[1]["error"]["type"] == "parsing_exception"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "body",
+    [
+        {"query": {"match_phrase": {"title": "star trek"}}},
+        {"query": {"match": {"title": {"query": "star", "boost": 2}}}},
+        {"query": {"match": {"title": {"query": "star", "operator": "xor"}}}},
+        {"query": {"bool": {"must": [{"match_all": {}}], "boost": 2}}},
+        {"query": {"nested": {"path": "actors", "query": {"match_all": {}}, "score_mode": "max"}}},
+        {"query": {"match_all": {}}, "highlight": {"fields": {"title": {}}}},
+        {"query": {"match_all": {}}, "sort": [{"imdb_rating": {"order": "desc", "missing": "_first"}}]},
+        {"query": {"match_all": {}}, "aggs": {"genres": {"terms": {"field": "genres", "order": {"_key": "asc"}}}}},
+        {"query": {"match_all": {}}, "aggs": {"genres": {"terms": {"field": "genres"}, "aggs": {}}}},
+    ],
+)
+async def test_unsupported_clauses_are_rejected(engine, body):
+    with pytest.raises(RequestError) as error:
+        await engine.search(index="movies", body=body)
+
+    assert error.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_search_runs_off_event_loop(engine, monkeypatch):
+    threads = []
+    search = engine._search
+
+    def recording_search(index, body):
+        threads.append(threading.get_ident())
+        return search(index, body)
+
+    monkeypatch.setattr(engine, "_search", recording_search)
+    await engine.search(index="movies", body={"query": {"match_all": {}}})
+    await engine.msearch(body=[{"index": "movies"}, {"query": {"match_all": {}}}])
+
+    assert len(threads) == 2
+    assert threading.get_ident() not in threads
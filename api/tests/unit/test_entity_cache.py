@@ -0,0 +1,44 @@
+import uuid
+
+import orjson
+import pytest
+from services.base import ServiceABC
+from services.cache.memory_storage import MemoryCache
+
+
+class RecordingElasticsearch:
+    """
+    Finds every document of ``ids`` but ``missing``, records the ids of every ``mget``
+    """
+
+    def __init__(self, missing: frozenset[str] = frozenset()):
+        self.missing = missing
+        self.mgets: list[list[str]] = []
+
+    async def mget(self, body: dict, index: str | None = None, **kwargs) -> dict:
+        self.mgets.append(body["ids"])
+        return {
+            "docs": [
+                {"_id": id, "found": False} if id in self.missing else {"_id": id, "found": True, "_source": {"id": id}}
+                for id in body["ids"]
+            ]
+        }
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("batch_queries", ["true", "false"])
+async def test_missing_documents_read_with_one_mget(monkeypatch, batch_queries):
+    monkeypatch.setenv("ES_BATCH_QUERIES", batch_queries)
+    ids = [uuid.uuid4() for _ in range(4)]
+    elastic = RecordingElasticsearch(missing=frozenset({str(ids[3])}))
+    cache = MemoryCache(100, 1 << 20)
+    await cache.set(f"movies:{ids[0]}", orjson.dumps({"id": str(ids[0])}), 60)
+    service = ServiceABC(elastic, cache)  # type: ignore[arg-type]
+
+    docs = await service._get_many_from_elastic("movies", [*ids, ids[1]])
+
+    assert docs == [{"id": str(id)} for id in ids[:3]] + [None, {"id": str(ids[1])}]
+    assert elastic.mgets == [[str(id) for id in ids[1:]]]
+    assert await cache.get_many([f"movies:{id}" for id in ids]) == [
+        orjson.dumps({"id": str(id)}) for id in ids[:3]
+    ] + [None]
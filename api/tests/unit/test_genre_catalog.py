@@ -0,0 +1,73 @@
+import uuid
+
+import pytest
+from services.cache.memory_storage import MemoryCache
+from services.genre import GenreService
+from services.genre_catalog import GenreCatalog
+from services.invalidation import InvalidationService
+
+GENRE_ID = str(uuid.uuid4())
+
+
+class GenresIndex:
+    """
+    The genres index as the catalog reads it
+    """
+
+    def __init__(self, genres: list[dict]):
+        self.genres = genres
+        self.available = True
+        self.searches = 0
+
+    async def search(self, index: str, body: dict, **kwargs) -> dict:
+        self.searches += 1
+        if not self.available:
+            raise ConnectionError("Elasticsearch is unavailable")
+
+        return {"took": 1, "hits": {"hits": [{"_id": genre["id"], "_source": genre} for genre in self.genres]}}
+
+
+@pytest.fixture
+def elastic() -> GenresIndex:
+    return GenresIndex([{"id": GENRE_ID, "name": "Drama", "description": None}])
+
+
+def services(elastic: GenresIndex, catalog: GenreCatalog) -> tuple[InvalidationService, GenreService]:
+    cache = MemoryCache(100, 1 << 20)
+    return (InvalidationService(elastic, cache, None, catalog), GenreService(elastic, cache, catalog))
+
+
+@pytest.mark.asyncio
+async def test_invalidation_reloads_catalog(elastic):
+    catalog = GenreCatalog()
+    await catalog.refresh(elastic)
+    (invalidation, genres) = services(elastic, catalog)
+
+    elastic.genres[0]["name"] = "Melodrama"
+    await invalidation.invalidate("genres", [uuid.UUID(GENRE_ID)])
+
+    assert [genre.name for genre in await genres.get_all()] == ["Melodrama"]
+
+
+@pytest.mark.asyncio
+async def test_catalog_dropped_when_it_cant_be_reloaded(elastic):
+    catalog = GenreCatalog()
+    await catalog.refresh(elastic)
+    (invalidation, _) = services(elastic, catalog)
+
+    elastic.available = False
+    await invalidation.invalidate("genres", [uuid.UUID(GENRE_ID)])
+
+    assert catalog.snapshot is None
+
+
+@pytest.mark.asyncio
+async def test_unused_catalog_isnt_loaded(elastic):
+    catalog = GenreCatalog()
+    (invalidation, _) = services(elastic, catalog)
+
+    await invalidation.invalidate("genres", [uuid.UUID(GENRE_ID)])
+    await invalidation.invalidate("movies", [])
+
+    assert catalog.snapshot is None
+    assert elastic.searches == 0
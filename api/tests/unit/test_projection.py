@@ -0,0 +1,45 @@
+from uuid import UUID
+
+import orjson
+import pytest
+from api.v1.schemas.projection import Projection
+from pydantic import BaseModel, Field, ValidationError
+
+
+class Film(BaseModel):
+    id: UUID
+    title: str
+    imdb_rating: float
+    description: str | None = None
+    genres: list[str] = Field(default_factory=list)
+
+
+FILMS = Projection(Film)
+
+
+def test_fields_picked_in_the_model_order():
+    doc = {"title": "The Star", "id": "00000000-0000-0000-0000-000000000001", "imdb_rating": 8.5, "unknown": 1}
+
+    assert list(FILMS.project(doc).items()) == [
+        ("id", "00000000-0000-0000-0000-000000000001"),
+        ("title", "The Star"),
+        ("imdb_rating", 8.5),
+        ("description", None),
+        ("genres", []),
+    ]
+
+
+def test_same_json_as_the_model():
+    docs = [
+        {"id": "00000000-0000-0000-0000-000000000001", "title": "The Star", "imdb_rating": 8.5, "genres": ["Drama"]},
+        {"id": "00000000-0000-0000-0000-000000000002", "title": "The Moon", "imdb_rating": 0, "description": "Far"},
+    ]
+
+    assert orjson.loads(FILMS.dump_json(docs)) == [Film.model_validate(doc).model_dump(mode="json") for doc in docs]
+
+
+def test_missing_required_field_reported_by_the_model():
+    doc = {"id": "00000000-0000-0000-0000-000000000001", "title": "The Star"}
+
+    with pytest.raises(ValidationError, match="imdb_rating"):
+        FILMS.project(doc)
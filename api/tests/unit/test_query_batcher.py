@@ -0,0 +1,75 @@
+import asyncio
+import time
+from collections.abc import Awaitable
+from typing import Any
+
+import pytest
+from core import deadline
+from services.query_batcher import QueryBatcher
+
+
+class RecordingElasticsearch:
+    """
+    Finds every document and records the timeouts of the calls
+    """
+
+    def __init__(self):
+        self.timeouts: list[float | None] = []
+
+    async def mget(self, body: dict, request_timeout: float | None = None, **kwargs) -> dict:
+        self.timeouts.append(request_timeout)
+        await asyncio.sleep(0)
+        return {"docs": [{"_id": doc["_id"], "found": True, "_source": {"id": doc["_id"]}} for doc in body["docs"]]}
+
+
+def with_deadline(timeout_sec: float | None, awaitable: Awaitable[Any]) -> asyncio.Task:
+    """
+    Awaits ``awaitable`` in a request with a deadline ``timeout_sec`` from now
+    """
+
+    async def request() -> Any:
+        deadline._deadline.set(None if timeout_sec is None else time.monotonic() + timeout_sec)
+        return await awaitable
+
+    return asyncio.create_task(request())
+
+
+@pytest.mark.asyncio
+async def test_batch_bounded_by_latest_deadline_of_its_requests():
+    elastic = RecordingElasticsearch()
+    batcher = QueryBatcher(elastic)
+
+    docs = await asyncio.gather(
+        with_deadline(1, batcher.get("movies", "1")), with_deadline(5, batcher.get("persons", "2"))
+    )
+
+    assert docs == [{"id": "1"}, {"id": "2"}]
+    (timeout,) = elastic.timeouts
+    assert 4 < timeout <= 5
+
+
+@pytest.mark.asyncio
+async def test_interleaved_batches_keep_their_own_deadlines():
+    elastic = RecordingElasticsearch()
+    batcher = QueryBatcher(elastic)
+
+    first = with_deadline(5, batcher.get("movies", "1"))
+    await asyncio.sleep(0)
+    # joins the next batch, the first one is dispatched but its task hasn't started yet
+    second = with_deadline(1, batcher.get("movies", "2"))
+    docs = await asyncio.gather(first, second)
+
+    assert docs == [{"id": "1"}, {"id": "2"}]
+    (first_timeout, second_timeout) = elastic.timeouts
+    assert 4 < first_timeout <= 5
+    assert second_timeout is not None and 0 < second_timeout <= 1
+
+
+@pytest.mark.asyncio
+async def test_batch_without_deadline_when_a_request_has_none():
+    elastic = RecordingElasticsearch()
+    batcher = QueryBatcher(elastic)
+
+    await asyncio.gather(with_deadline(1, batcher.get("movies", "1")), with_deadline(None, batcher.get("movies", "2")))
+
+    assert elastic.timeouts == [None]
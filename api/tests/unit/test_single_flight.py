@@ -0,0 +1,131 @@
+import asyncio
+import time
+from collections.abc import Awaitable
+from typing import Any
+
+import pytest
+from core import deadline
+from core.deadline import DeadlineExceededError
+from services.cache.memory_storage import MemoryCache
+from services.cache.single_flight import SingleFlightCache
+
+
+def single_flight() -> SingleFlightCache:
+    return SingleFlightCache(MemoryCache(100, 1 << 20))
+
+
+def with_deadline(timeout_sec: float, awaitable: Awaitable[Any]) -> asyncio.Task:
+    """
+    Awaits ``awaitable`` in a request with a deadline ``timeout_sec`` from now
+    """
+
+    async def request() -> Any:
+        deadline._deadline.set(time.monotonic() + timeout_sec)
+        return await awaitable
+
+    return asyncio.create_task(request())
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_call_factory_once():
+    cache = single_flight()
+    calls = 0
+
+    async def factory() -> bytes:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return b"film"
+
+    values = await asyncio.gather(*(cache.get_or_set("film:1", factory, 60) for _ in range(10)))
+
+    assert values == [b"film"] * 10
+    assert calls == 1
+    assert await cache.get("film:1") == b"film"
+
+
+@pytest.mark.asyncio
+async def test_factory_error_is_raised_to_every_caller():
+    cache = single_flight()
+    calls = 0
+
+    async def factory() -> bytes:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        raise ValueError("broken")
+
+    results = await asyncio.gather(
+        *(cache.get_or_set("film:1", factory, 60) for _ in range(5)), return_exceptions=True
+    )
+
+    assert calls == 1
+    assert all(isinstance(result, ValueError) for result in results)
+    # the failure isn't cached, the next miss computes the value again
+    with pytest.raises(ValueError):
+        await cache.get_or_set("film:1", factory, 60)
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_leaves_computation_to_others():
+    cache = single_flight()
+
+    async def factory() -> bytes:
+        await asyncio.sleep(0.05)
+        return b"film"
+
+    (first, second) = (asyncio.create_task(cache.get_or_set("film:1", factory, 60)) for _ in range(2))
+    await asyncio.sleep(0.01)
+    first.cancel()
+
+    assert await second == b"film"
+    assert first.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_every_caller_waits_until_its_own_deadline():
+    cache = single_flight()
+    calls = 0
+    deadlines = []
+
+    async def factory() -> bytes:
+        nonlocal calls
+        calls += 1
+        deadlines.append(deadline.current())
+        await asyncio.sleep(0.2)
+        return b"film"
+
+    started = time.monotonic()
+    hasty = with_deadline(0.05, cache.get_or_set("film:1", factory, 60))
+    patient = with_deadline(1, cache.get_or_set("film:1", factory, 60))
+
+    with pytest.raises(DeadlineExceededError):
+        await hasty
+    gave_up = time.monotonic() - started
+
+    assert await patient == b"film"
+    assert gave_up < 0.15
+    assert calls == 1
+    # the computation isn't bound by the deadline of the caller which started it
+    assert deadlines == [None]
+
+
+@pytest.mark.asyncio
+async def test_computation_cancelled_when_every_caller_gave_up():
+    cache = single_flight()
+    cancelled = asyncio.Event()
+
+    async def factory() -> bytes:
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return b"film"
+
+    callers = [with_deadline(0.05, cache.get_or_set("film:1", factory, 60)) for _ in range(2)]
+    results = await asyncio.gather(*callers, return_exceptions=True)
+
+    assert all(isinstance(result, DeadlineExceededError) for result in results)
+    await asyncio.wait_for(cancelled.wait(), 0.1)
@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+import pytest
+from services.cache.memory_storage import MemoryCache
+from services.cache.swr import StaleWhileRevalidateCache, pack, unpack
+
+
+async def stale_cache() -> StaleWhileRevalidateCache:
+    """
+    Cache holding ``film:1`` past its soft expiry, within the stale window
+    """
+    cache = StaleWhileRevalidateCache(MemoryCache(100, 1 << 20))
+    await cache.set("film:1", pack(b"old", time.time() - 1, 0.01), 60)
+    return cache
+
+
+async def settled() -> None:
+    # lets the background refresh store its outcome
+    await asyncio.sleep(0.02)
+
+
+@pytest.mark.asyncio
+async def test_stale_value_served_while_refreshed():
+    cache = await stale_cache()
+    refreshed = asyncio.Event()
+
+    async def factory() -> bytes:
+        await asyncio.sleep(0.05)
+        refreshed.set()
+        return b"new"
+
+    value = await asyncio.wait_for(cache.get_or_set("film:1", factory, 60, stale_sec=60), 0.03)
+    await refreshed.wait()
+    await settled()
+
+    assert value == b"old"
+    assert await cache.get_or_set("film:1", factory, 60, stale_sec=60) == b"new"
+    assert unpack(await cache.get("film:1"))[0] > time.time()
+
+
+@pytest.mark.asyncio
+async def test_single_refresh_of_stale_value():
+    cache = await stale_cache()
+    calls = 0
+
+    async def factory() -> bytes:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return b"new"
+
+    values = await asyncio.gather(*(cache.get_or_set("film:1", factory, 60, stale_sec=60) for _ in range(10)))
+    await asyncio.sleep(0.1)
+
+    assert values == [b"old"] * 10
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_refresh_keeps_stale_value():
+    cache = await stale_cache()
+    failed = asyncio.Event()
+
+    async def factory() -> bytes:
+        failed.set()
+        raise ValueError("broken")
+
+    assert await cache.get_or_set("film:1", factory, 60, stale_sec=60) == b"old"
+    await failed.wait()
+    await settled()
+
+    assert unpack(await cache.get("film:1"))[2] == b"old"
+    assert await cache.get_or_set("film:1", factory, 60, stale_sec=60) == b"old"
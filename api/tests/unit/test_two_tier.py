@@ -0,0 +1,89 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+
+import fakeredis
+import pytest
+import pytest_asyncio
+from services.cache.memory_storage import MemoryCache
+from services.cache.redis_storage import RedisCache
+from services.cache.two_tier_storage import INVALIDATION_CHANNEL, TwoTierCache
+
+
+def two_tier(server: fakeredis.FakeServer) -> TwoTierCache:
+    client = fakeredis.FakeAsyncRedis(server=server)
+    return TwoTierCache(client, RedisCache(client), MemoryCache(100, 1 << 20), local_timeout_sec=60)
+
+
+async def eventually(check: Callable[[], Awaitable[bool]]) -> bool:
+    for _ in range(100):
+        if await check():
+            return True
+        await asyncio.sleep(0.01)
+
+    return False
+
+
+@pytest_asyncio.fixture(scope="function")
+async def workers():
+    """
+    Two workers sharing one Redis, both following the invalidation channel
+    """
+    server = fakeredis.FakeServer()
+    (first, second) = (two_tier(server), two_tier(server))
+    tasks = [asyncio.create_task(worker.listen()) for worker in (first, second)]
+    redis = fakeredis.FakeAsyncRedis(server=server)
+
+    async def subscribed() -> bool:
+        return (await redis.pubsub_numsub(INVALIDATION_CHANNEL))[0][1] == 2
+
+    assert await eventually(subscribed)
+    yield (first, second, redis)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_set_evicts_local_copy_of_other_worker(workers):
+    (first, second, _) = workers
+    await first.set("film:1", b"old", 60)
+    assert await second.get("film:1") == b"old"
+
+    await first.set("film:1", b"new", 60)
+
+    async def refreshed() -> bool:
+        return await second.get("film:1") == b"new"
+
+    assert await eventually(refreshed)
+
+
+@pytest.mark.asyncio
+async def test_delete_evicts_local_copy_of_other_worker(workers):
+    (first, second, _) = workers
+    await first.set("film:1", b"old", 60)
+    assert await second.get("film:1") == b"old"
+
+    await first.delete(["film:1"])
+
+    async def evicted() -> bool:
+        return await second.get("film:1") is None
+
+    assert await eventually(evicted)
+
+
+@pytest.mark.asyncio
+async def test_own_messages_keep_local_copy(workers):
+    (first, second, redis) = workers
+    await second.set("film:1", b"old", 60)
+    assert await first.get("film:1") == b"old"
+
+    await first.set("film:1", b"new", 60)
+
+    async def delivered() -> bool:
+        # the other worker got the message, so did the publisher
+        return await second.get("film:1") == b"new"
+
+    assert await eventually(delivered)
+    # only the local copy of the publisher is left to read
+    await redis.delete("film:1")
+    assert await first.get("film:1") == b"new"
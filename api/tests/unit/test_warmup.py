@@ -0,0 +1,86 @@
+import uuid
+
+import fakeredis
+import pytest
+from core.settings import WarmupSettings
+from models.genre import Genre
+from services.cache.redis_storage import RedisCache
+from services.cache.response import CachedEntry, CachedResponse
+from services.cache.swr import unpack
+from services.genre import GenreService
+from services.genre_catalog import GenreCatalog, GenreSnapshot
+from services.warmup import LOCK_KEY, CacheWarmer
+
+GENRE = Genre(id=uuid.uuid4(), name="Drama")
+
+
+def hot_entries(genre_ids: list[uuid.UUID]) -> list[CachedEntry]:
+    async def load(name: str) -> CachedResponse:
+        return CachedResponse.create(f'{{"name": "{name}"}}'.encode())
+
+    return [
+        CachedEntry(f"genre:{id}", lambda id=id: load(str(id)), timeout_sec=60, indices=("genres",))
+        for id in genre_ids
+    ] + [CachedEntry("films:page", lambda: load("films"), timeout_sec=60, stale_sec=30, indices=("movies",))]
+
+
+def warmer(client: fakeredis.FakeAsyncRedis, settings: WarmupSettings) -> CacheWarmer:
+    catalog = GenreCatalog()
+    catalog.snapshot = GenreSnapshot.build([GENRE])
+    # the genres are read from the catalog, Elasticsearch isn't called
+    genre_service = GenreService(None, RedisCache(client), catalog)  # type: ignore[arg-type]
+    return CacheWarmer(client, RedisCache(client), None, genre_service, hot_entries, settings)
+
+
+@pytest.mark.asyncio
+async def test_single_worker_warms_per_interval():
+    server = fakeredis.FakeServer()
+    settings = WarmupSettings(interval=600)
+    (first, second) = (warmer(fakeredis.FakeAsyncRedis(server=server), settings) for _ in range(2))
+    redis = fakeredis.FakeAsyncRedis(server=server)
+
+    warmed = [await first.warm(), await second.warm()]
+
+    assert warmed == [2, 0]
+    assert 0 < await redis.ttl(LOCK_KEY) <= 600
+
+
+@pytest.mark.asyncio
+async def test_warmed_entries_are_stored():
+    redis = fakeredis.FakeAsyncRedis()
+
+    await warmer(redis, WarmupSettings(interval=600)).warm()
+
+    assert CachedResponse.loads(await redis.get(f"genre:{GENRE.id}")).body == f'{{"name": "{GENRE.id}"}}'.encode()
+    assert 0 < await redis.ttl(f"genre:{GENRE.id}") <= 60
+    # stale-while-revalidate entries are stored in its envelope for the whole stale window
+    (_, _, value) = unpack(await redis.get("films:page"))
+    assert CachedResponse.loads(value).body == b'{"name": "films"}'
+    assert 60 < await redis.ttl("films:page") <= 90
+
+
+@pytest.mark.asyncio
+async def test_next_interval_is_warmed_again():
+    redis = fakeredis.FakeAsyncRedis()
+    cache_warmer = warmer(redis, WarmupSettings(interval=600))
+    await cache_warmer.warm()
+
+    # the lock expires with the interval
+    await redis.delete(LOCK_KEY)
+
+    assert await cache_warmer.warm() == 2
+
+
+@pytest.mark.asyncio
+async def test_entries_of_changed_indices_rewarmed():
+    redis = fakeredis.FakeAsyncRedis()
+    cache_warmer = warmer(redis, WarmupSettings(interval=600))
+    await cache_warmer.warm()
+    await redis.delete("films:page", f"genre:{GENRE.id}")
+
+    # another worker may be elected for the interval
+    rewarmed = await cache_warmer.rewarm(["movies"])
+
+    assert rewarmed == 1
+    assert await redis.exists("films:page")
+    assert not await redis.exists(f"genre:{GENRE.id}")